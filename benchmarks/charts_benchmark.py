@@ -0,0 +1,89 @@
+"""Server time of one interaction with the charts tab.
+
+Before, each of the four charts was its own callback, so one slider
+move was four requests which each filtered the data, usually in
+different workers. This times the four charts built that way (the
+frame cache cleared before each, like four workers) against the
+`plot_charts` callback, which filters once, with 1 and `--threads`
+chart threads. The figure cache is cleared before every run.
+
+Usage
+-----
+    COVID_DATA_DIR=/tmp/covid python benchmarks/charts_benchmark.py
+    python benchmarks/charts_benchmark.py --threads 4 --repeat 5
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app  # noqa: E402
+
+CHARTS = [app.plot_chart_1, app.plot_chart_2, app.plot_chart_3, app.plot_chart_4]
+
+
+def separate(countries, daterange):
+    for plot in CHARTS:
+        app.frame_cache.clear()
+        plot(countries, daterange, "linear")
+
+
+def consolidated(countries, daterange):
+    app.frame_cache.clear()
+    app.plot_charts(countries, daterange, "linear")
+
+
+def timed(func, args, repeat):
+    times = []
+    for _ in range(repeat):
+        app.figure_cache.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func(*args)
+            times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    selections = {
+        "5 countries": [
+            "Canada",
+            "United States",
+            "United Kingdom",
+            "France",
+            "Singapore",
+        ],
+        "all countries": [],
+    }
+    daterange = [0, app.data.axis.last]
+
+    print("{:<16}{:>14}{:>14}{:>14}".format("", "4 callbacks", "1 thread", "threads"))
+    for name, countries in selections.items():
+        app.chart_executor = None
+        before = timed(separate, (countries, daterange), args.repeat)
+        serial = timed(consolidated, (countries, daterange), args.repeat)
+        app.chart_executor = ThreadPoolExecutor(args.threads)
+        parallel = timed(consolidated, (countries, daterange), args.repeat)
+        app.chart_executor.shutdown()
+        print(
+            "{:<16}{:>11.1f} ms{:>11.1f} ms{:>11.1f} ms".format(
+                name, before, serial, parallel
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
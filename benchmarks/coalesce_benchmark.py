@@ -0,0 +1,141 @@
+"""Concurrent identical callbacks with single-flight coalescing.
+
+Simulates a crowd opening the dashboard at once: `--users` threads
+call the map and charts tab callbacks with the same default inputs at
+the same moment, first without coalescing (the plot functions without
+their cache), then through the figure cache, which runs each figure
+once and hands the result to every waiting call. Then `--processes`
+forked workers sharing a file cache do the same, as gunicorn workers
+would. Checks that every caller gets the same figures and that each
+figure was built once, and reports the executed and coalesced counters.
+
+Usage
+-----
+    COVID_DATA_DIR=/tmp/covid python benchmarks/coalesce_benchmark.py
+    python benchmarks/coalesce_benchmark.py --users 16 --processes 5
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app  # noqa: E402
+from cache import FileCache  # noqa: E402
+
+COUNTRIES = ["Canada", "United States", "United Kingdom", "France", "Singapore"]
+PLOTS = ["plot_map", "plot_chart_1", "plot_chart_2", "plot_chart_3", "plot_chart_4"]
+
+
+def default_view(plots):
+    daterange = [0, app.data.axis.last]
+    figures = [plots[0]("new_cases_per_million", COUNTRIES, daterange)]
+    for plot in plots[1:]:
+        figures.append(plot(COUNTRIES, daterange, "linear"))
+    return json.dumps(figures, sort_keys=True, default=str)
+
+
+def crowd(users, plots):
+    barrier = threading.Barrier(users)
+    results = [None] * users
+
+    def user(i):
+        barrier.wait()
+        results[i] = default_view(plots)
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(users)]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return time.perf_counter() - start, results
+
+
+def worker(barrier, queue):
+    app.figure_cache.clear()
+    barrier.wait()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = default_view([getattr(app, name) for name in PLOTS])
+    stats = app.figure_cache.stats()
+    queue.put((stats["executed"], stats["coalesced"], result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    plots = [getattr(app, name) for name in PLOTS]
+    app.frame_cache.maxsize = 0  # every figure filters on its own
+
+    print("{:<28}{:>10}{:>10}{:>11}".format("", "wall s", "executed", "coalesced"))
+
+    wall, results = crowd(args.users, [plot.__wrapped__ for plot in plots])
+    print("{:<28}{:>10.2f}{:>10}{:>11}".format("threads, no coalescing", wall, "", ""))
+
+    before = app.figure_cache.stats()
+    wall, coalesced = crowd(args.users, plots)
+    after = app.figure_cache.stats()
+    assert len(set(results + coalesced)) == 1
+    executed = after["executed"] - before["executed"]
+    assert executed == len(PLOTS), executed
+    print(
+        "{:<28}{:>10.2f}{:>10}{:>11}".format(
+            "threads, single-flight",
+            wall,
+            executed,
+            after["coalesced"] - before["coalesced"],
+        )
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        app.figure_cache = FileCache(directory, version=app.data.version)
+        for name in PLOTS:
+            # the plot functions are bound to the cache they were decorated with
+            setattr(
+                app, name, app.memoize(app.figure_cache)(app.render_pool.jobs[name])
+            )
+
+        context = multiprocessing.get_context("fork")
+        barrier = context.Barrier(args.processes)
+        queue = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(barrier, queue))
+            for _ in range(args.processes)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        reports = [queue.get() for _ in processes]
+        wall = time.perf_counter() - start
+        for process in processes:
+            process.join()
+
+    assert len({result for _, _, result in reports} | set(results)) == 1
+    executed = sum(report[0] for report in reports)
+    assert executed == len(PLOTS), executed
+    print(
+        "{:<28}{:>10.2f}{:>10}{:>11}".format(
+            "{} processes, file cache".format(args.processes),
+            wall,
+            executed,
+            sum(report[1] for report in reports),
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Startup time of the date slider metadata.
+
+Times the block `app.py` used to run at import (unique dates three
+times, a Python loop with `strptime`/`strftime` and a `month_index`
+membership test per day) against `DateAxis`, checks that both give the
+same dates and tick marks, and times the resolution of a slider range
+into the dates the data is filtered with.
+
+Usage
+-----
+    COVID_DATA_DIR=/tmp/covid python benchmarks/dateaxis_benchmark.py
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from dateaxis import DateAxis  # noqa: E402
+from utility import DAY_COLUMN, DAY_EPOCH, get_data  # noqa: E402
+
+
+def legacy_slider(df):
+    daterange = [x for x in range(len(df["date"].unique()))]
+    try:
+        month_index = pd.date_range(
+            start=df["date"].dt.date.unique()[0],
+            end=df["date"].dt.date.unique()[-1],
+            freq="2M",
+        )
+    except ValueError:  # the alias is "2ME" from pandas 3
+        month_index = pd.date_range(
+            start=df["date"].dt.date.unique()[0],
+            end=df["date"].dt.date.unique()[-1],
+            freq="2ME",
+        )
+    month_index = month_index - pd.offsets.MonthBegin()
+
+    marks = {
+        numd: date.strftime("%Y-%m-%d")
+        for numd, date in zip(daterange, df["date"].dt.date.unique())
+    }
+
+    style = {"color": "#77b0b1"}
+    marks_display = {
+        0: {
+            "label": datetime.strptime(marks.get(0), "%Y-%m-%d").strftime("%y/%m"),
+            "style": style,
+        }
+    }
+    last_index = len(marks) - 1
+    for key, item in marks.items():
+        if key != 0 and item in month_index and last_index - key > 30 and key - 0 > 10:
+            marks_display[key] = {
+                "label": datetime.strptime(item, "%Y-%m-%d").strftime("%y/%m"),
+                "style": style,
+            }
+    marks_display[last_index] = {
+        "label": datetime.strptime(marks.get(last_index), "%Y-%m-%d").strftime("%y/%m"),
+        "style": style,
+    }
+
+    return marks, marks_display
+
+
+def best(func, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000, result
+
+
+def main():
+    df = get_data()
+    print("rows={} days={}".format(len(df), df["date"].nunique()))
+
+    legacy_ms, (marks, marks_display) = best(lambda: legacy_slider(df))
+    axis_ms, axis = best(lambda: DateAxis(DAY_EPOCH + df[DAY_COLUMN].to_numpy()))
+    ticks_ms, ticks = best(axis.marks)
+
+    assert list(marks.values()) == axis.labels.tolist()
+    assert marks_display == ticks
+
+    print("{:<40}{:>10}".format("startup", "ms"))
+    print("{:<40}{:>10.2f}".format("legacy marks + marks_display", legacy_ms))
+    print("{:<40}{:>10.2f}".format("DateAxis", axis_ms))
+    print("{:<40}{:>10.2f}".format("DateAxis.marks", ticks_ms))
+
+    rng = np.random.default_rng(0)
+    ranges = np.sort(rng.integers(0, len(axis), size=(10000, 2)), axis=1).tolist()
+
+    def resolve_legacy():
+        for start, end in ranges:
+            pd.Timestamp(marks.get(start)), pd.Timestamp(marks.get(end))
+
+    def resolve_axis():
+        for daterange in ranges:
+            axis.range(daterange)
+
+    print("{:<40}{:>10}".format("resolve 10000 slider ranges", "ms"))
+    print("{:<40}{:>10.2f}".format("marks.get + pd.Timestamp", best(resolve_legacy)[0]))
+    print("{:<40}{:>10.2f}".format("DateAxis.range", best(resolve_axis)[0]))
+
+
+if __name__ == "__main__":
+    main()
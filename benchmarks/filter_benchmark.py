@@ -0,0 +1,73 @@
+"""Micro-benchmark of filter_data with DataFrame.query and with DataStore.
+
+Times both paths over selections of 1, 5, 50 and all countries, for the
+full date range and for the last 90 days, and checks they return the
+same rows.
+
+Usage
+-----
+    python benchmarks/filter_benchmark.py --data-dir /tmp/covid
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from store import DataStore  # noqa: E402
+from utility import filter_data, get_data  # noqa: E402
+
+
+def best_of(func, repeat, number):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=10)
+    args = parser.parse_args()
+
+    df = get_data(data_dir=args.data_dir)
+    store = DataStore(df)
+
+    locations = list(df["location"].drop_duplicates())
+    dates = df["date"].dt.strftime("%Y-%m-%d").unique()
+    ranges = {"full": (dates[0], dates[-1]), "90d": (dates[-90], dates[-1])}
+    selections = {
+        "1": locations[:1],
+        "5": locations[:5],
+        "50": locations[:50],
+        "all": [],
+    }
+
+    print("rows={} locations={}".format(len(df), len(locations)))
+    print(
+        "{:>6} {:>6} {:>12} {:>12} {:>8}".format(
+            "range", "n", "query ms", "store ms", "speedup"
+        )
+    )
+    for range_name, (date_from, date_to) in ranges.items():
+        for name, countries in selections.items():
+            expected = filter_data(df, date_from, date_to, countries)
+            assert expected.equals(filter_data(store, date_from, date_to, countries))
+
+            query = best_of(
+                lambda: filter_data(df, date_from, date_to, countries),
+                args.repeat,
+                args.number,
+            )
+            indexed = best_of(
+                lambda: filter_data(store, date_from, date_to, countries),
+                args.repeat,
+                args.number,
+            )
+            print(
+                "{:>6} {:>6} {:>12.3f} {:>12.3f} {:>7.1f}x".format(
+                    range_name, name, query * 1000, indexed * 1000, query / indexed
+                )
+            )
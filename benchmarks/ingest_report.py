@@ -0,0 +1,119 @@
+"""Time and peak memory of reading the OWID csv.
+
+Reads the source csv once with a plain `pd.read_csv` of every column,
+as `get_data` did before the streaming reader, and once with
+`read_source` for each block size. Every read runs in a fresh forked
+process, after a read of the first lines so that the parser code is
+already loaded, and the peak resident memory above the memory of the
+process before the read is reported, along with the peak of the Arrow
+memory pool.
+
+Usage
+-----
+    python benchmarks/ingest_report.py --source owid-covid-data.csv
+    python benchmarks/ingest_report.py --source https://covid.ourworldindata.org/data/owid-covid-data.csv
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+import pandas as pd  # noqa: E402
+import pyarrow as pa  # noqa: E402
+from utility import (  # noqa: E402
+    COLUMNS,
+    DATA_URL,
+    apply_schema,
+    open_source,
+    read_source,
+)
+
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def read_pandas(source):
+    df = pd.read_csv(source, parse_dates=["date"])
+    df = df[COLUMNS].fillna(value=0)
+    df = df[~df["iso_code"].str.startswith("OWID")]
+    return apply_schema(df.sort_values("date"))
+
+
+def read(source, block_size):
+    if block_size is None:
+        return read_pandas(source)
+    return read_source(source, block_size=block_size)
+
+
+def measure(queue, source, block_size, sample):
+    # load the parser code before measuring, so only the data is counted
+    read(sample, block_size)
+    before = rss_kb()
+    start = time.perf_counter()
+    df = read(source, block_size)
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put(
+        (
+            len(df),
+            seconds,
+            (peak - before) / 1024,
+            pa.default_memory_pool().max_memory() / 1024**2,
+            df.memory_usage(deep=True).sum() / 1024**2,
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default=DATA_URL, help="OWID csv URL or path")
+    parser.add_argument(
+        "--block-sizes", type=int, nargs="+", default=[1, 4, 16], help="in MB"
+    )
+    args = parser.parse_args()
+
+    with open_source(args.source) as f:
+        head = f.read(64 * 1024)
+    sample = os.path.join(tempfile.mkdtemp(), "sample.csv")
+    with open(sample, "wb") as f:
+        f.write(head[: head.rfind(b"\n") + 1])
+
+    context = multiprocessing.get_context("fork")
+    runs = [("pandas read_csv", None)] + [
+        ("stream {} MB".format(size), size * 1024 * 1024) for size in args.block_sizes
+    ]
+
+    print(
+        "{:>16}{:>10}{:>10}{:>14}{:>14}{:>12}".format(
+            "reader", "rows", "seconds", "peak RSS MB", "arrow pool MB", "frame MB"
+        )
+    )
+    for name, block_size in runs:
+        queue = context.Queue()
+        process = context.Process(
+            target=measure, args=(queue, args.source, block_size, sample)
+        )
+        process.start()
+        rows, seconds, peak, pool, frame = queue.get()
+        process.join()
+        print(
+            "{:>16}{:>10}{:>10.2f}{:>14.1f}{:>14.1f}{:>12.1f}".format(
+                name, rows, seconds, peak, pool, frame
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+"""Load test replaying Dash callback traffic against the running app.
+
+Starts the app under gunicorn as the Dockerfile does (`--preload`, 5
+sync workers, one thread each) on the fixture bundled in
+`benchmarks/data`, so it runs fully offline, or targets `--url`. Then
+`--users` simulated users each open the page and play a sequence of
+interactions:
+
+- slider drags: a new date range (one update per drag, as the slider
+  updates on mouseup);
+- country add and remove in the country selector;
+- indicator switches: another value of a dropdown or radio button of
+  the active tab;
+- tab switches.
+
+The harness reads the callbacks from `/_dash-dependencies` and the
+controls from `/_dash-layout` and acts as the Dash renderer: every
+interaction calls the server callbacks that take the changed property
+as input, concurrently like a browser, with the current values of
+their inputs and states, and feeds their outputs back into the state.
+Clientside callbacks are skipped. The page load calls every callback
+once.
+
+Reports the throughput, the p50/p95/p99 latency and the error rate per
+callback output. Requests stopped by `PreventUpdate` (status 204) count
+as answered. The sequences are generated from `--seed`; `--save` writes
+them to a file and `--replay` plays a saved file again.
+
+Usage
+-----
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --users 10 --interactions 30 --save /tmp/session.json
+    python benchmarks/load_test.py --replay /tmp/session.json --workers 5 --threads 4
+    python benchmarks/load_test.py --url http://127.0.0.1:8050 --users 4
+"""
+import argparse
+import collections
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+FIXTURE = os.path.join(HERE, "data", "owid-covid-fixture.csv")
+
+# Interactions generated, with their weights
+KINDS = {
+    "slider": 4,
+    "country_add": 2,
+    "country_remove": 2,
+    "indicator": 2,
+    "tab": 2,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="app to test, by default one is started")
+    parser.add_argument("--source", default=FIXTURE, help="data of the started app")
+    parser.add_argument("--workers", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--interactions", type=int, default=20)
+    parser.add_argument("--think", type=float, default=0.0, help="seconds between")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--save", help="write the interaction sequences")
+    parser.add_argument("--replay", help="play saved interaction sequences")
+    parser.add_argument("--output", help="write the results as JSON")
+    return parser.parse_args()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(args, data_dir):
+    port = free_port()
+    env = dict(
+        os.environ,
+        COVID_DATA_SOURCE=os.path.abspath(args.source),
+        COVID_DATA_DIR=data_dir,
+        COVID_REFRESH_INTERVAL="0",
+    )
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--preload",
+            "--workers={}".format(args.workers),
+            "--threads={}".format(args.threads),
+            "--timeout=300",
+            "-b",
+            "127.0.0.1:{}".format(port),
+            "app:server",
+        ],
+        cwd=SRC,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = "http://127.0.0.1:{}".format(port)
+    while True:
+        try:
+            urllib.request.urlopen(url + "/_dash-layout").read()
+            return process, url
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError("The app did not start")
+            time.sleep(0.1)
+
+
+def get_json(url, timeout):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.load(response)
+
+
+def components(node, tab=None):
+    """Yield the type, props and tab of every component of a layout."""
+    if isinstance(node, list):
+        for child in node:
+            yield from components(child, tab)
+    elif isinstance(node, dict) and "props" in node:
+        props = node["props"]
+        if node.get("type") == "Tab":
+            tab = props.get("tab_id", tab)
+        yield node.get("type"), props, tab
+        for value in props.values():
+            yield from components(value, tab)
+
+
+class Page:
+    """Controls and callbacks of the app, read once"""
+
+    def __init__(self, url, timeout):
+        layout = get_json(url + "/_dash-layout", timeout)
+        self.values = {}
+        # tab of every control with options, None outside the tabs
+        self.controls = {}
+        self.tabs = []
+        for type, props, tab in components(layout):
+            if type == "Tab":
+                self.tabs.append(props["tab_id"])
+            if "id" not in props:
+                continue
+            for prop, value in props.items():
+                if prop not in ("children", "id"):
+                    self.values[props["id"], prop] = value
+            if "options" in props:
+                self.controls[props["id"]] = tab
+            if "active_tab" in props:
+                self.tab_control = props["id"]
+            if isinstance(props.get("value"), list) and "max" in props:
+                self.slider = props["id"]
+
+        self.callbacks = [
+            callback
+            for callback in get_json(url + "/_dash-dependencies", timeout)
+            if not callback.get("clientside_function")
+        ]
+
+
+def output_name(callback):
+    outputs = callback["output"].strip(".").split("...")
+    if len(outputs) == 1:
+        return outputs[0]
+    return "{} (+{})".format(outputs[0], len(outputs) - 1)
+
+
+def generate(page, users, interactions, seed):
+    """Generate the interactions of every user.
+
+    Every interaction is a list of `[id, property, value]` changes.
+    """
+    rng = np.random.default_rng(seed)
+    slider = page.slider
+    low, high = page.values[slider, "min"], page.values[slider, "max"]
+    countries = [
+        option["value"] for option in page.values["country-selector", "options"]
+    ]
+    kinds = list(KINDS)
+    weights = np.array([KINDS[kind] for kind in kinds], dtype=float)
+
+    sessions = []
+    for _ in range(users):
+        active_tab = page.values[page.tab_control, "active_tab"]
+        selected = list(page.values["country-selector", "value"])
+        values = {}
+        session = []
+        while len(session) < interactions:
+            kind = kinds[rng.choice(len(kinds), p=weights / weights.sum())]
+            if kind == "slider":
+                start, end = sorted(rng.integers(low, high + 1, 2).tolist())
+                change = [slider, "value", [start, end]]
+            elif kind == "country_add":
+                unselected = [c for c in countries if c not in selected]
+                if not unselected:
+                    continue
+                selected = selected + [unselected[rng.integers(len(unselected))]]
+                change = ["country-selector", "value", selected]
+            elif kind == "country_remove":
+                if len(selected) <= 1:
+                    continue
+                selected = [c for c in selected if c != rng.choice(selected)]
+                change = ["country-selector", "value", selected]
+            elif kind == "indicator":
+                controls = [
+                    id
+                    for id, tab in page.controls.items()
+                    if tab == active_tab and (id, "value") in page.values
+                ]
+                if not controls:
+                    continue
+                id = controls[rng.integers(len(controls))]
+                current = values.get(id, page.values[id, "value"])
+                options = [
+                    option["value"]
+                    for option in page.values[id, "options"]
+                    if option["value"] != current
+                ]
+                values[id] = options[rng.integers(len(options))]
+                change = [id, "value", values[id]]
+            else:
+                others = [tab for tab in page.tabs if tab != active_tab]
+                active_tab = others[rng.integers(len(others))]
+                change = [page.tab_control, "active_tab", active_tab]
+            session.append([change])
+        sessions.append(session)
+
+    return sessions
+
+
+class Stats:
+    """Latencies and errors per callback output"""
+
+    def __init__(self):
+        self.latencies = collections.defaultdict(list)
+        self.errors = collections.Counter()
+        self.prevented = collections.Counter()
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, status):
+        with self._lock:
+            self.latencies[name].append(seconds)
+            if status is None or status >= 400:
+                self.errors[name] += 1
+            elif status == 204:
+                self.prevented[name] += 1
+
+    def summary(self, elapsed):
+        rows = {}
+        everything = []
+        for name, latencies in sorted(self.latencies.items()):
+            everything.extend(latencies)
+            rows[name] = self._row(latencies, elapsed, self.errors[name])
+            rows[name]["prevented"] = self.prevented[name]
+        rows["all"] = self._row(everything, elapsed, sum(self.errors.values()))
+        rows["all"]["prevented"] = sum(self.prevented.values())
+        return rows
+
+    @staticmethod
+    def _row(latencies, elapsed, errors):
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        return {
+            "requests": len(latencies),
+            "rps": len(latencies) / elapsed,
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+            "errors": errors,
+            "error_rate": errors / len(latencies),
+        }
+
+
+class User:
+    """Browser of one simulated user"""
+
+    def __init__(self, url, page, executor, stats, timeout):
+        self.url = url
+        self.page = page
+        self.executor = executor
+        self.stats = stats
+        self.timeout = timeout
+        self.values = dict(page.values)
+
+    def open(self):
+        # every page load gets its own layout, and session id
+        start = time.perf_counter()
+        try:
+            layout = get_json(self.url + "/_dash-layout", self.timeout)
+            status = 200
+        except (OSError, ValueError) as error:
+            layout, status = None, getattr(error, "code", None)
+        self.stats.add("_dash-layout", time.perf_counter() - start, status)
+        for _, props, _ in components(layout or []):
+            if "id" not in props:
+                continue
+            for prop, value in props.items():
+                if prop not in ("children", "id"):
+                    self.values[props["id"], prop] = value
+        self.call(self.page.callbacks, [])
+
+    def interact(self, changes):
+        changed = []
+        for id, prop, value in changes:
+            self.values[id, prop] = value
+            changed.append("{}.{}".format(id, prop))
+        self.call(self.triggered(changed), changed)
+
+    def triggered(self, changed):
+        return [
+            callback
+            for callback in self.page.callbacks
+            if any(
+                "{}.{}".format(i["id"], i["property"]) in changed
+                for i in callback["inputs"]
+            )
+        ]
+
+    def call(self, callbacks, changed):
+        # the callbacks of one change are requested at once, as in a browser
+        futures = [
+            self.executor.submit(self.request, callback, changed)
+            for callback in callbacks
+        ]
+        updated = []
+        for future in futures:
+            for id, props in future.result().items():
+                for prop, value in props.items():
+                    self.values[id, prop] = value
+                    updated.append("{}.{}".format(id, prop))
+        if updated:
+            self.call(self.triggered(updated), updated)
+
+    def request(self, callback, changed):
+        outputs = [
+            dict(zip(["id", "property"], output.split(".")))
+            for output in callback["output"].strip(".").split("...")
+        ]
+        body = {
+            "output": callback["output"],
+            "outputs": outputs if len(outputs) > 1 else outputs[0],
+            "inputs": [self._value(i) for i in callback["inputs"]],
+            "state": [self._value(s) for s in callback["state"]],
+            "changedPropIds": changed,
+        }
+        request = urllib.request.Request(
+            self.url + "/_dash-update-component",
+            data=json.dumps(body).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        start = time.perf_counter()
+        response = {}
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as reply:
+                status = reply.status
+                content = reply.read()
+            if status == 200:
+                response = json.loads(content)["response"]
+        except urllib.error.HTTPError as error:
+            status = error.code
+        except (OSError, ValueError):
+            status = None
+        self.stats.add(output_name(callback), time.perf_counter() - start, status)
+        return response
+
+    def _value(self, dependency):
+        key = dependency["id"], dependency["property"]
+        return dict(dependency, value=self.values.get(key))
+
+
+def run(url, page, sessions, args):
+    stats = Stats()
+    executor = ThreadPoolExecutor(max(4 * len(sessions), 4))
+
+    def play(session):
+        user = User(url, page, executor, stats, args.timeout)
+        user.open()
+        for changes in session:
+            if args.think:
+                time.sleep(args.think)
+            user.interact(changes)
+
+    threads = [threading.Thread(target=play, args=(s,)) for s in sessions]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    executor.shutdown()
+
+    return elapsed, stats.summary(elapsed)
+
+
+def main():
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        process = None
+        url = args.url
+        if url is None:
+            process, url = serve(args, data_dir)
+        try:
+            page = Page(url, args.timeout)
+            if args.replay:
+                with open(args.replay) as f:
+                    sessions = json.load(f)
+            else:
+                sessions = generate(page, args.users, args.interactions, args.seed)
+            if args.save:
+                with open(args.save, "w") as f:
+                    json.dump(sessions, f)
+            elapsed, rows = run(url, page, sessions, args)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    interactions = sum(len(session) for session in sessions)
+    print(
+        "{} users, {} interactions in {:.1f} s, {:.2f} interactions/s".format(
+            len(sessions), interactions, elapsed, interactions / elapsed
+        )
+    )
+    print(
+        "{:<32}{:>9}{:>8}{:>9}{:>9}{:>9}{:>8}{:>8}{:>8}".format(
+            "output",
+            "requests",
+            "req/s",
+            "p50 ms",
+            "p95 ms",
+            "p99 ms",
+            "204",
+            "errors",
+            "err %",
+        )
+    )
+    for name, row in rows.items():
+        print(
+            "{:<32}{:>9}{:>8.2f}{:>9.0f}{:>9.0f}{:>9.0f}{:>8}{:>8}{:>8.1%}".format(
+                name,
+                row["requests"],
+                row["rps"],
+                row["p50_ms"],
+                row["p95_ms"],
+                row["p99_ms"],
+                row["prevented"],
+                row["errors"],
+                row["error_rate"],
+            )
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "users": len(sessions),
+                    "interactions": interactions,
+                    "seconds": elapsed,
+                    "workers": None if args.url else args.workers,
+                    "threads": None if args.url else args.threads,
+                    "outputs": rows,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
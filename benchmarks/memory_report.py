@@ -0,0 +1,84 @@
+"""Per-worker memory report for the dataset loader modes.
+
+Forks the same number of workers as the Dockerfile runs gunicorn with,
+loads the dataset in each one with `get_data(mode=...)` and prints the
+resident (RSS) and proportional (PSS) set size of every worker while they
+are all alive. PSS splits shared pages between the processes that map
+them, so it is the number that shows the saving of the shared mode.
+
+Usage
+-----
+    python benchmarks/memory_report.py --workers 5 --data-dir /tmp/covid
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+from utility import get_data  # noqa: E402
+
+
+def memory_kb():
+    """Return the (rss, pss) of the current process in kB."""
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key] = int(rest.split()[0])
+    return values["Rss"], values["Pss"]
+
+
+def worker(mode, data_dir, barrier, results):
+    df = get_data(data_dir=data_dir, mode=mode)
+    # touch every column like the callbacks eventually do
+    for column in df.columns:
+        df[column].values.sum() if df[column].dtype.kind == "f" else len(df[column])
+    barrier.wait()
+    results.put(memory_kb())
+    barrier.wait()
+
+
+def report(mode, workers, data_dir):
+    ctx = mp.get_context("fork")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=worker, args=(mode, data_dir, barrier, results))
+        for _ in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    print("mode={} workers={}".format(mode, workers))
+    for i, (rss, pss) in enumerate(rows):
+        print(
+            "  worker {}: rss {:>8.1f} MB  pss {:>8.1f} MB".format(
+                i, rss / 1024, pss / 1024
+            )
+        )
+    print(
+        "  total:    rss {:>8.1f} MB  pss {:>8.1f} MB".format(
+            sum(r for r, _ in rows) / 1024, sum(p for _, p in rows) / 1024
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=5)
+    parser.add_argument("--data-dir", default=None)
+    args = parser.parse_args()
+
+    # build the snapshot and the shared file once, like the gunicorn master does
+    get_data(data_dir=args.data_dir, mode="shared")
+
+    for mode in ("snapshot", "shared"):
+        report(mode, args.workers, args.data_dir)
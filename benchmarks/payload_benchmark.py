@@ -0,0 +1,82 @@
+"""Payload size and build time of the figure callbacks.
+
+Imports `app` with the configured dataset and calls every figure
+callback for one selection (by default all countries over the full
+slider range), printing the serialized size and the server build time.
+The figure cache is cleared before each call so every build is timed.
+
+Usage
+-----
+    COVID_DATA_DIR=/tmp/covid python benchmarks/payload_benchmark.py
+    python benchmarks/payload_benchmark.py --countries Canada France --out /tmp/html
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+import plotly  # noqa: E402
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app  # noqa: E402
+
+
+def payload_bytes(output):
+    if isinstance(output, str):
+        return len(output.encode("utf-8"))
+    return len(json.dumps(output, cls=plotly.utils.PlotlyJSONEncoder).encode("utf-8"))
+
+
+def calls(countries, daterange):
+    return {
+        "map_plot": (app.plot_map, ("new_cases_per_million", countries, daterange)),
+        "line_chart": (
+            app.plot_map_line_chart,
+            ("new_cases_per_million", countries, daterange, "linear", False),
+        ),
+        "chart_1": (app.plot_chart_1, (countries, daterange, "linear")),
+        "chart_2": (app.plot_chart_2, (countries, daterange, "linear")),
+        "chart_3": (app.plot_chart_3, (countries, daterange, "linear")),
+        "chart_4": (app.plot_chart_4, (countries, daterange, "linear")),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--countries", nargs="*", default=[])
+    parser.add_argument("--out", help="directory to write the chart outputs to")
+    args = parser.parse_args()
+
+    daterange = [0, app.data.axis.last]
+    print(
+        "countries={} days={}".format(len(args.countries) or "all", len(app.data.axis))
+    )
+    print("{:>12} {:>12} {:>10}".format("output", "bytes", "build ms"))
+    for name, (func, func_args) in calls(args.countries, daterange).items():
+        app.figure_cache.clear()
+        app.frame_cache.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            output = func(*func_args)
+            elapsed = time.perf_counter() - start
+        print(
+            "{:>12} {:>12} {:>10.1f}".format(
+                name, payload_bytes(output), elapsed * 1000
+            )
+        )
+        if args.out:
+            os.makedirs(args.out, exist_ok=True)
+            ext = "html" if isinstance(output, str) else "json"
+            with open(os.path.join(args.out, "{}.{}".format(name, ext)), "w") as f:
+                f.write(
+                    output
+                    if isinstance(output, str)
+                    else json.dumps(output, cls=plotly.utils.PlotlyJSONEncoder)
+                )
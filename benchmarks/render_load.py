@@ -0,0 +1,167 @@
+"""Throughput and latency of the charts tab as concurrent users scale.
+
+Starts the app under gunicorn for each number of render workers and
+lets `--users` simulated users move the date slider on the charts tab,
+each move a new range so no figure comes from the cache. Reports
+requests per second and p50/p95 latency per number of users.
+
+Usage
+-----
+    COVID_DATA_DIR=/tmp/covid python benchmarks/render_load.py
+    python benchmarks/render_load.py --render-workers 0 4 --users 1 4 16
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+COUNTRIES = ["Canada", "United States", "United Kingdom", "France", "Singapore"]
+
+
+def charts_request(daterange):
+    outputs = ["chart_{}_spec.data".format(i) for i in range(1, 5)]
+    outputs.append("charts_rendered.data")
+    inputs = [
+        ("country-selector", "value", COUNTRIES),
+        ("date_slider", "value", daterange),
+        ("scale-charts-radio", "value", "linear"),
+        ("tabs", "active_tab", "charts-tab"),
+    ]
+    return {
+        "output": "..{}..".format("...".join(outputs)),
+        "outputs": [
+            dict(zip(["id", "property"], output.split("."))) for output in outputs
+        ],
+        "inputs": [
+            {"id": id, "property": prop, "value": value} for id, prop, value in inputs
+        ],
+        "state": [
+            {"id": "charts_rendered", "property": "data", "value": None},
+            {"id": "session", "property": "data", "value": None},
+        ],
+        "changedPropIds": ["date_slider.value"],
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(render_workers, args):
+    port = free_port()
+    env = dict(os.environ, COVID_RENDER_WORKERS=str(render_workers))
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--workers={}".format(args.gunicorn_workers),
+            "--threads={}".format(args.threads),
+            "--timeout=300",
+            "-b",
+            "127.0.0.1:{}".format(port),
+            "app:server",
+        ],
+        cwd=SRC,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = "http://127.0.0.1:{}".format(port)
+    for _ in range(600):
+        try:
+            # the first request also starts the render workers
+            layout = json.load(urllib.request.urlopen(url + "/_dash-layout"))
+            return process, url, slider_max(layout)
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("The app did not start")
+
+
+def slider_max(node):
+    if isinstance(node, dict):
+        if node.get("props", {}).get("id") == "date_slider":
+            return node["props"]["max"]
+        node = list(node.values())
+    if isinstance(node, list):
+        for child in node:
+            found = slider_max(child)
+            if found is not None:
+                return found
+    return None
+
+
+def post(url, body):
+    request = urllib.request.Request(
+        url + "/_dash-update-component",
+        data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    start = time.perf_counter()
+    urllib.request.urlopen(request).read()
+    return time.perf_counter() - start
+
+
+def load(url, users, interactions, last, seed):
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(0, last // 2, size=(users, interactions))
+    latencies = []
+
+    def user(i):
+        for start in starts[i]:
+            latencies.append(post(url, charts_request([int(start), last])))
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return len(latencies) / elapsed, np.percentile(latencies, [50, 95]) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--render-workers", type=int, nargs="+", default=[0, 2])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--interactions", type=int, default=5)
+    parser.add_argument("--gunicorn-workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    print("cpus={}".format(os.cpu_count()))
+    print(
+        "{:>8}{:>7}{:>10}{:>10}{:>10}".format(
+            "workers", "users", "req/s", "p50 ms", "p95 ms"
+        )
+    )
+    for render_workers in args.render_workers:
+        process, url, last = serve(render_workers, args)
+        try:
+            for seed, users in enumerate(args.users):
+                rate, (p50, p95) = load(url, users, args.interactions, last, seed)
+                print(
+                    "{:>8}{:>7}{:>10.2f}{:>10.0f}{:>10.0f}".format(
+                        render_workers, users, rate, p50, p95
+                    )
+                )
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Memory of the compact column types.
+
+Reads the source csv the way the app did before `SCHEMA` (float64
+numbers and object strings) and with `apply_schema`, and prints the
+`memory_usage(deep=True)` of every column for both. That the figures
+are unchanged by the types is checked by `tests/test_schema.py`.
+
+Usage
+-----
+    COVID_DATA_SOURCE=owid-covid-data.csv python benchmarks/schema_report.py
+    python benchmarks/schema_report.py --source owid-covid-data.csv
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+import pandas as pd  # noqa: E402
+from utility import COLUMNS, DATA_URL, apply_schema  # noqa: E402
+
+
+def legacy_frame(source):
+    df = pd.read_csv(source, parse_dates=["date"])
+    df = df[COLUMNS].fillna(value=0)
+    df = df[~df["iso_code"].str.startswith("OWID")]
+    return df.sort_values("date")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default=DATA_URL, help="OWID csv URL or path")
+    args = parser.parse_args()
+
+    legacy = legacy_frame(args.source)
+    typed = apply_schema(legacy)
+
+    before = legacy.memory_usage(deep=True, index=False)
+    after = typed.memory_usage(deep=True, index=False)
+    print("rows={}".format(len(legacy)))
+    print("{:<36}{:>16}{:>12}{:>12}".format("column", "dtype", "before", "after"))
+    for column in typed.columns:
+        print(
+            "{:<36}{:>16}{:>12,}{:>12,}".format(
+                column,
+                str(typed[column].dtype),
+                int(before.get(column, 0)),
+                int(after[column]),
+            )
+        )
+    print(
+        "{:<36}{:>16}{:>12,}{:>12,}  ({:.1f}x smaller)".format(
+            "total", "", int(before.sum()), int(after.sum()), before.sum() / after.sum()
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Micro-benchmarks of data loading, filtering and every figure.
+
+Runs offline against the OWID-shaped fixture bundled in
+`benchmarks/data`, or for scaling curves against a synthetic source
+such as `synthetic:locations=2000,days=1500` (see `src/synthetic.py`),
+with the warm-up and the render workers off, and times:
+
+- `load.*`: reading the source with `read_source`, and `get_data` from the
+  parquet snapshot and from the shared Arrow file;
+- `filter.*`: `filter_data` on the data store, over country and date
+  selections of different sizes;
+- `<plot>.*`: each of `plot_map`, `plot_map_line_chart` and
+  `plot_chart_1`..`plot_chart_4` end to end, filtering included (the
+  frame and figure caches are bypassed) and the result serialized as
+  Dash sends it. The payload bytes are recorded too.
+
+Every benchmark runs once untimed, then `--repeat` times. The results
+are written as JSON to `--output`. With `--compare`, the medians and
+payload sizes are compared to an earlier results file and the
+benchmarks more than `--threshold` slower or larger are flagged; the
+script then exits with status 1.
+
+Usage
+-----
+    python benchmarks/suite.py
+    python benchmarks/suite.py --source synthetic:locations=500,days=1000
+    python benchmarks/suite.py --repeat 10 --output /tmp/after.json \\
+        --compare /tmp/before.json --threshold 0.1
+"""
+import argparse
+import contextlib
+import datetime
+import hashlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+FIXTURE = os.path.join(HERE, "data", "owid-covid-fixture.csv")
+RESULTS = os.path.join(HERE, "results")
+
+DEFAULT = ["Canada", "United States", "United Kingdom", "France", "Singapore"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--source", default=FIXTURE, help="OWID csv file or synthetic source"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--output", help="results file, by default in {}".format(RESULTS)
+    )
+    parser.add_argument("--compare", help="earlier results file")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--filter", default="", help="only benchmarks containing this")
+    return parser.parse_args()
+
+
+def measure(func, repeat):
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {
+        "runs": repeat,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "stdev": statistics.stdev(times) if repeat > 1 else 0.0,
+    }
+
+
+def selections(app):
+    last = app.data.axis.last
+    return {
+        "default": (DEFAULT, [0, last]),
+        "all": ([], [0, last]),
+        "one_90d": (["Canada"], [max(last - 90, 0), last]),
+        "default_1d": (DEFAULT, [last, last]),
+    }
+
+
+def benchmarks(app, utility, source, data_dir):
+    """Yield the name, function and payload of every benchmark."""
+    from dash._utils import to_json
+
+    yield "load.source", lambda: utility.read_source(source), None
+    yield "load.snapshot", lambda: utility.get_data(
+        data_dir=data_dir, mode="snapshot"
+    ), None
+    yield "load.shared", lambda: utility.get_data(
+        data_dir=data_dir, mode="shared"
+    ), None
+
+    for name, (countries, daterange) in selections(app).items():
+        date_from, date_to = app.data.axis.range(daterange)
+
+        def run(date_from=date_from, date_to=date_to, countries=countries):
+            return utility.filter_data(
+                app.data.store,
+                date_from=date_from,
+                date_to=date_to,
+                countries=countries,
+            )
+
+        yield "filter." + name, run, None
+
+    jobs = app.render_pool.jobs
+    for name, (countries, daterange) in selections(app).items():
+        figures = {
+            "plot_map": ("new_cases_per_million", countries, daterange),
+            "plot_map_line_chart": (
+                "new_cases_per_million",
+                countries,
+                daterange,
+                "linear",
+            ),
+        }
+        for i in range(1, 5):
+            figures["plot_chart_{}".format(i)] = (countries, daterange, "linear")
+
+        for plot, args in figures.items():
+
+            def run(plot=plot, args=args):
+                app.frame_cache.clear()
+                return to_json(jobs[plot](*args))
+
+            yield "{}.{}".format(plot, name), run, run
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=HERE,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment(source):
+    import altair
+    import dash
+    import pandas
+    import pyarrow
+
+    if source.startswith("synthetic:"):
+        source_sha1 = hashlib.sha1(source.encode()).hexdigest()[:12]
+    else:
+        with open(source, "rb") as f:
+            source_sha1 = hashlib.sha1(f.read()).hexdigest()[:12]
+
+    return {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "source": os.path.basename(source),
+        "source_sha1": source_sha1,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pandas": pandas.__version__,
+        "pyarrow": pyarrow.__version__,
+        "altair": altair.__version__,
+        "dash": dash.__version__,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print the changes from `baseline` and return the regressions."""
+    regressions = []
+    print()
+    print(
+        "{:<32}{:>12}{:>12}{:>9}{:>12}{:>12}".format(
+            "benchmark", "before ms", "after ms", "change", "before B", "after B"
+        )
+    )
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = result["median"] / before["median"] - 1
+        flags = []
+        if change > threshold:
+            flags.append("slower")
+        if result.get("bytes") and before.get("bytes"):
+            if result["bytes"] > before["bytes"] * (1 + threshold):
+                flags.append("larger")
+        if flags:
+            regressions.append(name)
+        print(
+            "{:<32}{:>12.2f}{:>12.2f}{:>+8.0%}{:>12}{:>12}  {}".format(
+                name,
+                before["median"] * 1000,
+                result["median"] * 1000,
+                change,
+                before.get("bytes") or "",
+                result.get("bytes") or "",
+                " ".join(flags),
+            )
+        )
+    return regressions
+
+
+def main():
+    args = parse_args()
+    source = args.source
+    if not source.startswith("synthetic:"):
+        source = os.path.abspath(source)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        # the app loads its data when imported
+        os.environ.update(
+            COVID_DATA_SOURCE=source,
+            COVID_DATA_DIR=data_dir,
+            COVID_DATA_MODE="snapshot",
+            COVID_WARMUP="off",
+            COVID_RENDER_WORKERS="0",
+            COVID_REFRESH_INTERVAL="0",
+        )
+        sys.path.insert(0, SRC)
+        with contextlib.redirect_stdout(io.StringIO()):
+            import app
+        import utility
+
+        results = {}
+        print(
+            "{:<32}{:>10}{:>10}{:>12}".format(
+                "benchmark", "min ms", "median ms", "bytes"
+            )
+        )
+        for name, func, payload in benchmarks(app, utility, source, data_dir):
+            if args.filter not in name:
+                continue
+            result = measure(func, args.repeat)
+            if payload is not None:
+                result["bytes"] = len(payload())
+            results[name] = result
+            print(
+                "{:<32}{:>10.2f}{:>10.2f}{:>12}".format(
+                    name,
+                    result["min"] * 1000,
+                    result["median"] * 1000,
+                    result.get("bytes", ""),
+                )
+            )
+
+    report = {"environment": environment(source), "results": results}
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS, exist_ok=True)
+        output = os.path.join(
+            RESULTS,
+            "{}-{}.json".format(
+                datetime.datetime.now().strftime("%Y%m%d-%H%M%S"),
+                report["environment"]["commit"] or "unknown",
+            ),
+        )
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print("\nResults written to {}".format(output))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if (
+            baseline["environment"].get("source_sha1")
+            != report["environment"]["source_sha1"]
+        ):
+            print("Warning: the results are for different data")
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(
+                "\n{} regression(s) above {:.0%}: {}".format(
+                    len(regressions), args.threshold, ", ".join(regressions)
+                )
+            )
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
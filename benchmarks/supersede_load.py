@@ -0,0 +1,160 @@
+"""Slider drags against the ASGI app, with and without superseding.
+
+Drives `asgi.application` in-process from an asyncio load generator:
+each of `--sessions` sessions moves the charts tab date slider
+`--moves` times, `--interval` ms apart, without waiting for the
+responses, as the browser does while a slider is dragged. When the
+requests of a drag share the session id of the page, each one
+supersedes the previous ones, which are cancelled (204) rather than
+built; with a new session id per request nothing is superseded, as
+before. Reports the responses, the cancelled builds and the latency of
+the last move of each drag, the one the user ends up looking at.
+
+Usage
+-----
+    COVID_DATA_DIR=/tmp/covid python benchmarks/supersede_load.py
+    python benchmarks/supersede_load.py --sessions 4 --moves 8 --render-workers 0
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+COUNTRIES = ["Canada", "United States", "United Kingdom", "France", "Singapore"]
+
+
+def charts_request(daterange, session):
+    outputs = ["chart_{}_spec.data".format(i) for i in range(1, 5)]
+    outputs.append("charts_rendered.data")
+    inputs = [
+        ("country-selector", "value", COUNTRIES),
+        ("date_slider", "value", daterange),
+        ("scale-charts-radio", "value", "linear"),
+        ("tabs", "active_tab", "charts-tab"),
+    ]
+    return {
+        "output": "..{}..".format("...".join(outputs)),
+        "outputs": [
+            dict(zip(["id", "property"], output.split("."))) for output in outputs
+        ],
+        "inputs": [
+            {"id": id, "property": prop, "value": value} for id, prop, value in inputs
+        ],
+        "state": [
+            {"id": "charts_rendered", "property": "data", "value": None},
+            {"id": "session", "property": "data", "value": session},
+        ],
+        "changedPropIds": ["date_slider.value"],
+    }
+
+
+async def post(application, body):
+    content = json.dumps(body).encode()
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/_dash-update-component",
+        "query_string": b"",
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(content)).encode()),
+        ],
+        "server": ("127.0.0.1", 8000),
+        "client": ("127.0.0.1", 50000),
+    }
+    messages = [{"type": "http.request", "body": content, "more_body": False}]
+    status = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    start = time.perf_counter()
+    await application(scope, receive, send)
+    return status[0], time.perf_counter() - start
+
+
+async def drag(application, session, starts, last, interval):
+    tasks = []
+    for start in starts:
+        sid = session or uuid.uuid4().hex
+        body = charts_request([start, last], sid)
+        tasks.append(asyncio.create_task(post(application, body)))
+        await asyncio.sleep(interval)
+    return await asyncio.gather(*tasks)
+
+
+async def run(app, application, args, superseding, offset):
+    last = app.data.axis.last
+    drags = [
+        drag(
+            application,
+            uuid.uuid4().hex if superseding else None,
+            [offset + 20 * session + move for move in range(args.moves)],
+            last,
+            args.interval / 1000,
+        )
+        for session in range(args.sessions)
+    ]
+    start = time.perf_counter()
+    results = await asyncio.gather(*drags)
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--moves", type=int, default=6)
+    parser.add_argument("--interval", type=float, default=100, help="ms")
+    parser.add_argument("--render-workers", type=int, default=2)
+    args = parser.parse_args()
+
+    os.environ["COVID_RENDER_WORKERS"] = str(args.render_workers)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+        from asgi import application
+
+    app.render_pool.start()
+
+    print(
+        "{:<14}{:>6}{:>6}{:>11}{:>10}{:>15}".format(
+            "", "200", "204", "cancelled", "wall s", "last move p50"
+        )
+    )
+    for offset, superseding in enumerate([False, True]):
+        app.figure_cache.clear()
+        cancelled = app.latest_requests.cancelled
+        with contextlib.redirect_stdout(io.StringIO()):
+            results, wall = asyncio.run(
+                run(app, application, args, superseding, offset)
+            )
+        statuses = [status for result in results for status, _ in result]
+        last_move = sorted(result[-1][1] * 1000 for result in results)
+        print(
+            "{:<14}{:>6}{:>6}{:>11}{:>10.2f}{:>15.0f}".format(
+                "superseding" if superseding else "queued",
+                statuses.count(200),
+                statuses.count(204),
+                app.latest_requests.cancelled - cancelled,
+                wall,
+                last_move[len(last_move) // 2],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Server time per interaction of a user staying on one tab.
+
+Posts the three tab callbacks to `/_dash-update-component`, as the
+browser does when the date slider moves, for a series of random
+slider ranges. With the active tab set to each callback's own tab,
+every tab renders, as all tabs did before rendering was tab aware;
+with a single active tab the hidden tabs return at once.
+
+Usage
+-----
+    COVID_DATA_DIR=/tmp/covid python benchmarks/tabs_benchmark.py
+    python benchmarks/tabs_benchmark.py --interactions 20 --tab charts-tab
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+)
+
+import numpy as np  # noqa: E402
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import app  # noqa: E402
+
+COUNTRIES = ["Canada", "United States", "United Kingdom", "France", "Singapore"]
+
+
+def requests(daterange, active_tab=None):
+    def body(tab_id, outputs, inputs, rendered):
+        inputs = inputs + [("tabs", "active_tab", active_tab or tab_id)]
+        return {
+            "output": "..{}..".format(
+                "...".join("{}.{}".format(*output) for output in outputs)
+            ),
+            "outputs": [{"id": id, "property": prop} for id, prop in outputs],
+            "inputs": [
+                {"id": id, "property": prop, "value": value}
+                for id, prop, value in inputs
+            ],
+            "state": [
+                {"id": rendered, "property": "data", "value": None},
+                {"id": "session", "property": "data", "value": None},
+            ],
+            "changedPropIds": ["date_slider.value"],
+        }
+
+    return [
+        body(
+            "map-tab",
+            [("map_plot", "figure"), ("map_rendered", "data")],
+            [
+                ("feature_dropdown", "value", "new_cases_per_million"),
+                ("country-selector", "value", COUNTRIES),
+                ("date_slider", "value", daterange),
+            ],
+            "map_rendered",
+        ),
+        body(
+            "line-tab",
+            [("line_chart_spec", "data"), ("line_rendered", "data")],
+            [
+                ("feature_dropdown2", "value", "new_cases_per_million"),
+                ("country-selector", "value", COUNTRIES),
+                ("date_slider", "value", daterange),
+                ("scale-map-line-radio", "value", "linear"),
+                ("points_option", "value", False),
+            ],
+            "line_rendered",
+        ),
+        body(
+            "charts-tab",
+            [("chart_{}_spec".format(i), "data") for i in range(1, 5)]
+            + [("charts_rendered", "data")],
+            [
+                ("country-selector", "value", COUNTRIES),
+                ("date_slider", "value", daterange),
+                ("scale-charts-radio", "value", "linear"),
+            ],
+            "charts_rendered",
+        ),
+    ]
+
+
+def run(client, ranges, active_tab):
+    statuses = []
+    start = time.perf_counter()
+    for daterange in ranges:
+        for body in requests(daterange, active_tab):
+            with contextlib.redirect_stdout(io.StringIO()):
+                response = client.post("/_dash-update-component", json=body)
+            statuses.append(response.status_code)
+    return (time.perf_counter() - start) * 1000 / len(ranges), statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--interactions", type=int, default=10)
+    parser.add_argument(
+        "--tab", default="map-tab", choices=["map-tab", "line-tab", "charts-tab"]
+    )
+    args = parser.parse_args()
+
+    client = app.server.test_client()
+    rng = np.random.default_rng(0)
+    last = app.data.axis.last
+    starts = rng.integers(0, last // 2, size=2 * args.interactions)
+    ranges = [[int(start), last] for start in starts]
+
+    every, statuses = run(client, ranges[: args.interactions], None)
+    assert set(statuses) == {200}, statuses
+    single, statuses = run(client, ranges[args.interactions :], args.tab)
+
+    print("{:<24}{:>14}".format("tabs rendered", "ms/interaction"))
+    print("{:<24}{:>14.1f}".format("all (before)", every))
+    print("{:<24}{:>14.1f}".format(args.tab + " only", single))
+    print("skipped callbacks (204): {}".format(statuses.count(204)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Latency percentiles per figure and stage from a trace log.
+
+Reads the JSON lines the app appends to `COVID_TRACE_LOG` and prints,
+for every figure, the p50 and p95 of its build time in a request and
+of each of its stages, slowest p95 first, then the same for the
+callback requests.
+
+Usage
+-----
+    COVID_TRACE_LOG=/tmp/covid-trace.jsonl gunicorn app:server
+    python benchmarks/trace_report.py /tmp/covid-trace.jsonl
+"""
+import argparse
+import collections
+import json
+
+import numpy as np
+
+
+def percentiles(values):
+    return np.percentile(values, [50, 95]) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("trace_log")
+    args = parser.parse_args()
+
+    requests = collections.defaultdict(list)
+    figures = collections.defaultdict(list)
+    stages = collections.defaultdict(list)
+    with open(args.trace_log) as f:
+        for line in f:
+            trace = json.loads(line)
+            requests[trace["callback"], trace["status"]].append(trace["seconds"])
+            totals = collections.Counter()
+            for figure, stage, seconds in trace["stages"]:
+                stages[figure, stage].append(seconds)
+                totals[figure] += seconds
+            for figure, seconds in totals.items():
+                figures[figure].append(seconds)
+
+    print(
+        "{:<24}{:>8}{:>10}{:>10}".format("figure / stage", "builds", "p50 ms", "p95 ms")
+    )
+    by_p95 = sorted(figures, key=lambda figure: -percentiles(figures[figure])[1])
+    for figure in by_p95:
+        p50, p95 = percentiles(figures[figure])
+        print(
+            "{:<24}{:>8}{:>10.1f}{:>10.1f}".format(
+                figure, len(figures[figure]), p50, p95
+            )
+        )
+        for (name, stage), values in stages.items():
+            if name == figure:
+                p50, p95 = percentiles(values)
+                print(
+                    "{:<24}{:>8}{:>10.1f}{:>10.1f}".format(
+                        "  " + stage, len(values), p50, p95
+                    )
+                )
+
+    print()
+    print("{:<24}{:>8}{:>10}{:>10}".format("callback", "requests", "p50 ms", "p95 ms"))
+    for (callback, status), values in sorted(requests.items()):
+        p50, p95 = percentiles(values)
+        print(
+            "{:<24}{:>8}{:>10.1f}{:>10.1f}".format(
+                "{} ({})".format(callback, status), len(values), p50, p95
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Latency of the first requests after a restart, with and without warm-up.
+
+Starts the app under gunicorn with `--preload`, as the Dockerfile does,
+once with `COVID_WARMUP=off` and once with `COVID_WARMUP=sync`, with a
+selection log in which one selection is popular. Then opens every tab
+for the default countries and for the popular selection, and times
+those first requests, then the same requests again once the figures
+are cached (the warm steady state). Also reports the time until the
+server answered.
+
+Usage
+-----
+    COVID_DATA_DIR=/tmp/covid python benchmarks/warmup_benchmark.py
+    python benchmarks/warmup_benchmark.py --workers 5
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+DEFAULT = ["Canada", "United States", "United Kingdom", "France", "Singapore"]
+
+
+def tab_requests(countries, last):
+    daterange = [0, last]
+    tabs = [
+        (
+            "map-tab",
+            ["map_plot.figure", "map_rendered.data"],
+            [
+                ("feature_dropdown", "value", "new_cases_per_million"),
+                ("country-selector", "value", countries),
+                ("date_slider", "value", daterange),
+            ],
+            "map_rendered",
+        ),
+        (
+            "line-tab",
+            ["line_chart_spec.data", "line_rendered.data"],
+            [
+                ("feature_dropdown2", "value", "new_cases_per_million"),
+                ("country-selector", "value", countries),
+                ("date_slider", "value", daterange),
+                ("scale-map-line-radio", "value", "linear"),
+                ("points_option", "value", False),
+            ],
+            "line_rendered",
+        ),
+        (
+            "charts-tab",
+            ["chart_{}_spec.data".format(i) for i in range(1, 5)]
+            + ["charts_rendered.data"],
+            [
+                ("country-selector", "value", countries),
+                ("date_slider", "value", daterange),
+                ("scale-charts-radio", "value", "linear"),
+            ],
+            "charts_rendered",
+        ),
+    ]
+    for tab_id, outputs, inputs, rendered in tabs:
+        inputs = inputs + [("tabs", "active_tab", tab_id)]
+        yield {
+            "output": "..{}..".format("...".join(outputs)),
+            "outputs": [
+                dict(zip(["id", "property"], output.split("."))) for output in outputs
+            ],
+            "inputs": [
+                {"id": id, "property": prop, "value": value}
+                for id, prop, value in inputs
+            ],
+            "state": [
+                {"id": rendered, "property": "data", "value": None},
+                {"id": "session", "property": "data", "value": None},
+            ],
+            "changedPropIds": ["tabs.active_tab"],
+        }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def slider_max(node):
+    if isinstance(node, dict):
+        if node.get("props", {}).get("id") == "date_slider":
+            return node["props"]["max"]
+        node = list(node.values())
+    if isinstance(node, list):
+        for child in node:
+            found = slider_max(child)
+            if found is not None:
+                return found
+    return None
+
+
+def post(url, body):
+    request = urllib.request.Request(
+        url + "/_dash-update-component",
+        data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    start = time.perf_counter()
+    urllib.request.urlopen(request).read()
+    return (time.perf_counter() - start) * 1000
+
+
+def visit(url, countries, last):
+    return sum(post(url, body) for body in tab_requests(countries, last))
+
+
+def run(mode, args, log):
+    port = free_port()
+    env = dict(os.environ, COVID_WARMUP=mode, COVID_SELECTION_LOG=log)
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--preload",
+            "--workers={}".format(args.workers),
+            "-b",
+            "127.0.0.1:{}".format(port),
+            "app:server",
+        ],
+        cwd=SRC,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = "http://127.0.0.1:{}".format(port)
+    try:
+        while True:
+            try:
+                layout = json.load(urllib.request.urlopen(url + "/_dash-layout"))
+                break
+            except OSError:
+                if process.poll() is not None:
+                    raise RuntimeError("The app did not start")
+                time.sleep(0.1)
+        ready = time.perf_counter() - start
+        last = slider_max(layout)
+
+        first = [visit(url, countries, last) for countries in (DEFAULT, args.popular)]
+        warm = [visit(url, countries, last) for countries in (DEFAULT, args.popular)]
+    finally:
+        process.terminate()
+        process.wait()
+
+    return ready, first, warm
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--popular", nargs="+", default=["India", "Japan"])
+    args = parser.parse_args()
+
+    print(
+        "{:<8}{:>9}{:>16}{:>16}{:>16}{:>16}".format(
+            "warm-up",
+            "ready s",
+            "default 1st ms",
+            "default warm ms",
+            "popular 1st ms",
+            "popular warm ms",
+        )
+    )
+    for mode in ["off", "sync"]:
+        with tempfile.TemporaryDirectory() as directory:
+            log = os.path.join(directory, "selections.jsonl")
+            with open(log, "w") as f:
+                f.write(json.dumps(sorted(args.popular)) + "\n")
+                f.write(json.dumps(["Canada"]) + "\n")
+                f.write(json.dumps(sorted(args.popular)) + "\n")
+            ready, first, warm = run(mode, args, log)
+        print(
+            "{:<8}{:>9.1f}{:>16.0f}{:>16.0f}{:>16.0f}{:>16.0f}".format(
+                mode, ready, first[0], warm[0], first[1], warm[1]
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,71 +1,149 @@
-from dash import Dash, html, dcc, Input, Output
+from dash import Dash, html, dcc, Input, Output, State, ClientsideFunction
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
+import contextlib
+import contextvars
+import flask
+import json
 import locale
+import os
+import threading
+import time
+import uuid
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 import altair as alt
-import datetime
-import pandas as pd
-from utility import get_data, filter_data
-import plotly.graph_objects as go
-import plotly_express as px
-from datetime import datetime
+from utility import get_data, filter_data, ROLLING_SUFFIX
+from dataset import Dataset
+from refresh import Refresher
+from cache import LRUCache, make_cache, memoize, normalize
+from downsample import downsample
+from vegaspec import SpecTemplate
+from choropleth import choropleth_figure
+from render import RenderPool, in_worker
+from supersede import LatestRequests, Superseded, check
+from warmup import SelectionLog
+from metrics import Registry, SIZE_BUCKETS, stopwatch, tracing
 
 ### App setup codes
 
 alt.data_transformers.disable_max_rows()
 
-df = get_data()
-daterange = [x for x in range(len(df["date"].unique()))]
-month_index = pd.date_range(
-    start=df["date"].dt.date.unique()[0], end=df["date"].dt.date.unique()[-1], freq="2M"
+# Indicators of the line charts, their 8-day rolling means are computed once here
+indicators = [
+    "total_cases",
+    "total_cases_per_million",
+    "new_cases",
+    "new_cases_per_million",
+    "total_deaths",
+    "total_deaths_per_million",
+    "new_deaths",
+    "new_deaths_per_million",
+    "people_fully_vaccinated",
+    "new_vaccinations",
+    "icu_patients_per_million",
+    "hosp_patients_per_million",
+]
+
+data = Dataset(get_data(), indicators)
+
+# Filtered frames and rendered figures, keyed on the normalized callback inputs
+cache_ttl = float(os.environ.get("COVID_CACHE_TTL", 600))
+frame_cache = LRUCache(
+    maxsize=int(os.environ.get("COVID_FRAME_CACHE_SIZE", 16)),
+    ttl=cache_ttl,
+    version=data.version,
+)
+# The figure cache can be shared by the workers with the 'file' or 'redis' backend
+figure_cache = make_cache(
+    os.environ.get("COVID_CACHE_BACKEND", "memory"),
+    maxsize=int(os.environ.get("COVID_FIGURE_CACHE_SIZE", 256)),
+    ttl=cache_ttl,
+    version=data.version,
+    directory=os.environ.get("COVID_CACHE_DIR", "/tmp/covid-dashboard-cache"),
+    max_bytes=int(os.environ.get("COVID_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+    url=os.environ.get("COVID_REDIS_URL", "redis://localhost:6379/0"),
 )
-month_index = month_index - pd.offsets.MonthBegin()
 
-marks = {
-    numd: date.strftime("%Y-%m-%d")
-    for numd, date in zip(daterange, df["date"].dt.date.unique())
-}
+# Map animation frame step: 'auto', 'day', 'week' or 'month'
+map_frame_step = os.environ.get("COVID_MAP_FRAME_STEP", "auto")
 
-marks_display = {}
-marks_display.update(
-    {
-        0: {
-            "label": datetime.strptime(marks.get(0), "%Y-%m-%d").strftime("%y/%m"),
-            "style": {
-                "color": "#77b0b1",
-            },
-        }
-    }
-)
+# Latest request of every session and tab, earlier ones stop at checkpoints
+latest_requests = LatestRequests()
 
-last_index = len(marks) - 1
 
-for key, item in marks.items():
-    if key != 0 and item in month_index and last_index - key > 30 and key - 0 > 10:
-        marks_display.update(
-            {
-                key: {
-                    "label": datetime.strptime(item, "%Y-%m-%d").strftime("%y/%m"),
-                    "style": {
-                        "color": "#77b0b1",
-                    },
-                }
-            }
+def check_dataset(version):
+    # A render worker loads the data from disk when it imports this module,
+    # which is the data of the app process unless that swapped in a frame
+    # it did not write
+    if data.version != version:
+        warnings.warn(
+            "Render worker data {} differs from the app data {}".format(
+                data.version, version
+            )
         )
 
 
-marks_display.update(
-    {
-        last_index: {
-            "label": datetime.strptime(marks.get(last_index), "%Y-%m-%d").strftime(
-                "%y/%m"
-            ),
-            "style": {
-                "color": "#77b0b1",
-            },
-        }
-    }
+# Worker processes building the figures, 0 builds them in the callbacks
+render_workers = int(os.environ.get("COVID_RENDER_WORKERS", 0))
+render_pool = RenderPool(
+    workers=render_workers,
+    timeout=float(os.environ.get("COVID_RENDER_TIMEOUT", 30)),
+    max_pending=int(os.environ.get("COVID_RENDER_QUEUE", 0)) or None,
+    warmup=lambda: warm_render(),
+    checkpoint=check,
+    state=lambda: (data.version,),
+    restore=check_dataset,
+)
+
+# Threads building the four charts of the charts tab, 1 builds them in turn.
+# With render workers the threads only wait on the four jobs.
+chart_threads = int(os.environ.get("COVID_CHART_THREADS", 4 if render_workers else 1))
+chart_executor = ThreadPoolExecutor(chart_threads) if chart_threads > 1 else None
+
+
+# Figures rendered before the first requests: 'off' by default, so that
+# importing the app stays cheap; 'sync' at import, for gunicorn --preload
+# where the workers fork with them (see the Dockerfile); 'background' in
+# a thread. The default view is warmed for the default countries and the
+# most popular selections of the log.
+warmup_mode = "off" if in_worker() else os.environ.get("COVID_WARMUP", "off")
+warmup_popular = int(os.environ.get("COVID_WARMUP_POPULAR", 3))
+selection_log = SelectionLog(os.environ.get("COVID_SELECTION_LOG"))
+
+
+def swap_dataset(df):
+    # The callbacks read `data` once, so the reference is replaced before
+    # the cache versions: a callback starting in between stores its result
+    # under the old version, which is never read again.
+    global data
+    new_data = Dataset(df, indicators)
+    data = new_data
+    # the render workers hold the data they started with
+    render_pool.restart()
+    frame_cache.version = figure_cache.version = new_data.version
+    if warmup_mode != "off":
+        warm_cache()
+
+
+# Background refresh of the data, every COVID_REFRESH_INTERVAL seconds
+refresher = Refresher(
+    swap_dataset,
+    interval=float(os.environ.get("COVID_REFRESH_INTERVAL", 0)),
+    source=os.environ.get("COVID_REFRESH_SOURCE"),
+    lookback=int(os.environ.get("COVID_REFRESH_LOOKBACK", 14)),
 )
 
+
+@memoize(frame_cache)
+def select_data(countries, daterange):
+    current = data
+    date_from, date_to = current.axis.range(daterange)
+    return filter_data(
+        current.store, date_from=date_from, date_to=date_to, countries=countries
+    )
+
+
 ### App setup codes end
 
 ### Selection modules
@@ -128,10 +206,10 @@ feature_dropdown2 = dcc.Dropdown(
 # Date slider
 date_slider = dcc.RangeSlider(
     id="date_slider",
-    min=daterange[0],
-    max=daterange[-1],
-    value=[daterange[0], daterange[-1]],
-    marks=marks_display,
+    min=0,
+    max=data.axis.last,
+    value=[0, data.axis.last],
+    marks=data.marks,
 )
 
 # Data scale radio button for line chart in map tab
@@ -171,7 +249,7 @@ scale_charts_radio = dbc.RadioItems(
 country_selector = dcc.Dropdown(
     id="country-selector",
     multi=True,
-    options=[{"label": x, "value": x} for x in df.location.sort_values().unique()],
+    options=[{"label": x, "value": x} for x in data.locations],
     value=["Canada", "United States", "United Kingdom", "France", "Singapore"],
 )
 
@@ -408,14 +486,17 @@ line_tab = dbc.Row(
         dbc.Col(
             dbc.Toast(
                 dcc.Loading(
-                    html.Iframe(
-                        id="line_chart",
-                        style={
-                            "height": "70vh",
-                            "width": "100%",
-                            "textAlign": "center",
-                        },
-                    ),
+                    [
+                        html.Div(
+                            id="line_chart",
+                            style={
+                                "height": "70vh",
+                                "width": "100%",
+                                "textAlign": "center",
+                            },
+                        ),
+                        dcc.Store(id="line_chart_spec"),
+                    ]
                 ),
                 style={"height": "550px", "width": "950px"},
             ),
@@ -467,17 +548,20 @@ charts_tab = (
                             ),
                             dbc.Toast(
                                 dcc.Loading(
-                                    html.Iframe(
-                                        id="chart_1",
-                                        style={
-                                            "display": "block",
-                                            "overflow": " hidden",
-                                            # "margin": "auto",
-                                            "border-width": "0",
-                                            "width": "550px",
-                                            "height": "500px",
-                                        },
-                                    ),
+                                    [
+                                        html.Div(
+                                            id="chart_1",
+                                            style={
+                                                "display": "block",
+                                                "overflow": " hidden",
+                                                # "margin": "auto",
+                                                "border-width": "0",
+                                                "width": "550px",
+                                                "height": "500px",
+                                            },
+                                        ),
+                                        dcc.Store(id="chart_1_spec"),
+                                    ]
                                 ),
                                 style={"width": "550px", "height": "480px"},
                             ),
@@ -495,17 +579,20 @@ charts_tab = (
                             ),
                             dbc.Toast(
                                 dcc.Loading(
-                                    html.Iframe(
-                                        id="chart_2",
-                                        style={
-                                            "display": "block",
-                                            "overflow": " hidden",
-                                            # "margin": "auto",
-                                            "border-width": "0",
-                                            "width": "550px",
-                                            "height": "500px",
-                                        },
-                                    ),
+                                    [
+                                        html.Div(
+                                            id="chart_2",
+                                            style={
+                                                "display": "block",
+                                                "overflow": " hidden",
+                                                # "margin": "auto",
+                                                "border-width": "0",
+                                                "width": "550px",
+                                                "height": "500px",
+                                            },
+                                        ),
+                                        dcc.Store(id="chart_2_spec"),
+                                    ]
                                 ),
                                 style={"width": "550px", "height": "480px"},
                             ),
@@ -528,17 +615,20 @@ charts_tab = (
                             ),
                             dbc.Toast(
                                 dcc.Loading(
-                                    html.Iframe(
-                                        id="chart_3",
-                                        style={
-                                            "display": "block",
-                                            "overflow": " hidden",
-                                            # "margin": "auto",
-                                            "border-width": "0",
-                                            "width": "550px",
-                                            "height": "500px",
-                                        },
-                                    ),
+                                    [
+                                        html.Div(
+                                            id="chart_3",
+                                            style={
+                                                "display": "block",
+                                                "overflow": " hidden",
+                                                # "margin": "auto",
+                                                "border-width": "0",
+                                                "width": "550px",
+                                                "height": "500px",
+                                            },
+                                        ),
+                                        dcc.Store(id="chart_3_spec"),
+                                    ]
                                 ),
                                 style={"width": "550px", "height": "480px"},
                             ),
@@ -556,17 +646,20 @@ charts_tab = (
                             ),
                             dbc.Toast(
                                 dcc.Loading(
-                                    html.Iframe(
-                                        id="chart_4",
-                                        style={
-                                            "display": "block",
-                                            "overflow": " hidden",
-                                            # "margin": "auto",
-                                            "border-width": "0",
-                                            "width": "550px",
-                                            "height": "500px",
-                                        },
-                                    ),
+                                    [
+                                        html.Div(
+                                            id="chart_4",
+                                            style={
+                                                "display": "block",
+                                                "overflow": " hidden",
+                                                # "margin": "auto",
+                                                "border-width": "0",
+                                                "width": "550px",
+                                                "height": "500px",
+                                            },
+                                        ),
+                                        dcc.Store(id="chart_4_spec"),
+                                    ]
                                 ),
                                 style={"width": "550px", "height": "480px"},
                             ),
@@ -582,11 +675,119 @@ charts_tab = (
 
 
 # Setup app and layout/ frontend
-app = Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])
+# Vega libraries of the client-side chart renderer in assets/vega_charts.js
+vega_scripts = [
+    "https://cdn.jsdelivr.net/npm/vega@{}".format(alt.VEGA_VERSION),
+    "https://cdn.jsdelivr.net/npm/vega-lite@{}".format(alt.VEGALITE_VERSION),
+    "https://cdn.jsdelivr.net/npm/vega-embed@{}".format(alt.VEGAEMBED_VERSION),
+]
+
+app = Dash(
+    __name__, external_stylesheets=[dbc.themes.FLATLY], external_scripts=vega_scripts
+)
 app.title = "World COVID-19 Dashboard"
 server = app.server
+server.before_request(refresher.start)
+server.before_request(render_pool.start)
+
+# Latency, payload size and build stages of the callback requests, on
+# /metrics. With COVID_METRICS_DIR the workers report through a shared
+# directory, so any of them answers for all. COVID_TRACE_LOG appends the
+# stages of every callback request to a file as JSON lines.
+metrics = Registry(directory=os.environ.get("COVID_METRICS_DIR"))
+callback_seconds = metrics.histogram(
+    "covid_callback_seconds",
+    "Server time of a callback request",
+    ["callback", "status"],
+)
+payload_bytes = metrics.histogram(
+    "covid_callback_payload_bytes",
+    "Size of a callback response",
+    ["callback"],
+    SIZE_BUCKETS,
+)
+figure_seconds = metrics.histogram(
+    "covid_figure_seconds", "Time building a figure in a request", ["figure"]
+)
+stage_seconds = metrics.histogram(
+    "covid_figure_stage_seconds",
+    "Time of a stage of building a figure",
+    ["figure", "stage"],
+)
+cache_events = metrics.counter(
+    "covid_cache_events_total", "Lookups and builds of the caches", ["cache", "event"]
+)
+trace_log = os.environ.get("COVID_TRACE_LOG")
+trace_lock = threading.Lock()
+
+
+@metrics.collector
+def collect_cache_events():
+    for name, cache in [("figure", figure_cache), ("frame", frame_cache)]:
+        stats = cache.stats()
+        for event in ["hits", "misses", "evictions", "executed", "coalesced"]:
+            cache_events.set(stats[event], name, event)
+
+
+@server.before_request
+def start_trace():
+    if flask.request.path != "/_dash-update-component":
+        return
+    flask.g.trace = contextlib.ExitStack()
+    flask.g.stages = flask.g.trace.enter_context(tracing())
+    flask.g.started = time.perf_counter()
+
+
+@server.after_request
+def record_trace(response):
+    if "started" not in flask.g:
+        return response
+    seconds = time.perf_counter() - flask.g.started
+    body = flask.request.get_json(silent=True) or {}
+    # the first output of the callback names it, e.g. 'map_plot'
+    callback = body.get("output", "").strip(".").split(".")[0]
+    size = response.calculate_content_length() or 0
+
+    callback_seconds.observe(seconds, callback, str(response.status_code))
+    if response.status_code == 200:
+        payload_bytes.observe(size, callback)
+    totals = {}
+    for figure, stage, elapsed in flask.g.stages:
+        stage_seconds.observe(elapsed, figure, stage)
+        totals[figure] = totals.get(figure, 0) + elapsed
+    for figure, elapsed in totals.items():
+        figure_seconds.observe(elapsed, figure)
+    metrics.dump()
+
+    if trace_log is not None:
+        line = json.dumps(
+            {
+                "time": time.time(),
+                "callback": callback,
+                "status": response.status_code,
+                "seconds": seconds,
+                "bytes": size,
+                "stages": flask.g.stages,
+            }
+        )
+        with trace_lock, open(trace_log, "a") as f:
+            f.write(line + "\n")
+
+    return response
+
 
-app.layout = dbc.Container(
+@server.teardown_request
+def end_trace(error=None):
+    if "trace" in flask.g:
+        flask.g.trace.close()
+
+
+@server.route("/metrics")
+def serve_metrics():
+    return flask.Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+layout = dbc.Container(
     [
         dbc.Row(
             [
@@ -644,8 +845,14 @@ app.layout = dbc.Container(
                                             label="Vaccination and Hospitalization Indicators",
                                             tab_id="charts-tab",
                                         ),
-                                    ]
+                                    ],
+                                    id="tabs",
+                                    active_tab="map-tab",
                                 ),
+                                # inputs and data version each tab was last rendered with
+                                dcc.Store(id="map_rendered"),
+                                dcc.Store(id="line_rendered"),
+                                dcc.Store(id="charts_rendered"),
                             ]
                         )
                     ],
@@ -672,101 +879,135 @@ app.layout = dbc.Container(
     fluid=True,
 )
 
+
+def serve_layout():
+    # Built on every page load, so new visitors get the slider range and
+    # countries of the latest refresh
+    current = data
+    date_slider.max = current.axis.last
+    date_slider.value = [0, current.axis.last]
+    date_slider.marks = current.marks
+    country_selector.options = [{"label": x, "value": x} for x in current.locations]
+    # a new session id on every page load
+    return html.Div([layout, dcc.Store(id="session", data=uuid.uuid4().hex)])
+
+
+app.layout = serve_layout
+
+
+def render_state(inputs):
+    # What a tab shows: its inputs and the version of the data, so a tab
+    # rendered before a data refresh is rendered again when shown
+    return {"version": data.version, "inputs": inputs}
+
+
+def skip_render(tab_id, active_tab, rendered, state):
+    # A hidden tab keeps its stale outputs, it is rendered when shown
+    # unless it already shows the current state
+    return active_tab != tab_id or rendered == state
+
+
+@contextlib.contextmanager
+def latest_render(session, tab_id):
+    # A newer request of the session for the tab stops this one, the
+    # browser would only display the newest response anyway
+    if session is None:
+        yield
+        return
+    try:
+        with latest_requests.track((session, tab_id)):
+            yield
+    except Superseded:
+        raise PreventUpdate
+
+
 # Map plot sample
 @app.callback(
-    Output("map_plot", "figure"),
+    [Output("map_plot", "figure"), Output("map_rendered", "data")],
     [
         Input("feature_dropdown", "value"),
         Input("country-selector", "value"),
         Input("date_slider", "value"),
         # Input("scale_radio", "value"),
+        Input("tabs", "active_tab"),
     ],
+    [State("map_rendered", "data"), State("session", "data")],
 )
+def update_map(ycol, countries, daterange, active_tab, rendered, session):
+    inputs = [ycol, countries, daterange]
+    state = render_state(inputs)
+    if skip_render("map-tab", active_tab, rendered, state):
+        raise PreventUpdate
+
+    selection_log.record(countries)
+    with latest_render(session, "map-tab"):
+        return plot_map(ycol, countries, daterange), state
+
+
+@memoize(figure_cache)
+@render_pool.job
 def plot_map(ycol, countries, daterange):
 
     if daterange is None:
-        daterange.append(0)
-        daterange.append(list(marks.keys())[-1])
-
-    filter_df = filter_data(
-        df,
-        date_from=marks.get(daterange[0]),
-        date_to=marks.get(daterange[1]),
-        countries=countries,
-    )
+        daterange = [0, data.axis.last]
 
-    filter_df["count"] = filter_df[ycol]
-    filter_df["date_str"] = filter_df["date"].apply(lambda x: str(x))
-
-    fig = px.choropleth(
-        data_frame=filter_df,
-        locations="iso_code",
-        hover_name="location",
-        color=ycol,
-        animation_frame="date_str",
-        animation_group=ycol,
-        color_continuous_scale=px.colors.sequential.deep,
-        labels={ycol: " "},
-    )
+    lap = stopwatch("map")
+    filter_df = select_data(countries, daterange)
+    lap("filter")
 
-    fig.update_layout(
-        geo=dict(
-            showframe=False, showcoastlines=False, projection_type="equirectangular"
-        )
-    )
+    figure = choropleth_figure(filter_df, ycol, step=map_frame_step)
+    lap("build")
 
-    fig.layout.updatemenus[0].buttons[0].args[1]["frame"]["duration"] = 50
-    fig.layout.updatemenus[0].buttons[0].args[1]["transition"]["duration"] = 50
-
-    return fig
+    return figure
 
 
 # Map line chart
 @app.callback(
-    Output("line_chart", "srcDoc"),
+    [Output("line_chart_spec", "data"), Output("line_rendered", "data")],
     [
         Input("feature_dropdown2", "value"),
         Input("country-selector", "value"),
         Input("date_slider", "value"),
         Input("scale-map-line-radio", "value"),
         Input("points_option", "value"),
+        Input("tabs", "active_tab"),
     ],
+    [State("line_rendered", "data"), State("session", "data")],
 )
-def plot_map_line_chart(ycol, countries, daterange, scale, points_option=False):
+def update_line_chart(
+    ycol, countries, daterange, scale, points_option, active_tab, rendered, session
+):
+    inputs = [ycol, countries, daterange, scale, points_option]
+    state = render_state(inputs)
+    if skip_render("line-tab", active_tab, rendered, state):
+        raise PreventUpdate
 
-    if daterange is None:
-        daterange.append(0)
-        daterange.append(list(marks.keys())[-1])
-
-    filter_df = filter_data(
-        df,
-        date_from=marks.get(daterange[0]),
-        date_to=marks.get(daterange[1]),
-        countries=countries,
-    )
+    selection_log.record(countries)
+    with latest_render(session, "line-tab"):
+        return plot_map_line_chart(*inputs), state
 
-    filter_df["count"] = filter_df[ycol]
 
-    click = alt.selection_multi(fields=["location"], bind="legend")
+def line_chart_template(points_option):
+    # Line chart of the map tab, without data. The tooltip shows `count`,
+    # the selected indicator, so the spec does not depend on it.
+    click = alt.selection_point(fields=["location"], bind="legend")
 
     line = (
-        alt.Chart(filter_df)
+        alt.Chart()
         .mark_line()
-        .transform_window(
-            rolling_mean="mean(count)",
-            frame=[-7, 0],
-            groupby=["location"],
-        )
         .encode(
             y=alt.Y(
                 "rolling_mean:Q",
-                scale=alt.Scale(domainMin=0, type=scale),
+                scale=alt.Scale(domainMin=0, type="linear"),
                 title="",
             ),
-            x="date",
-            tooltip=["location", alt.Tooltip(ycol, title="count")],
+            x="date:T",
+            tooltip=[
+                "location:N",
+                alt.Tooltip("count:Q", title="count"),
+            ],
             color=alt.Color(
-                "location",
+                "location:N",
                 legend=alt.Legend(
                     title="",
                     orient="none",
@@ -780,113 +1021,100 @@ def plot_map_line_chart(ycol, countries, daterange, scale, points_option=False):
         )
     )
 
-    chart = None
-
     points = (
-        alt.Chart(filter_df)
+        alt.Chart()
         .mark_circle(size=5, opacity=0.4)
         .encode(
             y=alt.Y(
                 "count:Q",
-                scale=alt.Scale(domainMin=0, type=scale),
+                scale=alt.Scale(domainMin=0, type="linear"),
                 title="",
             ),
-            x="date",
-            tooltip=["location", alt.Tooltip(ycol, title="count")],
-            color=alt.Color("location"),
+            x="date:T",
+            tooltip=[
+                "location:N",
+                alt.Tooltip("count:Q", title="count"),
+            ],
+            color=alt.Color("location:N"),
             opacity=alt.condition(click, alt.value(0.9), alt.value(0.2)),
         )
     )
 
-    if points_option == False:
-        chart = (
-            line.properties(width=800, height=400)
-            .add_selection(click)
-            .interactive()
-            .configure_title(
-                fontSize=15,
-                anchor="start",
-            )
-            .configure_legend(title=None)
+    chart = alt.layer(points, line) if points_option else line
+    chart = (
+        chart.properties(width=800, height=400)
+        .add_params(click)
+        .interactive()
+        .configure_title(
+            fontSize=15,
+            anchor="start",
         )
+        .configure_legend(title=None)
+    )
 
-    elif points_option == True:
-        chart = (
-            alt.layer(points, line)
-            .properties(width=800, height=400)
-            .add_selection(click)
-            .interactive()
-            .configure_title(
-                fontSize=15,
-                anchor="start",
-            )
-            .configure_legend(title=None)
-        )
+    return SpecTemplate(chart)
+
+
+line_chart_templates = {
+    False: line_chart_template(False),
+    True: line_chart_template(True),
+}
+
+
+@memoize(figure_cache)
+@render_pool.job
+def plot_map_line_chart(ycol, countries, daterange, scale, points_option=False):
+
+    if daterange is None:
+        daterange = [0, data.axis.last]
+
+    lap = stopwatch("line_chart")
+    df = select_data(countries, daterange)
+    lap("filter")
+
+    filter_df = line_chart_templates[bool(points_option)].project(df)
+    filter_df["count"] = df[ycol]
+    filter_df["rolling_mean"] = df[ycol + ROLLING_SUFFIX]
+    filter_df = downsample(filter_df, width=800)
+    lap("derive")
+
+    payload = line_chart_templates[bool(points_option)].payload(filter_df, scale)
+    lap("serialize")
 
-    return chart.to_html()
+    return payload
 
 
 @app.callback(Output("date_display", "children"), Input("date_slider", "value"))
 def update_output(value):
     template = " Date range: {} to {}"
 
+    labels = data.axis.labels
+
     if value is None:
-        value = []
-        value.append(0)
-        value.append(list(marks.keys())[-1])
+        value = [0, len(labels) - 1]
 
-    output_string = template.format(marks.get(value[0]), marks.get(value[1]))
+    output_string = template.format(labels[value[0]], labels[value[1]])
 
     return output_string
 
 
-# line chart 1
-@app.callback(
-    Output("chart_1", "srcDoc"),
-    [
-        Input("country-selector", "value"),
-        Input("date_slider", "value"),
-        Input("scale-charts-radio", "value"),
-    ],
-)
-def plot_chart_1(countries, daterange, scale):
-
-    if daterange is None:
-        daterange.append(0)
-        daterange.append(list(marks.keys())[-1])
-
-    filter_df = filter_data(
-        df,
-        date_from=marks.get(daterange[0]),
-        date_to=marks.get(daterange[1]),
-        countries=countries,
-    )
-
-    filter_df["count"] = filter_df["people_fully_vaccinated"] / 1000000
-
-    click = alt.selection_multi(fields=["location"], bind="legend")
+def chart_template(title, tooltip):
+    # The four charts of the Charts tab, without data
+    click = alt.selection_point(fields=["location"], bind="legend")
 
     chart = (
-        alt.Chart(filter_df)
+        alt.Chart()
         .mark_line()
-        .transform_window(
-            rolling_mean="mean(count)",
-            frame=[-7, 0],
-            groupby=["location"],
-        )
         .encode(
             y=alt.Y(
                 "rolling_mean:Q",
-                scale=alt.Scale(domainMin=0, type=scale),
-                title="People fully vaccinated",
+                scale=alt.Scale(domainMin=0, type="linear"),
+                title=title,
             ),
-            x="date",
-            tooltip=[
-                "location",
-                alt.Tooltip("people_fully_vaccinated", title="People fully vaccinated"),
-            ],
+            x="date:T",
+            tooltip=["location:N", tooltip],
             color=alt.Color(
-                "location",
+                "location:N",
                 legend=alt.Legend(
                     title="",
                     orient="none",
@@ -898,11 +1126,8 @@ def plot_chart_1(countries, daterange, scale):
             ),
             opacity=alt.condition(click, alt.value(0.9), alt.value(0.2)),
         )
-        .properties(
-            width=400,
-            height=300,  # title=f"Country Data for people fully vaccinated"
-        )
-        .add_selection(click)
+        .properties(width=400, height=300)
+        .add_params(click)
         .interactive()
         .configure_title(
             fontSize=15,
@@ -910,230 +1135,217 @@ def plot_chart_1(countries, daterange, scale):
         )
     )
 
-    return chart.to_html()
+    return SpecTemplate(chart)
 
 
-# line chart 2
-@app.callback(
-    Output("chart_2", "srcDoc"),
-    [
-        Input("country-selector", "value"),
-        Input("date_slider", "value"),
-        Input("scale-charts-radio", "value"),
-    ],
-)
-def plot_chart_2(countries, daterange, scale):
+# The chart specs are built and validated once, the callbacks only add
+# the data and the scale type
+chart_templates = {
+    1: chart_template(
+        "People fully vaccinated",
+        alt.Tooltip("people_fully_vaccinated:Q", title="People fully vaccinated"),
+    ),
+    2: chart_template(
+        "People newly vaccinated",
+        alt.Tooltip("new_vaccinations:Q", title="People newly vaccinated"),
+    ),
+    3: chart_template(
+        "ICU patients per million",
+        alt.Tooltip("icu_patients_per_million:Q", title="count"),
+    ),
+    4: chart_template(
+        "Hospitalized patients per million",
+        alt.Tooltip("hosp_patients_per_million:Q", title="count"),
+    ),
+}
 
+
+def plot_chart(figure, template, column, divisor, countries, daterange, scale):
+    # Payload of a chart of the Charts tab, the rolling mean of `column`
+    # divided by `divisor`
     if daterange is None:
-        daterange.append(0)
-        daterange.append(list(marks.keys())[-1])
-
-    filter_df = filter_data(
-        df,
-        date_from=marks.get(daterange[0]),
-        date_to=marks.get(daterange[1]),
-        countries=countries,
-    )
+        daterange = [0, data.axis.last]
 
-    filter_df["count"] = filter_df["new_vaccinations"] / 1000000
+    lap = stopwatch(figure)
+    df = select_data(countries, daterange)
+    lap("filter")
 
-    click = alt.selection_multi(fields=["location"], bind="legend")
+    filter_df = template.project(df)
+    filter_df["rolling_mean"] = df[column + ROLLING_SUFFIX] / divisor
+    filter_df = downsample(filter_df, width=400)
+    lap("derive")
 
-    chart = (
-        alt.Chart(filter_df)
-        .mark_line()
-        .transform_window(
-            rolling_mean="mean(count)",
-            frame=[-7, 0],
-            groupby=["location"],
-        )
-        .encode(
-            y=alt.Y(
-                "rolling_mean:Q",
-                scale=alt.Scale(domainMin=0, type=scale),
-                title="People newly vaccinated",
-            ),
-            x="date",
-            tooltip=[
-                "location",
-                alt.Tooltip("new_vaccinations", title="People newly vaccinated"),
-            ],
-            color=alt.Color(
-                "location",
-                legend=alt.Legend(
-                    title="",
-                    orient="none",
-                    direction="horizontal",
-                    legendX=0,
-                    legendY=-50,
-                    columns=4,
-                ),
-            ),
-            opacity=alt.condition(click, alt.value(0.9), alt.value(0.2)),
-        )
-        .properties(
-            width=400,
-            height=300,  # title=f"Country Data for people newly vaccinated"
-        )
-        .add_selection(click)
-        .interactive()
-        .configure_title(
-            fontSize=15,
-            anchor="start",
-        )
-    )
+    payload = template.payload(filter_df, scale)
+    lap("serialize")
 
-    return chart.to_html()
+    return payload
 
 
-# Chart 3
-@app.callback(
-    Output("chart_3", "srcDoc"),
-    [
-        Input("country-selector", "value"),
-        Input("date_slider", "value"),
-        Input("scale-charts-radio", "value"),
-    ],
-)
-def plot_chart_3(countries, daterange, scale):
+@memoize(figure_cache)
+@render_pool.job
+def plot_chart_1(countries, daterange, scale):
+    return plot_chart(
+        "chart_1",
+        chart_templates[1],
+        "people_fully_vaccinated",
+        1000000,
+        countries,
+        daterange,
+        scale,
+    )
 
-    ycol = "icu_patients_per_million"
 
-    if daterange is None:
-        daterange.append(0)
-        daterange.append(list(marks.keys())[-1])
-
-    filter_df = filter_data(
-        df,
-        date_from=marks.get(daterange[0]),
-        date_to=marks.get(daterange[1]),
-        countries=countries,
+@memoize(figure_cache)
+@render_pool.job
+def plot_chart_2(countries, daterange, scale):
+    return plot_chart(
+        "chart_2",
+        chart_templates[2],
+        "new_vaccinations",
+        1000000,
+        countries,
+        daterange,
+        scale,
     )
 
-    filter_df["count"] = filter_df["icu_patients_per_million"]
-
-    click = alt.selection_multi(fields=["location"], bind="legend")
 
-    chart = (
-        alt.Chart(filter_df)
-        .mark_line()
-        .transform_window(
-            rolling_mean="mean(count)",
-            frame=[-7, 0],
-            groupby=["location"],
-        )
-        .encode(
-            y=alt.Y(
-                "rolling_mean:Q",
-                scale=alt.Scale(domainMin=0, type=scale),
-                title="ICU patients per million",
-            ),
-            x="date",
-            tooltip=[
-                "location",
-                alt.Tooltip("icu_patients_per_million", title="count"),
-            ],
-            color=alt.Color(
-                "location",
-                legend=alt.Legend(
-                    title="",
-                    orient="none",
-                    direction="horizontal",
-                    legendX=0,
-                    legendY=-50,
-                    columns=4,
-                ),
-            ),
-            opacity=alt.condition(click, alt.value(0.9), alt.value(0.2)),
-        )
-        .properties(
-            width=400,
-            height=300,
-            # title=f"Country Data for ICU patients per million people",
-        )
-        .add_selection(click)
-        .interactive()
-        .configure_title(
-            fontSize=15,
-            anchor="start",
-        )
+@memoize(figure_cache)
+@render_pool.job
+def plot_chart_3(countries, daterange, scale):
+    return plot_chart(
+        "chart_3",
+        chart_templates[3],
+        "icu_patients_per_million",
+        1,
+        countries,
+        daterange,
+        scale,
     )
 
-    return chart.to_html()
+
+@memoize(figure_cache)
+@render_pool.job
+def plot_chart_4(countries, daterange, scale):
+    return plot_chart(
+        "chart_4",
+        chart_templates[4],
+        "hosp_patients_per_million",
+        1,
+        countries,
+        daterange,
+        scale,
+    )
 
 
-# Chart 4
+# Charts tab, the four charts share one request and one filtered frame
 @app.callback(
-    Output("chart_4", "srcDoc"),
+    [Output("chart_{}_spec".format(i), "data") for i in range(1, 5)]
+    + [Output("charts_rendered", "data")],
     [
         Input("country-selector", "value"),
         Input("date_slider", "value"),
         Input("scale-charts-radio", "value"),
+        Input("tabs", "active_tab"),
     ],
+    [State("charts_rendered", "data"), State("session", "data")],
 )
-def plot_chart_4(countries, daterange, scale):
+def update_charts(countries, daterange, scale, active_tab, rendered, session):
+    inputs = [countries, daterange, scale]
+    state = render_state(inputs)
+    if skip_render("charts-tab", active_tab, rendered, state):
+        raise PreventUpdate
 
-    if daterange is None:
-        daterange.append(0)
-        daterange.append(list(marks.keys())[-1])
-
-    filter_df = filter_data(
-        df,
-        date_from=marks.get(daterange[0]),
-        date_to=marks.get(daterange[1]),
-        countries=countries,
-    )
+    selection_log.record(countries)
+    with latest_render(session, "charts-tab"):
+        return plot_charts(countries, daterange, scale) + [state]
 
-    filter_df["count"] = filter_df["hosp_patients_per_million"]
 
-    click = alt.selection_multi(fields=["location"], bind="legend")
+def plot_charts(countries, daterange, scale):
 
-    chart = (
-        alt.Chart(filter_df)
-        .mark_line()
-        .transform_window(
-            rolling_mean="mean(count)",
-            frame=[-7, 0],
-            groupby=["location"],
-        )
-        .encode(
-            y=alt.Y(
-                "rolling_mean:Q",
-                scale=alt.Scale(domainMin=0, type=scale),
-                title="Hospitalized patients per million",
-            ),
-            x="date",
-            tooltip=[
-                "location",
-                alt.Tooltip("hosp_patients_per_million", title="count"),
-            ],
-            color=alt.Color(
-                "location",
-                legend=alt.Legend(
-                    title="",
-                    orient="none",
-                    direction="horizontal",
-                    legendX=0,
-                    legendY=-50,
-                    columns=4,
-                ),
-            ),
-            opacity=alt.condition(click, alt.value(0.9), alt.value(0.2)),
-        )
-        .properties(
-            width=400,
-            height=300,
-            # title=f"Country Data for hospitalized patients per million people",
-        )
-        .add_selection(click)
-        .interactive()
-        .configure_title(
-            fontSize=15,
-            anchor="start",
+    if daterange is None:
+        daterange = [0, data.axis.last]
+
+    # filter once, the charts then read the frame from the frame cache
+    if not render_pool.workers:
+        select_data(countries, daterange)
+
+    charts = [plot_chart_1, plot_chart_2, plot_chart_3, plot_chart_4]
+    if chart_executor is None:
+        payloads = []
+        for plot in charts:
+            check()
+            payloads.append(plot(countries, daterange, scale))
+        return payloads
+
+    # each thread gets a copy of the context, to check the same request
+    contexts = [contextvars.copy_context() for _ in charts]
+    return list(
+        chart_executor.map(
+            lambda context, plot: context.run(plot, countries, daterange, scale),
+            contexts,
+            charts,
         )
     )
 
-    return chart.to_html()
+
+def warm_render():
+    # Build every figure once for one day, so a render worker takes its
+    # first jobs with the plotly templates and the chart specs ready
+    countries, daterange = list(data.locations[:1]), [0, 0]
+    jobs = render_pool.jobs
+    jobs["plot_map"]("new_cases_per_million", countries, daterange)
+    jobs["plot_map_line_chart"]("new_cases_per_million", countries, daterange, "linear")
+    for name in ["plot_chart_1", "plot_chart_2", "plot_chart_3", "plot_chart_4"]:
+        jobs[name](countries, daterange, "linear")
+
+
+def warm_views(countries):
+    # Figures of the first view of every indicator and scale
+    daterange = [0, data.axis.last]
+    for option in feature_dropdown.options:
+        yield plot_map, (option["value"], countries, daterange)
+    for scale in scale_map_line_radio.options:
+        for option in feature_dropdown2.options:
+            yield plot_map_line_chart, (
+                option["value"],
+                countries,
+                daterange,
+                scale["value"],
+                points_option.value,
+            )
+    for scale in scale_charts_radio.options:
+        for plot in [plot_chart_1, plot_chart_2, plot_chart_3, plot_chart_4]:
+            yield plot, (countries, daterange, scale["value"])
+
+
+def warm_cache():
+    # Render the first views into the figure cache, in this process even
+    # with render workers, which start with the first request
+    selections = [country_selector.value] + selection_log.popular(warmup_popular)
+    warmed = set()
+    with render_pool.inline():
+        for countries in selections:
+            if normalize(countries) in warmed:
+                continue
+            warmed.add(normalize(countries))
+            for plot, args in warm_views(countries):
+                plot(*args)
+
+
+if warmup_mode == "sync":
+    warm_cache()
+elif warmup_mode == "background":
+    threading.Thread(target=warm_cache, name="covid-warmup", daemon=True).start()
+
+
+# Render the Altair chart payloads in place in the browser
+for chart_id in ["line_chart", "chart_1", "chart_2", "chart_3", "chart_4"]:
+    app.clientside_callback(
+        ClientsideFunction(namespace="charts", function_name="render"),
+        Output(chart_id, "title"),
+        Input(chart_id + "_spec", "data"),
+        State(chart_id, "id"),
+    )
 
 
 if __name__ == "__main__":
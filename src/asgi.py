@@ -0,0 +1,61 @@
+import asyncio
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from app import refresher, render_pool, server
+
+
+class Lifespan:
+    """Run blocking startup hooks on the ASGI lifespan startup
+
+    Under gunicorn the data refresher and the render workers start with
+    the first request (`server.before_request`); an ASGI server says
+    when it starts, so they start then instead and a worker does not
+    accept requests before its render workers are up.
+
+    Parameters
+    ----------
+    app : callable
+        The ASGI app serving the other scopes.
+    *startup : callable
+        Functions run in a thread, in order, on startup.
+
+    Examples
+    --------
+    >>> application = Lifespan(WSGIMiddleware(server), render_pool.start)
+    """
+
+    def __init__(self, app, *startup):
+        self.app = app
+        self.startup = startup
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "lifespan":
+            return await self.app(scope, receive, send)
+
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    for start in self.startup:
+                        await loop.run_in_executor(None, start)
+                except Exception as error:
+                    await send(
+                        {"type": "lifespan.startup.failed", "message": repr(error)}
+                    )
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+# The handlers stay synchronous: a2wsgi runs every request in a thread of
+# its pool, as `gunicorn -k gthread --threads` does
+application = Lifespan(
+    WSGIMiddleware(server, workers=int(os.environ.get("COVID_ASGI_THREADS", 32))),
+    refresher.start,
+    render_pool.start,
+)
@@ -0,0 +1,86 @@
+// Client-side renderer of the Altair charts.
+// The server sends each chart as a Vega-Lite spec reading the named data
+// source of the payload plus its data as compact columns (see vegaspec.py).
+// A chart is embedded once per spec; later payloads with the same key only
+// replace the data of the existing view, so it updates in place.
+
+(function () {
+    var views = {};
+
+    function decode(payload) {
+        var names = Object.keys(payload.columns);
+        var columns = names.map(function (name) {
+            var column = payload.columns[name];
+            if (column.steps !== undefined) {
+                // days from the origin, as local midnights like Vega parses
+                // the dates of ISO strings without a time zone
+                var origin = column.origin.split("-").map(Number);
+                var day = 0;
+                return column.steps.map(function (step) {
+                    day += step;
+                    return new Date(origin[0], origin[1] - 1, origin[2] + day);
+                });
+            }
+            if (column.codes === undefined) {
+                return column.values;
+            }
+            return column.codes.map(function (code) {
+                return code < 0 ? null : column.dictionary[code];
+            });
+        });
+
+        var rows = new Array(payload.length);
+        for (var i = 0; i < payload.length; i++) {
+            var row = {};
+            for (var j = 0; j < names.length; j++) {
+                row[names[j]] = columns[j][i];
+            }
+            rows[i] = row;
+        }
+        return rows;
+    }
+
+    function render(payload, id) {
+        var no_update = window.dash_clientside.no_update;
+        var element = document.getElementById(id);
+        if (!payload || !element) {
+            return no_update;
+        }
+
+        var rows = decode(payload);
+        var current = views[id];
+
+        if (current && current.key === payload.key && current.element === element) {
+            if (current.view === null) {
+                // still embedding, the new rows are inserted once it is done
+                current.rows = rows;
+                return no_update;
+            }
+            current.view
+                .change(payload.name, vega.changeset().remove(vega.truthy).insert(rows))
+                .resize()
+                .runAsync();
+            return no_update;
+        }
+
+        if (current && current.view !== null) {
+            current.view.finalize();
+        }
+        var state = {key: payload.key, element: element, view: null, rows: rows};
+        views[id] = state;
+
+        vegaEmbed(element, payload.spec, {actions: false}).then(function (result) {
+            if (views[id] === state) {
+                state.view = result.view;
+                result.view.insert(payload.name, state.rows).runAsync();
+            } else {
+                result.view.finalize();
+            }
+        });
+        return no_update;
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        charts: {render: render},
+    });
+})();
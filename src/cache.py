@@ -0,0 +1,547 @@
+import contextlib
+import functools
+import hashlib
+import math
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+_MISSING = object()
+
+# Lock files of a `FileCache`, keys are spread over this many
+LEASE_STRIPES = 256
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = _MISSING
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Share one computation between concurrent identical calls
+
+    The first call of a key runs the function, the calls of the same key
+    arriving while it runs wait for it and get its result. When the
+    function raises, the waiting calls run it again themselves rather
+    than sharing an error that may be particular to the first caller.
+
+    Attributes
+    ----------
+    executed : int
+        Calls that ran their function.
+    coalesced : int
+        Calls that got the result of another call.
+
+    Examples
+    --------
+    >>> flight = SingleFlight()
+    >>> flight.do(("plot_map", "new_cases"), lambda: 1)
+    1
+    """
+
+    def __init__(self):
+        self.executed = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def record(self, coalesced):
+        """Count a call that got another result, or ran its function."""
+        with self._lock:
+            if coalesced:
+                self.coalesced += 1
+            else:
+                self.executed += 1
+
+    def waiting(self, key=None):
+        """Number of calls waiting on the running call of `key`, or on
+        any running call."""
+        with self._lock:
+            if key is None:
+                return sum(call.waiters for call in self._calls.values())
+            call = self._calls.get(key)
+            return 0 if call is None else call.waiters
+
+    def do(self, key, func):
+        """Return `func()`, or the result of the running call of `key`."""
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                else:
+                    call.waiters += 1
+            if leader:
+                break
+            call.done.wait()
+            if call.value is not _MISSING:
+                self.record(coalesced=True)
+                return call.value
+
+        try:
+            call.value = func()
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+
+class Cache:
+    """Base class of the cache backends
+
+    Every key is prefixed with `version` before it reaches the backend,
+    so that changing the version invalidates all entries at once; the
+    stale entries are left to the eviction of the backend. Subclasses
+    implement `_load`, `_store` and `_clear`.
+
+    Parameters
+    ----------
+    version : str, optional
+        Version of the data the cached values are built from, by default ''.
+    """
+
+    def __init__(self, version=""):
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flight = SingleFlight()
+        self._lock = threading.Lock()
+
+    def _key(self, key, version=None):
+        if version is None:
+            version = self.version
+        return (version,) + tuple(key)
+
+    def _load(self, key):
+        raise NotImplementedError
+
+    def _store(self, key, value):
+        raise NotImplementedError
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def _size(self):
+        return None
+
+    def get(self, key, default=None, version=None):
+        """Get a cached value, or `default` when missing or expired.
+
+        `version` overrides the current version of the cache.
+        """
+        value = self._load(self._key(key, version))
+        with self._lock:
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return value
+
+    def set(self, key, value, version=None):
+        """Store a value under `key`, `version` overrides the current one."""
+        self._store(self._key(key, version), value)
+
+    def clear(self):
+        """Drop every entry, the counters are kept."""
+        self._clear()
+
+    def lease(self, key, version=None):
+        """Context in which only one process at a time builds `key`.
+
+        Backends shared by several processes override it, the base cache
+        is private to its process and has nothing to wait for.
+        """
+        return contextlib.nullcontext()
+
+    def stats(self):
+        """Get the hit, miss, eviction, executed and coalesced counters
+        and the current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "executed": self.flight.executed,
+            "coalesced": self.flight.coalesced,
+            "size": self._size(),
+        }
+
+
+class LRUCache(Cache):
+    """Bounded in-process cache with least recently used eviction
+
+    Entries older than `ttl` seconds are treated as missing. All
+    operations are guarded by a lock, so the cache can be shared by the
+    threads of one worker.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        Maximum number of entries, by default 128.
+    ttl : float, optional
+        Time to live of an entry in seconds.
+        By default 'None' is used to keep entries until they are evicted.
+    version : str, optional
+        Version of the cached data, by default ''.
+
+    Examples
+    --------
+    >>> cache = LRUCache(maxsize=2)
+    >>> cache.set(("a",), 1)
+    >>> cache.get(("a",))
+    1
+    """
+
+    def __init__(self, maxsize=128, ttl=None, version=""):
+        super().__init__(version)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _load(self, key):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return _MISSING
+            expires, value = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def _store(self, key, value):
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def _clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _size(self):
+        return len(self._data)
+
+
+def _digest(key):
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+
+class FileCache(Cache):
+    """Cache shared by the workers of a host through a directory
+
+    Values are pickled into one file per key. Files are written under a
+    temporary name and renamed in place, so a worker never reads a
+    partial value. When the directory grows over `max_bytes` the least
+    recently used files are removed; reading a value refreshes its
+    modification time. `lease` locks one of `LEASE_STRIPES` lock files
+    of the directory, so the workers of a host build a key only once.
+
+    Parameters
+    ----------
+    directory : str
+        Directory holding the cache files, created if missing.
+    max_bytes : int, optional
+        Size bound of the directory, by default 256 MB.
+    ttl : float, optional
+        Time to live of an entry in seconds.
+        By default 'None' is used to keep entries until they are evicted.
+    version : str, optional
+        Version of the cached data, by default ''.
+
+    Examples
+    --------
+    >>> cache = FileCache("/tmp/covid-cache")
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, ttl=None, version=""):
+        super().__init__(version)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, _digest(key) + ".pkl")
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".pkl"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _load(self, key):
+        path = self._path(key)
+        try:
+            if self.ttl is not None and os.path.getmtime(path) + self.ttl < time.time():
+                return _MISSING
+            with open(path, "rb") as f:
+                stored_key, value = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return _MISSING
+        if stored_key != key:
+            return _MISSING
+        return value
+
+    def _store(self, key, value):
+        path = self._path(key)
+        tmp_path = "{}.{}.{}.tmp".format(path, os.getpid(), threading.get_ident())
+        with open(tmp_path, "wb") as f:
+            pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def _clear(self):
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _size(self):
+        return len(self._entries())
+
+    @contextlib.contextmanager
+    def lease(self, key, version=None):
+        if fcntl is None:
+            yield
+            return
+        stripe = int(_digest(self._key(key, version))[:8], 16) % LEASE_STRIPES
+        path = os.path.join(self.directory, "lease-{:03d}.lock".format(stripe))
+        with open(path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class RedisCache(Cache):
+    """Cache shared by every worker through a Redis server
+
+    Only `get`, `set` (with `ex`), `scan_iter` and `delete` of the client
+    are used, so any Redis compatible client, or an in-memory fake of
+    those four methods, can be passed in. Eviction is left to the
+    server (`maxmemory-policy allkeys-lru`) and to `ttl`.
+
+    Parameters
+    ----------
+    client : redis.Redis
+        Connected Redis compatible client.
+    prefix : str, optional
+        Prefix of the keys written by the dashboard, by default 'covid:'.
+    ttl : float, optional
+        Time to live of an entry in seconds.
+        By default 'None' is used to keep entries until they are evicted.
+    version : str, optional
+        Version of the cached data, by default ''.
+
+    Examples
+    --------
+    >>> cache = RedisCache(redis.Redis.from_url("redis://localhost:6379/0"))
+    """
+
+    def __init__(self, client, prefix="covid:", ttl=None, version=""):
+        super().__init__(version)
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _name(self, key):
+        return self.prefix + _digest(key)
+
+    def _load(self, key):
+        data = self.client.get(self._name(key))
+        if data is None:
+            return _MISSING
+        stored_key, value = pickle.loads(data)
+        if stored_key != key:
+            return _MISSING
+        return value
+
+    def _store(self, key, value):
+        data = pickle.dumps((key, value), protocol=pickle.HIGHEST_PROTOCOL)
+        ex = None if self.ttl is None else int(math.ceil(self.ttl))
+        self.client.set(self._name(key), data, ex=ex)
+
+    def _clear(self):
+        for name in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(name)
+
+
+def make_cache(backend="memory", maxsize=128, ttl=None, version="", **options):
+    """Create a cache backend
+
+    Parameters
+    ----------
+    backend : str, optional
+        'memory' for a per-process `LRUCache`, 'file' for a `FileCache`
+        in `options["directory"]` or 'redis' for a `RedisCache` on
+        `options["url"]`. By default 'memory'.
+    maxsize : int, optional
+        Maximum number of entries of the memory backend, by default 128.
+    ttl : float, optional
+        Time to live of an entry in seconds, by default 'None'.
+    version : str, optional
+        Version of the cached data, by default ''.
+
+    Returns
+    -------
+    Cache
+        The cache backend.
+
+    Examples
+    --------
+    >>> make_cache("file", directory="/tmp/covid-cache", max_bytes=64 * 1024 * 1024)
+    """
+    if backend == "memory":
+        return LRUCache(maxsize=maxsize, ttl=ttl, version=version)
+
+    if backend == "file":
+        return FileCache(
+            options["directory"],
+            max_bytes=options.get("max_bytes", 256 * 1024 * 1024),
+            ttl=ttl,
+            version=version,
+        )
+
+    if backend == "redis":
+        import redis
+
+        client = redis.Redis.from_url(options["url"])
+        return RedisCache(client, ttl=ttl, version=version)
+
+    raise ValueError("Unknown cache backend: {}".format(backend))
+
+
+def normalize(value):
+    """Normalize a callback input into a hashable cache key part
+
+    Lists of strings are country selections, whose order does not change
+    the output, so they become sorted tuples. Other lists, such as the
+    slider range, become tuples in their original order.
+
+    Parameters
+    ----------
+    value : object
+        A callback input value.
+
+    Returns
+    -------
+    object
+        Hashable form of the value.
+
+    Examples
+    --------
+    >>> normalize(["France", "Canada"])
+    ('Canada', 'France')
+    >>> normalize([10, 0])
+    (10, 0)
+    """
+    if value is None:
+        return ()
+    if isinstance(value, (list, tuple)):
+        if all(isinstance(item, str) for item in value):
+            return tuple(sorted(value))
+        return tuple(normalize(item) for item in value)
+    return value
+
+
+def memoize(cache):
+    """Cache the results of a function on its normalized arguments
+
+    The cache key is the function name followed by the `normalize`d
+    positional arguments, so that the callbacks of `app.py` can share a
+    single cache. The version of the cache is read before the function
+    runs, so a result computed while the data is swapped is stored under
+    the version it started from and never served for the new data.
+
+    On a miss, concurrent calls with the same key run the function once
+    (see `SingleFlight`), as do the processes sharing a cache through
+    `Cache.lease`.
+
+    Parameters
+    ----------
+    cache : Cache
+        The cache to store results in.
+
+    Returns
+    -------
+    callable
+        Decorator for the function to cache.
+
+    Examples
+    --------
+    >>> @memoize(LRUCache())
+    ... def plot(countries, daterange):
+    ...     ...
+    """
+
+    def decorator(func):
+        def compute(key, version, args):
+            with cache.lease(key, version):
+                # another process may have built it while this one waited
+                value = cache._load(cache._key(key, version))
+                if value is not _MISSING:
+                    cache.flight.record(coalesced=True)
+                    return value
+                cache.flight.record(coalesced=False)
+                value = func(*args)
+                cache.set(key, value, version)
+                return value
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            key = (func.__name__,) + tuple(normalize(arg) for arg in args)
+            version = cache.version
+            value = cache.get(key, _MISSING, version)
+            if value is _MISSING:
+                value = cache.flight.do(
+                    cache._key(key, version), lambda: compute(key, version, args)
+                )
+            return value
+
+        return wrapper
+
+    return decorator
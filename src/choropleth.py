@@ -0,0 +1,185 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+
+FRAME_FREQ = {"week": "W", "month": "M"}
+
+
+def frame_dates(dates, step="auto", max_frames=150):
+    """Select the dates of the map animation frames
+    Keep every date, or only the last date of each week or month so that
+    long ranges do not build one frame per day. The last date of the
+    range is always kept.
+
+    Parameters
+    ----------
+    dates : pandas.DatetimeIndex
+        Sorted unique dates of the selected data.
+    step : str, optional
+        'day', 'week', 'month' or 'auto', by default 'auto'. 'auto' steps
+        by day, then week, then month until there are at most `max_frames`.
+    max_frames : int, optional
+        Largest number of frames for 'auto', by default 150.
+
+    Returns
+    -------
+    numpy.ndarray
+        Sorted positions of the frame dates in `dates`.
+
+    Examples
+    --------
+    >>> frame_dates(pd.date_range("2020-01-01", "2022-12-31"), step="month")
+    """
+    if step == "auto":
+        step = "day"
+        if len(dates) > max_frames:
+            step = "week" if len(dates) / 7 <= max_frames else "month"
+
+    if step == "day" or len(dates) == 0:
+        return np.arange(len(dates))
+
+    periods = dates.to_period(FRAME_FREQ[step]).asi8
+    last = np.flatnonzero(np.append(periods[1:] != periods[:-1], True))
+
+    return last
+
+
+def choropleth_figure(df, ycol, step="auto", max_frames=150, duration=50):
+    """Build the animated world map of a covid indicator
+    Pivot the selected data into a location by date matrix once and
+    write every animation frame as the matching column of the matrix.
+    Frames only carry the values, the locations and hover names are set
+    once on the base trace, and the figure is returned as a plain dict
+    so plotly does not validate every frame.
+
+    Parameters
+    ----------
+    df : pandas dataframe
+        The filtered covid dataframe sorted by date.
+    ycol : str
+        Indicator column to color the map with.
+    step : str, optional
+        Frame step, 'day', 'week', 'month' or 'auto', by default 'auto'.
+    max_frames : int, optional
+        Largest number of frames for the 'auto' step, by default 150.
+    duration : int, optional
+        Duration of a frame and of its transition in ms, by default 50.
+
+    Returns
+    -------
+    dict
+        Plotly figure with one frame per selected date.
+
+    Examples
+    --------
+    >>> choropleth_figure(filter_data(df, countries=["Canada"]), "new_cases")
+    """
+    location_codes, iso_codes = pd.factorize(df["iso_code"], sort=True)
+    names = df.groupby(location_codes)["location"].first().astype(str).tolist()
+
+    date_codes, dates = pd.factorize(df["date"], sort=True)
+    dates = pd.DatetimeIndex(dates)
+
+    matrix = np.full((len(iso_codes), len(dates)), np.nan)
+    matrix[location_codes, date_codes] = df[ycol].to_numpy(dtype="float64")
+
+    frames = frame_dates(dates, step, max_frames)
+    labels = dates[frames].strftime("%Y-%m-%d").tolist()
+    values = matrix[:, frames]
+    missing = np.isnan(values)
+
+    # one list of values per frame, with None where a location has no data
+    cells = values.astype(object)
+    cells[missing] = None
+    z = cells.T.tolist()
+
+    colors = px.colors.sequential.deep
+    colorscale = [[i / (len(colors) - 1), color] for i, color in enumerate(colors)]
+
+    trace = {
+        "type": "choropleth",
+        "locations": iso_codes.astype(str).tolist(),
+        "text": names,
+        "z": z[0] if labels else [],
+        "coloraxis": "coloraxis",
+        "hovertemplate": "<b>%{text}</b><br>%{z}<extra></extra>",
+    }
+
+    play = {
+        "frame": {"duration": duration, "redraw": True},
+        "mode": "immediate",
+        "fromcurrent": True,
+        "transition": {"duration": duration, "easing": "linear"},
+    }
+    pause = {
+        "frame": {"duration": 0, "redraw": True},
+        "mode": "immediate",
+        "fromcurrent": True,
+        "transition": {"duration": 0, "easing": "linear"},
+    }
+
+    layout = {
+        "template": pio.templates[pio.templates.default].to_plotly_json(),
+        "margin": {"t": 60},
+        "geo": {
+            "showframe": False,
+            "showcoastlines": False,
+            "projection": {"type": "equirectangular"},
+        },
+        "coloraxis": {
+            "colorscale": colorscale,
+            "colorbar": {"title": {"text": " "}},
+            "cmin": float(values[~missing].min()) if not missing.all() else 0,
+            "cmax": float(values[~missing].max()) if not missing.all() else 1,
+        },
+        "updatemenus": [
+            {
+                "type": "buttons",
+                "direction": "left",
+                "showactive": False,
+                "pad": {"r": 10, "t": 70},
+                "x": 0.1,
+                "xanchor": "right",
+                "y": 0,
+                "yanchor": "top",
+                "buttons": [
+                    {"label": "&#9654;", "method": "animate", "args": [None, play]},
+                    {
+                        "label": "&#9724;",
+                        "method": "animate",
+                        "args": [[None], pause],
+                    },
+                ],
+            }
+        ],
+        "sliders": [
+            {
+                "active": 0,
+                "currentvalue": {"prefix": "date="},
+                "len": 0.9,
+                "pad": {"b": 10, "t": 60},
+                "x": 0.1,
+                "xanchor": "left",
+                "y": 0,
+                "yanchor": "top",
+                "steps": [
+                    {
+                        "label": label,
+                        "method": "animate",
+                        "args": [[label], pause],
+                    }
+                    for label in labels
+                ],
+            }
+        ],
+    }
+
+    return {
+        "data": [trace],
+        "layout": layout,
+        "frames": [
+            {"name": label, "data": [{"type": "choropleth", "z": z[i]}]}
+            for i, label in enumerate(labels)
+        ],
+    }
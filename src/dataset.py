@@ -0,0 +1,35 @@
+from dateaxis import DateAxis
+from store import DataStore
+from utility import DAY_COLUMN, DAY_EPOCH, add_rolling_means, dataset_version
+
+
+class Dataset:
+    """Covid data with everything the callbacks derive from it
+
+    The rolling means, the location and date index, the slider date axis
+    and marks and the version are built together and never modified
+    afterwards. A refresh builds a new `Dataset` and replaces the reference to the
+    current one, so a callback that read the reference once keeps a
+    consistent view of the data until it returns.
+
+    Parameters
+    ----------
+    df : pandas dataframe
+        The covid dataframe sorted by date, as returned by `get_data`.
+    indicators : list
+        Indicator columns to add rolling means of.
+
+    Examples
+    --------
+    >>> data = Dataset(get_data(), ["new_cases", "new_deaths"])
+    >>> data.axis.labels[0]
+    '2020-01-01'
+    """
+
+    def __init__(self, df, indicators):
+        self.df = add_rolling_means(df, indicators)
+        self.store = DataStore(self.df)
+        self.version = dataset_version(self.df)
+        self.axis = DateAxis(DAY_EPOCH + self.df[DAY_COLUMN].to_numpy())
+        self.marks = self.axis.marks()
+        self.locations = self.df["location"].astype(str).sort_values().unique()
@@ -0,0 +1,95 @@
+import numpy as np
+
+
+class DateAxis:
+    """Dates of the date slider positions
+
+    Holds the sorted unique dates of the data once, so slider position
+    `i` is the date `dates[i]` and its label `labels[i]`, both plain
+    array lookups. The tick marks of the slider are derived from the
+    same arrays with vectorized comparisons.
+
+    Parameters
+    ----------
+    dates : array-like
+        Dates of the data rows, in any order and with repeats.
+
+    Examples
+    --------
+    >>> axis = DateAxis(df["date"])
+    >>> axis.range([0, 6])
+    (numpy.datetime64('2020-01-01'), numpy.datetime64('2020-01-07'))
+    """
+
+    def __init__(self, dates):
+        self.dates = np.unique(np.asarray(dates, dtype="datetime64[D]"))
+        self.labels = np.datetime_as_string(self.dates, unit="D")
+        self.last = len(self.dates) - 1
+
+    def __len__(self):
+        return len(self.dates)
+
+    def range(self, daterange=None):
+        """Get the first and last dates of a slider range
+
+        Parameters
+        ----------
+        daterange : list, optional
+            Slider positions [start, end].
+            By default 'None' is used for the whole axis.
+
+        Returns
+        -------
+        tuple
+            numpy.datetime64 start and end dates.
+        """
+        if not daterange:
+            daterange = [0, self.last]
+
+        return self.dates[daterange[0]], self.dates[daterange[1]]
+
+    def marks(self, every=2, margin_start=10, margin_end=30):
+        """Build the tick marks of the date slider
+
+        The first and last positions are labelled, plus the first day
+        of every `every` months from the first month, except within
+        `margin_start` positions of the start or `margin_end` of the end.
+
+        Parameters
+        ----------
+        every : int, optional
+            Months between two labelled months, by default 2.
+        margin_start : int, optional
+            Unlabelled positions after the first one, by default 10.
+        margin_end : int, optional
+            Unlabelled positions before the last one, by default 30.
+
+        Returns
+        -------
+        dict
+            Slider position to mark, as `dcc.RangeSlider` expects.
+        """
+        if len(self.dates) == 0:
+            return {}
+
+        months = self.dates.astype("datetime64[M]")
+        month_number = (months - months[0]).astype(int)
+        month_end = (months + 1).astype("datetime64[D]") - 1
+        position = np.arange(len(self.dates))
+
+        ticks = np.flatnonzero(
+            (self.dates == months.astype("datetime64[D]"))
+            & (month_number % every == 0)
+            & (month_end <= self.dates[-1])
+            & (position > margin_start)
+            & (self.last - position > margin_end)
+        )
+
+        positions = np.concatenate([[0], ticks, [self.last]])
+        return {
+            int(i): {
+                "label": "{}/{}".format(label[2:4], label[5:7]),
+                "style": {"color": "#77b0b1"},
+            }
+            for i, label in zip(positions, self.labels[positions])
+        }
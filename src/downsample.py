@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+
+
+def lttb(x, y, threshold):
+    """Select points with Largest-Triangle-Three-Buckets
+    Keep the first and last points and, in each of the `threshold - 2`
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the mean of the next bucket. Peaks and
+    troughs of the series are preserved.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        Increasing x values of the series.
+    y : numpy.ndarray
+        y values of the series.
+    threshold : int
+        Number of points to keep.
+
+    Returns
+    -------
+    numpy.ndarray
+        Sorted positions of the kept points.
+
+    Examples
+    --------
+    >>> lttb(np.arange(1000.0), np.random.rand(1000), 100)
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    every = (n - 2) / (threshold - 2)
+
+    sampled = np.empty(threshold, dtype=np.intp)
+    sampled[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[avg_start:avg_end].mean()
+        avg_y = y[avg_start:avg_end].mean()
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        sampled[i + 1] = a
+    sampled[-1] = n - 1
+
+    return sampled
+
+
+def bucket(df, freq, x="date", by="location"):
+    """Aggregate a covid dataframe into time buckets
+    Average the numeric columns of every location over each bucket.
+    The other columns take their first value in the bucket, and the
+    date becomes the start of the bucket.
+
+    Parameters
+    ----------
+    df : pandas dataframe
+        The covid dataframe sorted by date.
+    freq : str
+        Pandas period frequency of the buckets, such as 'W' or 'M'.
+    x : str, optional
+        Date column, by default 'date'.
+    by : str, optional
+        Series column, by default 'location'.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per location and bucket, sorted by date.
+    """
+    start = df[x].dt.to_period(freq).dt.start_time.rename("_bucket")
+    numeric = [
+        column
+        for column in df.columns
+        if column != x and pd.api.types.is_numeric_dtype(df[column])
+    ]
+    aggregations = {column: "mean" for column in numeric}
+    aggregations.update(
+        {
+            column: "first"
+            for column in df.columns
+            if column not in numeric and column not in (x, by)
+        }
+    )
+
+    out = df.groupby([df[by], start], sort=False, observed=True).agg(aggregations)
+    out = out.reset_index()
+    out[x] = out.pop("_bucket")
+
+    return out[list(df.columns)].sort_values(x, kind="stable").reset_index(drop=True)
+
+
+def downsample(
+    df, width, y="rolling_mean", x="date", by="location", method="auto", max_series=10
+):
+    """Downsample the series of a line chart
+    Reduce the rows sent to the browser when the selected range has
+    more days than the chart can draw. Each series keeps at most one
+    point every two pixels of `width`.
+
+    With 'auto', selections of up to `max_series` locations use LTTB
+    on `y`, which keeps real rows and the shape of every series. Larger
+    selections are averaged into weekly buckets, or monthly ones when
+    weeks are still too many, which is cheaper for hundreds of series.
+
+    Parameters
+    ----------
+    df : pandas dataframe
+        The covid dataframe sorted by date.
+    width : int
+        Width of the chart in pixels.
+    y : str, optional
+        Column drawn by the chart, used by LTTB. By default 'rolling_mean'.
+    x : str, optional
+        Date column, by default 'date'.
+    by : str, optional
+        Series column, by default 'location'.
+    method : str, optional
+        'auto', 'lttb', 'bucket' or 'none', by default 'auto'.
+    max_series : int, optional
+        Largest number of series 'auto' runs LTTB for, by default 10.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The downsampled dataframe, sorted by date.
+
+    Examples
+    --------
+    >>> downsample(filter_df, width=400)
+    """
+    max_points = max(width // 2, 3)
+    days = df[x].nunique()
+
+    if method == "none" or days <= max_points:
+        return df
+
+    codes, series = pd.factorize(df[by])
+    if method == "auto":
+        method = "lttb" if len(series) <= max_series else "bucket"
+
+    if method == "bucket":
+        freq = "W" if days / 7 <= max_points else "M"
+        return bucket(df, freq, x=x, by=by)
+
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(series) + 1))
+    dates = df[x].to_numpy().astype("int64")
+    values = df[y].to_numpy()
+
+    selected = []
+    for i in range(len(series)):
+        rows = order[bounds[i] : bounds[i + 1]]
+        selected.append(rows[lttb(dates[rows], values[rows], max_points)])
+
+    return df.iloc[np.sort(np.concatenate(selected))]
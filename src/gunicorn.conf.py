@@ -0,0 +1,25 @@
+"""Gunicorn hooks of the dashboard
+
+Gunicorn reads this file from its working directory, as in the Docker
+image, or with `-c src/gunicorn.conf.py`. With `COVID_METRICS_DIR`, the
+master clears the samples of an earlier run when it starts and folds the
+samples of every exited worker into those of the exited workers.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import metrics  # noqa: E402
+
+metrics_dir = os.environ.get("COVID_METRICS_DIR")
+
+
+def on_starting(server):
+    if metrics_dir is not None and os.path.isdir(metrics_dir):
+        metrics.clear(metrics_dir)
+
+
+def child_exit(server, worker):
+    if metrics_dir is not None:
+        metrics.mark_process_dead(worker.pid, metrics_dir)
@@ -0,0 +1,316 @@
+import bisect
+import contextlib
+import contextvars
+import glob
+import os
+import pickle
+import threading
+import time
+
+# Upper bounds of the histogram buckets, in seconds and bytes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (1e3, 1e4, 3e4, 1e5, 3e5, 1e6, 3e6, 1e7, 3e7)
+
+# File of the samples of the exited processes, in the metrics directory
+EXITED = "metrics-exited.pkl"
+
+# Stages timed in the current request, a list of (figure, stage, seconds)
+_trace = contextvars.ContextVar("covid_trace", default=None)
+
+
+@contextlib.contextmanager
+def tracing():
+    """Collect the stages timed in the current context into a list."""
+    stages = []
+    token = _trace.set(stages)
+    try:
+        yield stages
+    finally:
+        _trace.reset(token)
+
+
+def stopwatch(figure):
+    """Time the consecutive stages of building `figure`
+
+    Returns a function to call at the end of every stage with its name,
+    which records the time since the previous call, or since the
+    stopwatch started, when the context is traced.
+
+    Examples
+    --------
+    >>> lap = stopwatch("chart_1")
+    >>> df = select_data(countries, daterange)
+    >>> lap("filter")
+    """
+    stages = _trace.get()
+    last = [time.perf_counter()]
+
+    def lap(name):
+        now = time.perf_counter()
+        if stages is not None:
+            stages.append((figure, name, now - last[0]))
+        last[0] = now
+
+    return lap
+
+
+def record(stages):
+    """Add stages timed elsewhere, such as in a render worker, to the
+    current trace."""
+    current = _trace.get()
+    if current is not None:
+        current.extend(stages)
+
+
+def _add(value, other):
+    # counter values are numbers, histogram values lists of bucket counts
+    if value is None:
+        return list(other) if isinstance(other, list) else other
+    if isinstance(other, list):
+        return [a + b for a, b in zip(value, other)]
+    return value + other
+
+
+def _merge(samples, other):
+    # add the samples of another process, {metric: {labels: value}}
+    for name, values in other.items():
+        merged = samples.setdefault(name, {})
+        for labels, value in values.items():
+            merged[labels] = _add(merged.get(labels), value)
+    return samples
+
+
+def _load(path):
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
+
+
+def _write(path, samples):
+    tmp_path = "{}.{}.{}.tmp".format(path, os.getpid(), threading.get_ident())
+    with open(tmp_path, "wb") as f:
+        pickle.dump(samples, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def clear(directory):
+    """Remove the samples of an earlier run of the app from `directory`,
+    before its processes start."""
+    for path in glob.glob(os.path.join(directory, "metrics-*")):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def mark_process_dead(pid, directory):
+    """Fold the samples of the exited process `pid` into those of the
+    exited processes of `directory`
+
+    Call it from the process that started `pid`, such as in the
+    `child_exit` hook of gunicorn: the counters of the exited workers are
+    kept, and a new process with the same pid starts from zero.
+
+    Examples
+    --------
+    >>> def child_exit(server, worker):
+    ...     mark_process_dead(worker.pid, "/tmp/covid-metrics")
+    """
+    path = os.path.join(directory, "metrics-{}.pkl".format(pid))
+    exited = os.path.join(directory, EXITED)
+    _write(exited, _merge(_load(exited), _load(path)))
+    for dead in glob.glob(path + "*"):
+        try:
+            os.remove(dead)
+        except FileNotFoundError:
+            pass
+
+
+def _labels(names, values, extra=""):
+    pairs = [
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Base class of the metrics of a `Registry`
+
+    Samples are kept per tuple of label values.
+    """
+
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def samples(self):
+        with self._lock:
+            return {
+                labels: self._copy(value) for labels, value in self._samples.items()
+            }
+
+    def _copy(self, value):
+        return value
+
+    def lines(self, samples):
+        yield "# HELP {} {}".format(self.name, self.help)
+        yield "# TYPE {} {}".format(self.name, self.kind)
+
+
+class Counter(Metric):
+    """Prometheus counter"""
+
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._samples[labels] = self._samples.get(labels, 0) + amount
+
+    def set(self, value, *labels):
+        """Set the count, for counts kept elsewhere."""
+        with self._lock:
+            self._samples[labels] = value
+
+    def lines(self, samples):
+        yield from super().lines(samples)
+        for labels, value in sorted(samples.items()):
+            yield "{}{} {}".format(self.name, _labels(self.labelnames, labels), value)
+
+
+class Histogram(Metric):
+    """Prometheus histogram
+
+    Every sample holds the count of each bucket, the count above the last
+    bucket and the sum of the observed values.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._samples.get(labels)
+            if counts is None:
+                counts = self._samples[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[i] += 1
+            counts[-1] += value
+
+    def _copy(self, value):
+        return list(value)
+
+    def lines(self, samples):
+        yield from super().lines(samples)
+        for labels, counts in sorted(samples.items()):
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                total += count
+                le = 'le="{}"'.format(bound)
+                yield "{}_bucket{} {}".format(
+                    self.name, _labels(self.labelnames, labels, le), total
+                )
+            yield "{}_sum{} {}".format(
+                self.name, _labels(self.labelnames, labels), counts[-1]
+            )
+            yield "{}_count{} {}".format(
+                self.name, _labels(self.labelnames, labels), total
+            )
+
+
+class Registry:
+    """Metrics of the app, rendered in the Prometheus text format
+
+    With `directory`, every process writes its samples to a file of the
+    directory at most every `interval` seconds (see `dump`) and `render`
+    adds the samples of the other processes, so that any gunicorn worker
+    answers a scrape for all of them. `clear` empties the directory when
+    the app starts, and `mark_process_dead` keeps the samples of an
+    exited worker apart from the file of its pid, so the counters never
+    go back, even when a new worker gets the same pid.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Directory shared by the processes of the app.
+        By default 'None' is used to report this process only.
+    interval : float, optional
+        Seconds between two writes of the samples, by default 1.
+
+    Examples
+    --------
+    >>> registry = Registry()
+    >>> latency = registry.histogram("covid_request_seconds", "Latency", ["callback"])
+    >>> latency.observe(0.2, "map_plot")
+    >>> print(registry.render())
+    """
+
+    def __init__(self, directory=None, interval=1.0):
+        self.directory = directory
+        self.interval = interval
+        self.metrics = []
+        self._collectors = []
+        self._dumped = 0.0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, func):
+        """Register `func`, called before the samples are read, to update
+        metrics kept elsewhere such as cache counters."""
+        self._collectors.append(func)
+        return func
+
+    def samples(self):
+        for func in self._collectors:
+            func()
+        return {metric.name: metric.samples() for metric in self.metrics}
+
+    def _path(self, pid):
+        return os.path.join(self.directory, "metrics-{}.pkl".format(pid))
+
+    def dump(self, force=False):
+        """Write the samples of this process for the other processes."""
+        now = time.monotonic()
+        if self.directory is None or (not force and now - self._dumped < self.interval):
+            return
+        self._dumped = now
+        _write(self._path(os.getpid()), self.samples())
+
+    def render(self):
+        """Get the metrics of every process in the Prometheus text format."""
+        samples = self.samples()
+        if self.directory is not None:
+            own = self._path(os.getpid())
+            for path in glob.glob(os.path.join(self.directory, "metrics-*.pkl")):
+                if path != own:
+                    _merge(samples, _load(path))
+
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.lines(samples[metric.name]))
+        return "\n".join(lines) + "\n"
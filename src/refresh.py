@@ -0,0 +1,294 @@
+import glob
+import logging
+import os
+import threading
+import time
+import pandas as pd
+from utility import (
+    COLUMNS,
+    DATA_DIR,
+    DATA_MODE,
+    DATA_URL,
+    apply_schema,
+    get_data,
+    read_source,
+    load_snapshot,
+    shared_path,
+    snapshot_path,
+    write_shared,
+    write_snapshot,
+)
+
+try:
+    import fcntl
+except ImportError:  # no file locks on Windows, where the app runs in one process
+    fcntl = None
+
+KEY = ["iso_code", "date"]
+LOCK_FILE = "refresh.lock"
+
+logger = logging.getLogger(__name__)
+
+
+def read_updates(source=None, since=None, seen=None):
+    """Read new covid rows
+    Read the OWID csv, or every csv file of a drop directory, and keep
+    the cleaned rows dated after `since`.
+
+    Parameters
+    ----------
+    source : str, optional
+        URL or local path of the OWID csv file, or a directory of csv
+        files with the OWID columns. By default 'None' is used for `DATA_URL`.
+    since : pandas.Timestamp, optional
+        Only rows dated after it are kept.
+        By default 'None' is used to keep every row.
+    seen : dict, optional
+        Path to modification time of the drop directory files already
+        read. Unchanged files are skipped and the dict is updated.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Pandas dataframe of the cleaned rows sorted by date.
+
+    Examples
+    --------
+    >>> read_updates("/srv/covid/drop", since=pd.Timestamp("2022-03-01"))
+    """
+    if source is None:
+        source = DATA_URL
+
+    if not os.path.isdir(source):
+        return read_source(source, since)
+
+    frames = []
+    for path in sorted(glob.glob(os.path.join(source, "*.csv"))):
+        mtime = os.path.getmtime(path)
+        if seen is not None:
+            if seen.get(path) == mtime:
+                continue
+            seen[path] = mtime
+        frames.append(read_source(path, since))
+
+    if not frames:
+        return apply_schema(pd.DataFrame(columns=COLUMNS))
+
+    df = pd.concat(frames, ignore_index=True)
+
+    return apply_schema(df.sort_values("date", kind="stable"))
+
+
+def merge_updates(df, updates):
+    """Merge new and revised rows into covid data
+    Rows are matched on (iso_code, date): new keys are appended and
+    rows whose values changed replace the stored ones. Only the stored
+    rows dated from the first update on are compared, found by a binary
+    search on the sorted dates, so the work grows with the number of
+    updated days rather than with the history.
+
+    Parameters
+    ----------
+    df : pandas dataframe
+        The cleaned covid dataframe sorted by date.
+    updates : pandas dataframe
+        Cleaned rows with the same columns, as returned by `read_updates`.
+
+    Returns
+    -------
+    tuple
+        The merged dataframe sorted by date, or `df` itself when nothing
+        changed, and the number of new or changed rows.
+
+    Examples
+    --------
+    >>> merged, changed = merge_updates(load_snapshot(), read_updates())
+    """
+    if len(updates) == 0:
+        return df, 0
+
+    start = df["date"].searchsorted(updates["date"].min())
+    head = df.iloc[:start]
+    tail = df.iloc[start:]
+
+    combined = pd.concat([tail, updates[list(df.columns)]], ignore_index=True)
+    changed = len(combined.drop_duplicates()) - len(tail)
+    if changed == 0:
+        return df, 0
+
+    tail = combined.drop_duplicates(subset=KEY, keep="last")
+    tail = tail.sort_values("date", kind="stable")
+
+    return apply_schema(pd.concat([head, tail], ignore_index=True)), changed
+
+
+def refresh_snapshot(
+    source=None, data_dir=None, mode=None, lookback=14, min_age=0, seen=None
+):
+    """Merge the latest source data into the snapshot
+    Read the rows of the last `lookback` days of the snapshot and after,
+    since OWID revises recent days, and rewrite the snapshot, plus the
+    shared file in shared mode, when they change it. Only the merge
+    grows with the updated days: the source is still parsed whole and
+    the snapshot is rewritten whole, so a refresh costs as much as the
+    history.
+
+    A lock file in the data directory lets a single worker refresh at a
+    time, and a refresh is skipped when another one started less than
+    `min_age` seconds ago, so the workers of a server share one refresh.
+
+    Parameters
+    ----------
+    source : str, optional
+        URL or local path of the OWID csv file, or a drop directory.
+        By default 'None' is used for `DATA_URL`.
+    data_dir : str, optional
+        Directory holding the snapshot.
+        By default 'None' is used for `DATA_DIR`.
+    mode : str, optional
+        'snapshot' or 'shared', by default 'None' is used for `DATA_MODE`.
+    lookback : int, optional
+        Days before the last stored date that are read again, by default 14.
+    min_age : float, optional
+        Seconds since the last refresh of any worker, by default 0.
+    seen : dict, optional
+        Drop directory files already read, see `read_updates`.
+
+    Returns
+    -------
+    int
+        Number of new or changed rows written.
+
+    Examples
+    --------
+    >>> refresh_snapshot("/srv/covid/drop")
+    """
+    if data_dir is None:
+        data_dir = DATA_DIR
+    if mode is None:
+        mode = DATA_MODE
+
+    os.makedirs(data_dir, exist_ok=True)
+    lock_path = os.path.join(data_dir, LOCK_FILE)
+    first = not os.path.exists(lock_path)
+    with open(lock_path, "a") as lock:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+        if not first and os.path.getmtime(lock_path) > time.time() - min_age:
+            return 0
+        os.utime(lock_path)
+
+        df = load_snapshot(data_dir)
+        if df is None:
+            return 0
+
+        since = df["date"].max() - pd.Timedelta(days=lookback)
+        df, changed = merge_updates(df, read_updates(source, since, seen))
+
+        if changed:
+            write_snapshot(df, data_dir)
+            if mode == "shared":
+                write_shared(df, data_dir)
+
+    return changed
+
+
+class Refresher:
+    """Background job keeping the dataset of a worker up to date
+
+    Every `interval` seconds the job merges the source into the snapshot
+    (see `refresh_snapshot`) and, when the snapshot or shared file on disk
+    is newer than the data of the process, loads it and passes it to
+    `on_change`. Loading and `on_change` run on the job thread, so the
+    callbacks keep serving the previous data meanwhile.
+
+    Parameters
+    ----------
+    on_change : callable
+        Called with the new covid dataframe.
+    interval : float
+        Seconds between two refreshes, 0 disables the job.
+    source : str, optional
+        URL or local path of the OWID csv file, or a drop directory.
+        By default 'None' is used for `DATA_URL`.
+    data_dir : str, optional
+        Directory holding the snapshot.
+        By default 'None' is used for `DATA_DIR`.
+    mode : str, optional
+        'snapshot' or 'shared', by default 'None' is used for `DATA_MODE`.
+    lookback : int, optional
+        Days before the last stored date that are read again, by default 14.
+
+    Examples
+    --------
+    >>> refresher = Refresher(print, interval=3600, source="/srv/covid/drop")
+    >>> refresher.start()
+    """
+
+    def __init__(
+        self, on_change, interval, source=None, data_dir=None, mode=None, lookback=14
+    ):
+        self.on_change = on_change
+        self.interval = interval
+        self.source = source
+        self.data_dir = data_dir
+        self.mode = DATA_MODE if mode is None else mode
+        self.lookback = lookback
+        self.seen = {}
+        self.loaded = self._mtime()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _mtime(self):
+        if self.mode == "shared":
+            path = shared_path(self.data_dir)
+        else:
+            path = snapshot_path(self.data_dir)
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def refresh(self):
+        """Run one refresh, return True when new data was passed to `on_change`."""
+        refresh_snapshot(
+            self.source,
+            self.data_dir,
+            self.mode,
+            lookback=self.lookback,
+            min_age=self.interval / 2,
+            seen=self.seen,
+        )
+
+        mtime = self._mtime()
+        if mtime is None or mtime == self.loaded:
+            return False
+        self.loaded = mtime
+
+        self.on_change(get_data(data_dir=self.data_dir, mode=self.mode))
+        return True
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Covid data refresh failed")
+
+    def start(self):
+        """Start the job thread in the current process, once.
+
+        Threads do not survive a fork, so the job is started lazily in
+        every gunicorn worker rather than in the preloaded master.
+        """
+        with self._lock:
+            if self.interval <= 0 or self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(
+                target=self._run, name="covid-refresh", daemon=True
+            ).start()
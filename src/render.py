@@ -0,0 +1,265 @@
+import contextlib
+import functools
+import importlib
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import record, tracing
+
+# Seconds between two checkpoints while waiting
+POLL = 0.05
+
+# Pools by name, so a worker finds its pool once it imported the jobs
+_pools = {}
+
+# Jobs of the pool the current process is a worker of, None in the app process
+_jobs = None
+
+# True in a worker process, from before it imports the modules of the jobs
+_worker = False
+
+
+class RenderTimeout(TimeoutError):
+    """A render job did not get a worker or a result in time"""
+
+
+def in_worker():
+    """Whether the current process is a render worker.
+
+    Modules defining jobs are imported again by the workers, and can
+    check it to skip what only the app process does, such as a warm-up.
+    """
+    return _worker
+
+
+def _init_worker(path, modules, name, state):
+    global _jobs, _worker
+    _worker = True
+    sys.path[:] = path
+    for module in modules:
+        importlib.import_module(module)
+    pool = _pools[name]
+    if pool.restore is not None:
+        pool.restore(*state)
+    if pool.warmup is not None:
+        pool.warmup()
+    _jobs = pool.jobs
+
+
+def _run_job(name, args):
+    # the stages timed in the worker go back with the result
+    with tracing() as stages:
+        value = _jobs[name](*args)
+    return value, stages
+
+
+def _ready():
+    return os.getpid()
+
+
+class RenderPool:
+    """Process pool building figures outside the serving process
+
+    Functions decorated with `job` are sent to worker processes by name,
+    only their arguments and results cross the process boundary. The
+    workers are started by a fork server, a process started afresh
+    rather than forked, and they import the modules of the jobs again;
+    a fork of the serving process could copy a lock held by one of its
+    threads (the refresh, the chart threads, the warm-up, the request
+    threads) and block forever. What the app process changed since its
+    modules were imported, such as a swapped dataset, reaches the
+    workers through `state` and `restore`. Without workers, or inside a
+    worker, a job runs in the calling thread.
+
+    At most `max_pending` jobs are queued or running. A caller waits up
+    to `timeout` seconds for a slot and then for the result, and gets a
+    `RenderTimeout` otherwise.
+
+    Parameters
+    ----------
+    workers : int
+        Number of worker processes, 0 runs the jobs in the caller.
+    timeout : float, optional
+        Seconds to wait for a slot and for a result, by default 30.
+    max_pending : int, optional
+        Jobs queued or running at once.
+        By default 'None' is used for twice the number of workers.
+    warmup : callable, optional
+        Called once in every worker before it takes jobs, to load what
+        the jobs use lazily. By default 'None' is used for no warm-up.
+    checkpoint : callable, optional
+        Called every `POLL` seconds while a caller waits, an exception
+        it raises abandons the job and is raised to the caller.
+        By default 'None' is used for no checkpoint.
+    state : callable, optional
+        Called in the app process when the workers start, returns the
+        tuple of arguments of `restore`. By default 'None' is used for ().
+    restore : callable, optional
+        Called in every worker with the `state` of the app process.
+        By default 'None' is used for nothing to restore.
+    name : str, optional
+        Name of the pool, unique in the app, by default 'render'.
+
+    Examples
+    --------
+    >>> pool = RenderPool(workers=4)
+    >>> @pool.job
+    ... def plot(countries, daterange):
+    ...     ...
+    >>> pool.start()
+    """
+
+    def __init__(
+        self,
+        workers,
+        timeout=30,
+        max_pending=None,
+        warmup=None,
+        checkpoint=None,
+        state=None,
+        restore=None,
+        name="render",
+    ):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pending = max_pending or 2 * workers
+        self.warmup = warmup
+        self.checkpoint = checkpoint
+        self.state = state
+        self.restore = restore
+        self.name = name
+        self.jobs = {}
+        self._modules = []
+        self._executor = None
+        self._pid = None
+        self._slots = threading.BoundedSemaphore(max(self.max_pending, 1))
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        _pools[name] = self
+
+    def job(self, func):
+        """Decorator running `func` in the pool, its arguments and result
+        must be picklable."""
+        name = func.__name__
+        self.jobs[name] = func
+        module = func.__module__
+        if module == "__main__":
+            # run as a script, the workers import the script as a module
+            main = sys.modules["__main__"].__file__
+            module = os.path.splitext(os.path.basename(main))[0]
+        if module not in self._modules:
+            self._modules.append(module)
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            inline = getattr(self._local, "inline", False)
+            if self.workers <= 0 or _worker or inline:
+                return func(*args)
+            return self.run(name, *args)
+
+        return wrapper
+
+    @contextlib.contextmanager
+    def inline(self):
+        """Context in which the jobs run in the calling thread, for
+        instance to build figures in the app process itself."""
+        inline = getattr(self._local, "inline", False)
+        self._local.inline = True
+        try:
+            yield
+        finally:
+            self._local.inline = inline
+
+    def start(self):
+        """Start the workers of the current process, once.
+
+        Like threads, the pool does not survive a fork, so it is started
+        lazily in every gunicorn worker rather than in the preloaded
+        master. Blocks until every worker is up and warm.
+        """
+        with self._lock:
+            self._start()
+
+    def _start(self):
+        if self.workers <= 0 or _worker or self._pid == os.getpid():
+            return
+        state = () if self.state is None else tuple(self.state())
+        self._executor = ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=_init_worker,
+            initargs=(list(sys.path), self._modules, self.name, state),
+        )
+        self._pid = os.getpid()
+        for future in [self._executor.submit(_ready) for _ in range(self.workers)]:
+            future.result()
+
+    def restart(self):
+        """Replace the workers by new ones restored to the current state,
+        jobs already submitted finish on the old workers."""
+        with self._lock:
+            executor = self._executor
+            if executor is None or self._pid != os.getpid():
+                return
+            self._pid = None
+            self._start()
+        executor.shutdown(wait=False)
+
+    def _wait(self, wait, deadline):
+        # wait in steps, so the checkpoint can abandon the job meanwhile
+        while True:
+            if self.checkpoint is not None:
+                self.checkpoint()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return wait(0)
+            try:
+                return wait(min(remaining, POLL))
+            except FutureTimeoutError:
+                pass
+
+    def run(self, name, *args):
+        """Run the job `name` in a worker and return its result."""
+        self.start()
+        executor = self._executor
+        deadline = time.monotonic() + self.timeout
+
+        def acquire(timeout):
+            if not self._slots.acquire(timeout=timeout):
+                raise FutureTimeoutError
+            return True
+
+        try:
+            self._wait(acquire, deadline)
+        except FutureTimeoutError:
+            raise RenderTimeout("No render worker free for {}".format(name)) from None
+        try:
+            future = executor.submit(_run_job, name, args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            value, stages = self._wait(future.result, deadline)
+        except FutureTimeoutError:
+            future.cancel()
+            raise RenderTimeout("Render of {} timed out".format(name)) from None
+        except BrokenProcessPool:
+            # a worker died, the first caller to notice replaces the pool
+            if self._executor is executor:
+                self.restart()
+            raise
+        except BaseException:
+            # abandoned by the checkpoint, a job the executor has not yet
+            # handed to a worker process never runs
+            future.cancel()
+            raise
+        record(stages)
+        return value
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+
+
+class DataStore:
+    """Covid data indexed by location and date
+
+    Wraps the date sorted dataframe returned by `get_data` with a
+    location index, so that `filter_data` can select rows by binary
+    search instead of scanning and evaluating a query on the whole frame.
+
+    The row positions of every location are kept as one contiguous block
+    of `order`, sorted by date, and `block_dates` holds the matching dates
+    to binary search in. Selected positions are sorted back before taking
+    the rows, so the result has the same rows, order and index as
+    `df.query(...)` on the date sorted frame.
+
+    Parameters
+    ----------
+    df : pandas dataframe
+        The covid dataframe sorted by date, as returned by `get_data`.
+
+    Examples
+    --------
+    >>> store = DataStore(get_data())
+    >>> store.filter("2022-01-01", "2022-01-07", ["Canada", "France"])
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.dates = df["date"].to_numpy()
+
+        codes, locations = pd.factorize(df["location"], sort=True)
+        self.order = np.argsort(codes, kind="stable")
+        self.block_dates = self.dates[self.order]
+
+        bounds = np.searchsorted(codes[self.order], np.arange(len(locations) + 1))
+        self.blocks = {
+            location: (bounds[i], bounds[i + 1]) for i, location in enumerate(locations)
+        }
+
+    def __len__(self):
+        return len(self.df)
+
+    def _as_date(self, date, default):
+        if date is None:
+            return default
+        if isinstance(date, np.datetime64):
+            return date.astype(self.dates.dtype)
+        return np.datetime64(pd.Timestamp(date)).astype(self.dates.dtype)
+
+    def rows(self, date_from=None, date_to=None, countries=[]):
+        """Get the row positions of the selected covid data
+
+        Parameters
+        ----------
+        date_from : str, optional
+            Start date with format 'YYYY-MM-DD', 'None' for the earliest date.
+        date_to : str, optional
+            End date with format 'YYYY-MM-DD', 'None' for the latest date.
+        countries : list, optional
+            List of target country names, empty for all countries.
+
+        Returns
+        -------
+        numpy.ndarray or slice
+            Sorted row positions in `df`, a slice when all countries are selected.
+        """
+        if len(self.dates) == 0:
+            return slice(0, 0)
+
+        date_from = self._as_date(date_from, self.dates[0])
+        date_to = self._as_date(date_to, self.dates[-1])
+
+        if not countries:
+            return slice(
+                np.searchsorted(self.dates, date_from, side="left"),
+                np.searchsorted(self.dates, date_to, side="right"),
+            )
+
+        selected = []
+        for country in set(countries):
+            if country not in self.blocks:
+                continue
+            start, end = self.blocks[country]
+            dates = self.block_dates[start:end]
+            lo = np.searchsorted(dates, date_from, side="left")
+            hi = np.searchsorted(dates, date_to, side="right")
+            selected.append(self.order[start + lo : start + hi])
+
+        if not selected:
+            return np.array([], dtype=np.intp)
+
+        return np.sort(np.concatenate(selected))
+
+    def filter(self, date_from=None, date_to=None, countries=[]):
+        """Filter the covid data
+
+        Parameters
+        ----------
+        date_from : str, optional
+            Start date with format 'YYYY-MM-DD', 'None' for the earliest date.
+        date_to : str, optional
+            End date with format 'YYYY-MM-DD', 'None' for the latest date.
+        countries : list, optional
+            List of target country names, empty for all countries.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Pandas dataframe of the selected covid data.
+        """
+        rows = self.rows(date_from, date_to, countries)
+
+        if isinstance(rows, slice):
+            return self.df.iloc[rows].copy()
+
+        return self.df.take(rows)
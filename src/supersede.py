@@ -0,0 +1,65 @@
+import contextlib
+import contextvars
+import threading
+
+# (tracker, key, token) of the request the current context works for
+_current = contextvars.ContextVar("covid_request", default=None)
+
+
+class Superseded(Exception):
+    """A newer request with the same key arrived"""
+
+
+def check():
+    """Raise `Superseded` when the request tracked in the current context
+    has been superseded, do nothing outside of `LatestRequests.track`."""
+    current = _current.get()
+    if current is not None:
+        latest, key, token = current
+        if not latest.is_latest(key, token):
+            raise Superseded
+
+
+class LatestRequests:
+    """Latest request of every key, such as a session and a tab
+
+    A request runs its work inside `track`. When a request with the same
+    key starts while it runs, `check`, called between the steps of the
+    work and while waiting on the render workers, raises `Superseded`,
+    so the work stops instead of building a result the browser would
+    discard. Only requests served by the same process see each other.
+
+    Examples
+    --------
+    >>> latest = LatestRequests()
+    >>> with latest.track(("3f2a", "map-tab")):
+    ...     check()
+    """
+
+    def __init__(self):
+        self.cancelled = 0
+        self._latest = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def is_latest(self, key, token):
+        return self._latest.get(key) == token
+
+    @contextlib.contextmanager
+    def track(self, key):
+        """Context of a request with `key`, superseding the earlier ones."""
+        with self._lock:
+            self._next += 1
+            token = self._latest[key] = self._next
+        reset = _current.set((self, key, token))
+        try:
+            yield
+        except Superseded:
+            with self._lock:
+                self.cancelled += 1
+            raise
+        finally:
+            _current.reset(reset)
+            with self._lock:
+                if self._latest.get(key) == token:
+                    del self._latest[key]
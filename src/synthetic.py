@@ -0,0 +1,396 @@
+import argparse
+import urllib.parse
+import numpy as np
+import pandas as pd
+from utility import COLUMNS
+
+# Sources of the form "synthetic:locations=2000,days=1500,seed=1" are
+# generated instead of read, see `parse_source`
+SCHEME = "synthetic:"
+
+# Countries of the generated data, with their continent and population.
+# The default selection of the app comes first.
+COUNTRIES = [
+    ("CAN", "North America", "Canada", 38_155_000),
+    ("USA", "North America", "United States", 332_915_000),
+    ("GBR", "Europe", "United Kingdom", 68_207_000),
+    ("FRA", "Europe", "France", 67_422_000),
+    ("SGP", "Asia", "Singapore", 5_454_000),
+    ("DEU", "Europe", "Germany", 83_900_000),
+    ("ITA", "Europe", "Italy", 60_367_000),
+    ("ESP", "Europe", "Spain", 46_745_000),
+    ("NLD", "Europe", "Netherlands", 17_173_000),
+    ("BEL", "Europe", "Belgium", 11_632_000),
+    ("SWE", "Europe", "Sweden", 10_160_000),
+    ("NOR", "Europe", "Norway", 5_465_000),
+    ("POL", "Europe", "Poland", 37_797_000),
+    ("UKR", "Europe", "Ukraine", 43_466_000),
+    ("RUS", "Europe", "Russia", 145_912_000),
+    ("PRT", "Europe", "Portugal", 10_167_000),
+    ("GRC", "Europe", "Greece", 10_370_000),
+    ("MEX", "North America", "Mexico", 130_262_000),
+    ("CUB", "North America", "Cuba", 11_318_000),
+    ("GTM", "North America", "Guatemala", 18_250_000),
+    ("BRA", "South America", "Brazil", 213_993_000),
+    ("ARG", "South America", "Argentina", 45_606_000),
+    ("COL", "South America", "Colombia", 51_266_000),
+    ("PER", "South America", "Peru", 33_359_000),
+    ("CHL", "South America", "Chile", 19_212_000),
+    ("CHN", "Asia", "China", 1_444_216_000),
+    ("IND", "Asia", "India", 1_393_409_000),
+    ("IDN", "Asia", "Indonesia", 276_362_000),
+    ("JPN", "Asia", "Japan", 126_050_000),
+    ("KOR", "Asia", "South Korea", 51_305_000),
+    ("PHL", "Asia", "Philippines", 111_047_000),
+    ("VNM", "Asia", "Vietnam", 98_169_000),
+    ("THA", "Asia", "Thailand", 69_950_000),
+    ("MYS", "Asia", "Malaysia", 32_776_000),
+    ("PAK", "Asia", "Pakistan", 225_199_000),
+    ("BGD", "Asia", "Bangladesh", 166_303_000),
+    ("IRN", "Asia", "Iran", 85_029_000),
+    ("TUR", "Asia", "Turkey", 85_042_000),
+    ("ISR", "Asia", "Israel", 9_291_000),
+    ("SAU", "Asia", "Saudi Arabia", 35_341_000),
+    ("NGA", "Africa", "Nigeria", 211_401_000),
+    ("ETH", "Africa", "Ethiopia", 117_876_000),
+    ("EGY", "Africa", "Egypt", 104_258_000),
+    ("ZAF", "Africa", "South Africa", 60_042_000),
+    ("KEN", "Africa", "Kenya", 54_986_000),
+    ("MAR", "Africa", "Morocco", 37_344_000),
+    ("GHA", "Africa", "Ghana", 31_732_000),
+    ("DZA", "Africa", "Algeria", 44_617_000),
+    ("AUS", "Oceania", "Australia", 25_788_000),
+    ("NZL", "Oceania", "New Zealand", 4_860_000),
+    ("FJI", "Oceania", "Fiji", 902_000),
+    ("PNG", "Oceania", "Papua New Guinea", 9_119_000),
+]
+
+# OWID aggregate rows, which the loader drops
+AGGREGATES = [
+    ("OWID_WRL", None, "World"),
+    ("OWID_AFR", "Africa", "Africa"),
+    ("OWID_ASI", "Asia", "Asia"),
+    ("OWID_EUR", "Europe", "Europe"),
+    ("OWID_NAM", "North America", "North America"),
+    ("OWID_OCE", "Oceania", "Oceania"),
+    ("OWID_SAM", "South America", "South America"),
+]
+
+COUNT_COLUMNS = [
+    "total_cases",
+    "new_cases",
+    "total_deaths",
+    "new_deaths",
+    "icu_patients",
+    "hosp_patients",
+    "weekly_icu_admissions",
+    "weekly_hosp_admissions",
+]
+VACCINATION_COLUMNS = [
+    "total_vaccinations",
+    "people_vaccinated",
+    "people_fully_vaccinated",
+    "new_vaccinations",
+]
+
+# Locations generated together, each block with a generator seeded from
+# the seed and the block number, so the blocks are generated one at a time
+BLOCK_LOCATIONS = 64
+
+
+def make_locations(n):
+    """Get the iso codes, continents, names and populations of `n` locations
+
+    The countries of `COUNTRIES` come first. Past them, the locations
+    are regions of those countries, such as 'Canada region 2' with the
+    iso code 'CAN-02', which share the population of the country.
+
+    Parameters
+    ----------
+    n : int
+        Number of locations.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per location, with the iso_code, continent, location and
+        population columns.
+    """
+    rows = list(COUNTRIES[:n])
+    regions = (n - len(rows)) // len(COUNTRIES) + 1
+    i = 0
+    while len(rows) < n:
+        iso_code, continent, location, population = COUNTRIES[i % len(COUNTRIES)]
+        region = i // len(COUNTRIES) + 1
+        rows.append(
+            (
+                "{}-{:02d}".format(iso_code, region),
+                continent,
+                "{} region {}".format(location, region),
+                population // regions,
+            )
+        )
+        i += 1
+
+    return pd.DataFrame(
+        rows, columns=["iso_code", "continent", "location", "population"]
+    )
+
+
+def _counts(rng, population, days):
+    """Generate the daily counts of a block of locations, as arrays of
+    shape (locations, days) with NaN where nothing was reported."""
+    n = len(population)
+    t = np.arange(days)
+    pop = population.astype(float)[:, None]
+
+    # a few epidemic waves after a first case, reported daily or weekly
+    first = rng.integers(0, min(90, days), n)[:, None]
+    centers = rng.uniform(30, max(days, 31), (n, 4, 1))
+    widths = rng.uniform(10, 60, (n, 4, 1))
+    heights = rng.uniform(0.05, 1, (n, 4, 1)) * rng.uniform(1e-5, 1e-3, (n, 1, 1))
+    rate = (heights * np.exp(-(((t - centers) / widths) ** 2))).sum(axis=1) * pop
+    rate *= 1 + 0.25 * np.sin((t + rng.integers(0, 7, (n, 1))) * 2 * np.pi / 7)
+    new_cases = rng.poisson(rate * (t >= first)).astype(float)
+    weekly = rng.random(n) < 0.2
+    if weekly.any():
+        # weekly reporters put the week on one day and zeros on the others
+        week = np.arange(days) // 7
+        sums = np.zeros((weekly.sum(), week[-1] + 1))
+        np.add.at(sums, (slice(None), week), new_cases[weekly])
+        new_cases[weekly] = np.where(t % 7 == 6, sums[:, week], 0)
+        new_cases[weekly, -1] += sums[:, -1] * (days % 7 != 0)
+    new_deaths = rng.binomial(
+        new_cases.astype(np.int64), rng.uniform(0.003, 0.03, (n, 1))
+    ).astype(float)
+    before = t < first
+    new_cases[before] = np.nan
+    new_deaths[before] = np.nan
+    total_cases = np.cumsum(np.nan_to_num(new_cases), axis=1)
+    total_deaths = np.cumsum(np.nan_to_num(new_deaths), axis=1)
+    total_cases[before] = np.nan
+    total_deaths[before] = np.nan
+
+    # patients in hospital over the last 10 days of cases, where reported
+    admissions = np.nan_to_num(new_cases) * rng.uniform(0.02, 0.08, (n, 1))
+    hosp_patients = np.round(_window_sum(admissions, 10))
+    icu_patients = np.round(hosp_patients * rng.uniform(0.1, 0.3, (n, 1)))
+    weekly_hosp = np.round(_window_sum(admissions, 7))
+    weekly_icu = np.round(weekly_hosp * rng.uniform(0.1, 0.3, (n, 1)))
+    hospital = [icu_patients, hosp_patients, weekly_icu, weekly_hosp]
+    reported = (rng.random(n) < 0.4)[:, None] & (t >= first + 14)
+    reported &= t < rng.integers(days // 2, days + 1, n)[:, None]
+    reported &= rng.random((n, days)) > 0.05
+    for values in hospital:
+        values[~reported] = np.nan
+
+    # vaccinations from about December 2020, on some of the days
+    start = rng.integers(330, 400, n)[:, None]
+    ramp = np.clip((t - start) / rng.uniform(60, 180, (n, 1)), 0, 1)
+    speed = rng.uniform(0.001, 0.01, (n, 1))
+    new_vaccinations = rng.poisson(pop * speed * ramp * np.exp(-(t - start) / 400))
+    total_vaccinations = np.cumsum(new_vaccinations, axis=1).astype(float)
+    people_vaccinated = np.minimum(np.round(total_vaccinations * 0.6), pop * 0.95)
+    people_fully_vaccinated = np.minimum(np.round(total_vaccinations * 0.4), pop * 0.9)
+    new_vaccinations = new_vaccinations.astype(float)
+    vaccinations = [
+        total_vaccinations,
+        people_vaccinated,
+        people_fully_vaccinated,
+        new_vaccinations,
+    ]
+    reported = (t >= start) & (rng.random((n, days)) > 0.3)
+    for values in vaccinations:
+        values[~reported] = np.nan
+
+    return dict(
+        zip(
+            COUNT_COLUMNS + VACCINATION_COLUMNS,
+            [total_cases, new_cases, total_deaths, new_deaths]
+            + hospital
+            + vaccinations,
+        )
+    )
+
+
+def _window_sum(values, window):
+    cumsum = np.cumsum(values, axis=1)
+    cumsum[:, window:] -= cumsum[:, :-window].copy()
+    return cumsum
+
+
+def _frame(locations, dates, counts):
+    """Build the OWID rows of a block of locations, location by location."""
+    n, days = len(locations), len(dates)
+    population = locations["population"].to_numpy()
+    columns = {
+        column: np.repeat(locations[column].to_numpy(), days)
+        for column in ["iso_code", "continent", "location"]
+    }
+    columns["date"] = np.tile(dates.strftime("%Y-%m-%d").to_numpy(), n)
+    for column, values in counts.items():
+        columns[column] = values.ravel()
+        if column in COUNT_COLUMNS:
+            rate = values / population[:, None] * 1e6
+            columns[column + "_per_million"] = np.round(rate, 3).ravel()
+    columns["population"] = np.repeat(population, days)
+
+    return pd.DataFrame(columns)[COLUMNS]
+
+
+def generate_blocks(locations=200, days=1000, seed=0, start="2020-01-01"):
+    """Generate synthetic covid data, in blocks of locations
+
+    Every block is a dataframe of the OWID csv columns of `COLUMNS`,
+    sorted by location then date, with NaN wherever OWID leaves a value
+    empty: before the first case, on days without vaccination reports
+    and for locations without hospital data. The totals are the
+    cumulative sums of the daily counts, the rates per million are
+    computed from the population, and some locations report weekly,
+    with zeros on the other days. The OWID aggregate rows (World and the
+    continents) follow in a last block. The data only depends on the
+    arguments.
+
+    Parameters
+    ----------
+    locations : int, optional
+        Number of locations, by default 200.
+        See `make_locations`.
+    days : int, optional
+        Number of days, by default 1000.
+    seed : int, optional
+        Seed of the random numbers, by default 0.
+    start : str, optional
+        First date with format 'YYYY-MM-DD', by default '2020-01-01'.
+
+    Yields
+    ------
+    pandas.DataFrame
+        OWID rows of a block of locations.
+
+    Examples
+    --------
+    >>> df = pd.concat(generate_blocks(locations=2000, days=1500))
+    """
+    table = make_locations(locations)
+    dates = pd.date_range(start, periods=days)
+    totals = {}
+
+    for i in range(0, locations, BLOCK_LOCATIONS):
+        block = table.iloc[i : i + BLOCK_LOCATIONS]
+        rng = np.random.default_rng([seed, i // BLOCK_LOCATIONS])
+        counts = _counts(rng, block["population"].to_numpy(), days)
+        yield _frame(block, dates, counts)
+
+        for continent, rows in block.groupby("continent").indices.items():
+            for key in [continent, None]:
+                sums = totals.setdefault(key, {"population": 0})
+                sums["population"] += int(block["population"].iloc[rows].sum())
+                for column, values in counts.items():
+                    part = np.nan_to_num(values[rows]).sum(axis=0)
+                    sums[column] = sums.get(column, 0) + part
+
+    aggregates = pd.DataFrame(
+        [row for row in AGGREGATES if row[1] in totals],
+        columns=["iso_code", "continent", "location"],
+    )
+    if len(aggregates) == 0:
+        return
+    sums = [totals[continent] for continent in aggregates["continent"]]
+    aggregates["population"] = [s["population"] for s in sums]
+    # OWID leaves the continent of the aggregates empty
+    aggregates["continent"] = None
+    counts = {
+        column: np.array([s[column] for s in sums], dtype=float)
+        for column in COUNT_COLUMNS + VACCINATION_COLUMNS
+    }
+    yield _frame(aggregates, dates, counts)
+
+
+def generate(locations=200, days=1000, seed=0, start="2020-01-01"):
+    """Generate synthetic covid data
+    Concatenate the blocks of `generate_blocks` into one dataframe
+    of the OWID csv, aggregate rows included.
+
+    Examples
+    --------
+    >>> generate(locations=30, days=900).to_csv("covid.csv", index=False)
+    """
+    return pd.concat(generate_blocks(locations, days, seed, start), ignore_index=True)
+
+
+def parse_source(source):
+    """Get the arguments of a synthetic source
+
+    Parameters
+    ----------
+    source : str
+        Source of the form 'synthetic:locations=2000,days=1500,seed=1',
+        where every argument of `generate_blocks` is optional.
+
+    Returns
+    -------
+    dict or None
+        Keyword arguments of `generate_blocks`,
+        or None when `source` is not synthetic.
+
+    Examples
+    --------
+    >>> parse_source("synthetic:locations=2000,days=1500")
+    {'locations': 2000, 'days': 1500}
+    """
+    if not source.startswith(SCHEME):
+        return None
+
+    kwargs = {}
+    for name, value in urllib.parse.parse_qsl(
+        source[len(SCHEME) :].replace(",", "&"), strict_parsing=False
+    ):
+        if name not in ("locations", "days", "seed", "start"):
+            raise ValueError("Unknown synthetic data argument: {}".format(name))
+        kwargs[name] = value if name == "start" else int(value)
+
+    return kwargs
+
+
+def write_csv(path, locations=200, days=1000, seed=0, start="2020-01-01"):
+    """Write synthetic covid data as an OWID csv file, a block at a time.
+
+    Examples
+    --------
+    >>> write_csv("/tmp/covid-2000x1500.csv", locations=2000, days=1500)
+    """
+    with open(path, "w", newline="") as f:
+        for i, block in enumerate(generate_blocks(locations, days, seed, start)):
+            block.to_csv(f, index=False, header=i == 0, float_format="%.10g")
+
+    return path
+
+
+if __name__ == "__main__":
+    import utility
+
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic OWID-shaped covid data"
+    )
+    parser.add_argument("--locations", type=int, default=200)
+    parser.add_argument("--days", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", default="2020-01-01")
+    parser.add_argument("--csv", help="write the OWID csv file")
+    parser.add_argument(
+        "--data-dir",
+        help="write the parquet snapshot and the shared Arrow file the app loads",
+    )
+    args = parser.parse_args()
+    kwargs = dict(
+        locations=args.locations, days=args.days, seed=args.seed, start=args.start
+    )
+
+    if args.csv:
+        print(write_csv(args.csv, **kwargs))
+    if args.data_dir:
+        source = SCHEME + ",".join("{}={}".format(*item) for item in kwargs.items())
+        df = utility.read_source(source)
+        print(utility.write_snapshot(df, args.data_dir))
+        print(utility.write_shared(df, args.data_dir))
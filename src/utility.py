@@ -1,13 +1,548 @@
+import hashlib
+import os
+import numpy as np
 import pandas as pd
-from datetime import datetime
-import time
-from dash import Dash, html, dcc, Input, Output
-import dash_bootstrap_components as dbc
+import urllib.parse
+import urllib.request
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+from store import DataStore
 
+DATA_URL = os.environ.get(
+    "COVID_DATA_SOURCE", "https://covid.ourworldindata.org/data/owid-covid-data.csv"
+)
+DATA_DIR = os.environ.get(
+    "COVID_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+)
+DATA_MODE = os.environ.get("COVID_DATA_MODE", "snapshot")
+SNAPSHOT_FILE = "owid-covid-data.parquet"
+SHARED_FILE = "owid-covid-data.arrow"
+ROLLING_SUFFIX = "_rolling"
+# Seconds a download of the source may wait on the server
+SOURCE_TIMEOUT = float(os.environ.get("COVID_SOURCE_TIMEOUT", 60))
 
-def get_data(date_from=None, date_to=None, location=None):
+COLUMNS = [
+    "iso_code",
+    "continent",
+    "location",
+    "date",
+    "total_cases",
+    "new_cases",
+    "total_deaths",
+    "new_deaths",
+    "total_cases_per_million",
+    "new_cases_per_million",
+    "total_deaths_per_million",
+    "new_deaths_per_million",
+    "icu_patients",
+    "icu_patients_per_million",
+    "hosp_patients",
+    "hosp_patients_per_million",
+    "weekly_icu_admissions",
+    "weekly_icu_admissions_per_million",
+    "weekly_hosp_admissions",
+    "weekly_hosp_admissions_per_million",
+    "total_vaccinations",
+    "people_vaccinated",
+    "people_fully_vaccinated",
+    "new_vaccinations",
+    "population",
+]
+
+# Declared dtypes of the dashboard columns, applied whenever data is loaded.
+# Counts are whole numbers. The rates charted by the dashboard stay float64:
+# in float32 their rolling means shift enough for the downsampling of the
+# charts to keep other points. The other rates only need float32 precision.
+SCHEMA = {
+    "iso_code": "category",
+    "continent": "category",
+    "location": "category",
+    "date": "datetime64[ns]",
+    "total_cases": "int32",
+    "new_cases": "int32",
+    "total_deaths": "int32",
+    "new_deaths": "int32",
+    "total_cases_per_million": "float64",
+    "new_cases_per_million": "float64",
+    "total_deaths_per_million": "float64",
+    "new_deaths_per_million": "float64",
+    "icu_patients": "int32",
+    "icu_patients_per_million": "float64",
+    "hosp_patients": "int32",
+    "hosp_patients_per_million": "float64",
+    "weekly_icu_admissions": "int32",
+    "weekly_icu_admissions_per_million": "float32",
+    "weekly_hosp_admissions": "int32",
+    "weekly_hosp_admissions_per_million": "float32",
+    "total_vaccinations": "int64",
+    "people_vaccinated": "int64",
+    "people_fully_vaccinated": "int64",
+    "new_vaccinations": "int32",
+    "population": "int64",
+}
+DAY_COLUMN = "day"
+DAY_EPOCH = np.datetime64("2020-01-01", "D")
+CSV_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def open_source(source):
+    """Open covid source data
+    Open a local csv file, or stream it from a URL without downloading
+    the whole file first. A URL read that gets no data for
+    `SOURCE_TIMEOUT` seconds fails.
+
+    Parameters
+    ----------
+    source : str
+        URL or local path of the OWID csv file.
+
+    Returns
+    -------
+    file object
+        Binary file object reading the csv.
+    """
+    if urllib.parse.urlparse(source).scheme in ("http", "https", "ftp", "file"):
+        return urllib.request.urlopen(source, timeout=SOURCE_TIMEOUT)
+
+    return open(source, "rb")
+
+
+def csv_blocks(f, block_size=CSV_BLOCK_SIZE):
+    """Split a csv file into blocks of whole lines
+    Read the file `block_size` bytes at a time and cut every block
+    after its last line break. Each block starts with the header line,
+    so it can be parsed on its own. Quoted values must not contain line
+    breaks, which holds for the OWID csv.
+
+    Parameters
+    ----------
+    f : file object
+        Binary file object reading the csv.
+    block_size : int, optional
+        Bytes read at a time, by default 4 MB.
+
+    Returns
+    -------
+    generator
+        Blocks of csv text as bytes.
+    """
+    header = f.readline()
+    rest = b""
+
+    while True:
+        data = f.read(block_size)
+        if not data:
+            break
+        data = rest + data
+        end = data.rfind(b"\n") + 1
+        rest = data[end:]
+        if end > 0:
+            yield header + data[:end]
+
+    if rest.strip():
+        yield header + rest
+
+
+def source_types():
+    """Get the arrow types the source columns are read with
+    Counts are read as floats since the csv leaves them empty
+    where nothing was reported.
+
+    Returns
+    -------
+    dict
+        Arrow type of every column of `COLUMNS`.
+    """
+    types = {}
+    for column in COLUMNS:
+        dtype = SCHEMA[column]
+        if dtype == "category":
+            types[column] = pa.string()
+        elif dtype == "float32":
+            types[column] = pa.float32()
+        else:
+            types[column] = pa.float64()
+    types["date"] = pa.timestamp("s")
+
+    return types
+
+
+def clean_table(table, since=None):
+    """Clean a block of source rows
+    Drop the OWID aggregate rows and the rows dated up to `since`,
+    fill the missing counts with zeros and dictionary encode the
+    text columns.
+
+    Parameters
+    ----------
+    table : pyarrow.Table
+        Source rows with the `COLUMNS` of the types of `source_types`.
+    since : pandas.Timestamp, optional
+        Only rows dated after it are kept.
+        By default 'None' is used to keep every row.
+
+    Returns
+    -------
+    pyarrow.Table
+        The cleaned rows.
+    """
+    keep = pc.invert(pc.starts_with(table.column("iso_code"), "OWID"))
+    if since is not None:
+        keep = pc.and_(
+            keep,
+            pc.greater(table.column("date"), pa.scalar(since, pa.timestamp("s"))),
+        )
+    table = table.filter(keep)
+
+    arrays = []
+    for column in COLUMNS:
+        array = table.column(column)
+        if SCHEMA[column] == "category":
+            array = pc.dictionary_encode(array)
+        elif column != "date":
+            array = pc.fill_null(array, 0)
+        arrays.append(array)
+
+    return pa.Table.from_arrays(arrays, names=COLUMNS)
+
+
+def read_source(source=None, since=None, block_size=CSV_BLOCK_SIZE):
+    """Read covid source data
+    Read the raw OWID csv and keep the dashboard columns only,
+    without the OWID aggregate rows (World, continents, income groups).
+
+    The csv is streamed in blocks of `block_size` bytes, each parsed by
+    pyarrow with the column types declared up front and only the
+    `COLUMNS` converted. The rows of a block are filtered and its text
+    columns dictionary encoded before the next block is read, so the
+    raw file is never held in memory.
+
+    Parameters
+    ----------
+    source : str, optional
+        URL or local path of the OWID csv file, or a synthetic source
+        such as 'synthetic:locations=2000,days=1500' (see `synthetic`).
+        By default 'None' is used for `DATA_URL`.
+    since : pandas.Timestamp, optional
+        Only rows dated after it are kept.
+        By default 'None' is used to keep every row.
+    block_size : int, optional
+        Bytes of csv parsed at a time, by default 4 MB.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Pandas dataframe of the cleaned covid data sorted by date.
+
+    Examples
+    --------
+    >>> read_source("owid-covid-data.csv")
+    >>> read_source(since=pd.Timestamp("2022-03-01"))
+    """
+    if source is None:
+        source = DATA_URL
+
+    types = source_types()
+    tables = []
+
+    # imported here since it builds on the columns of this module
+    import synthetic
+
+    synthetic_args = synthetic.parse_source(source)
+    if synthetic_args is not None:
+        schema = pa.schema(types.items())
+        for block in synthetic.generate_blocks(**synthetic_args):
+            table = pa.Table.from_pandas(block, preserve_index=False)
+            tables.append(clean_table(table.cast(schema), since))
+            del block, table
+    else:
+        read_options = pa_csv.ReadOptions(use_threads=False)
+        convert_options = pa_csv.ConvertOptions(
+            include_columns=COLUMNS, column_types=types
+        )
+        with open_source(source) as f:
+            for block in csv_blocks(f, block_size):
+                table = pa_csv.read_csv(
+                    pa.py_buffer(block),
+                    read_options=read_options,
+                    convert_options=convert_options,
+                )
+                del block
+                tables.append(clean_table(table, since))
+
+    if not tables:
+        return apply_schema(pd.DataFrame(columns=COLUMNS))
+
+    table = pa.concat_tables(tables)
+    del tables
+    table = table.take(pc.sort_indices(table, sort_keys=[("date", "ascending")]))
+
+    return apply_schema(table.to_pandas(split_blocks=True, self_destruct=True))
+
+
+def apply_schema(df):
+    """Apply the compact column types
+    Convert the covid columns to the types declared in `SCHEMA`:
+    category codes for the text columns, integers for the counts and
+    float32 for the rates that are not charted. An int32 'day' column
+    with the number of days since 2020-01-01 is added next to the date.
+
+    A count column holding values that are not whole numbers or do not
+    fit its integer type is kept as float64, so no value is changed.
+    Columns already of their declared type are not copied, so memory
+    mapped data stays shared.
+
+    Parameters
+    ----------
+    df : pandas dataframe
+        The cleaned covid dataframe.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Pandas dataframe with the `COLUMNS` and the day column.
+
+    Examples
+    --------
+    >>> apply_schema(load_snapshot()).memory_usage(deep=True).sum()
+    """
+    columns = {}
+    for column in COLUMNS:
+        values = df[column]
+        dtype = np.dtype(SCHEMA[column]) if SCHEMA[column] != "category" else None
+
+        if dtype is None:
+            values = values.astype("category")
+        elif values.dtype != dtype and dtype.kind == "i":
+            numbers = values.to_numpy(dtype="float64")
+            bounds = np.iinfo(dtype)
+            if (
+                np.array_equal(numbers, np.trunc(numbers))
+                and (numbers >= bounds.min).all()
+                and (numbers <= bounds.max).all()
+            ):
+                values = values.astype(dtype)
+            else:
+                values = values.astype("float64", copy=False)
+        else:
+            values = values.astype(dtype, copy=False)
+
+        columns[column] = values
+
+    if DAY_COLUMN in df and df[DAY_COLUMN].dtype == np.int32:
+        columns[DAY_COLUMN] = df[DAY_COLUMN]
+    else:
+        days = columns["date"].to_numpy().astype("datetime64[D]") - DAY_EPOCH
+        columns[DAY_COLUMN] = pd.Series(days.astype("int32"), index=df.index)
+
+    return pd.DataFrame(columns, copy=False)
+
+
+def snapshot_path(data_dir=None):
+    """Get the location of the columnar snapshot
+    Build the path of the parquet snapshot inside the data directory.
+
+    Parameters
+    ----------
+    data_dir : str, optional
+        Directory holding the snapshot.
+        By default 'None' is used for `DATA_DIR`.
+
+    Returns
+    -------
+    str
+        Path of the snapshot file.
+    """
+    if data_dir is None:
+        data_dir = DATA_DIR
+
+    return os.path.join(data_dir, SNAPSHOT_FILE)
+
+
+def write_snapshot(df, data_dir=None):
+    """Write a columnar snapshot
+    Store the cleaned covid data as a compressed parquet file.
+    The file is written next to its final location and renamed in place,
+    so workers reading concurrently never see a partial snapshot.
+
+    Parameters
+    ----------
+    df : pandas dataframe
+        The cleaned covid dataframe, as returned by `read_source`.
+    data_dir : str, optional
+        Directory holding the snapshot.
+        By default 'None' is used for `DATA_DIR`.
+
+    Returns
+    -------
+    str
+        Path of the written snapshot file.
+    """
+    path = snapshot_path(data_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    df.to_parquet(tmp_path, index=False, compression="zstd")
+    os.replace(tmp_path, path)
+
+    return path
+
+
+def load_snapshot(data_dir=None):
+    """Load the columnar snapshot
+    Read the parquet snapshot written by `write_snapshot`,
+    with the column types of `SCHEMA`.
+
+    Parameters
+    ----------
+    data_dir : str, optional
+        Directory holding the snapshot.
+        By default 'None' is used for `DATA_DIR`.
+
+    Returns
+    -------
+    pandas.DataFrame or None
+        Pandas dataframe of the covid data, or None when there is no snapshot.
+    """
+    path = snapshot_path(data_dir)
+
+    if not os.path.exists(path):
+        return None
+
+    return apply_schema(pd.read_parquet(path))
+
+
+def build_snapshot(source=None, data_dir=None):
+    """Build the columnar snapshot
+    Ingest the OWID csv once and store it as the parquet snapshot.
+
+    Parameters
+    ----------
+    source : str, optional
+        URL or local path of the OWID csv file.
+        By default 'None' is used for `DATA_URL`.
+    data_dir : str, optional
+        Directory holding the snapshot.
+        By default 'None' is used for `DATA_DIR`.
+
+    Returns
+    -------
+    str
+        Path of the written snapshot file.
+
+    Examples
+    --------
+    >>> build_snapshot("owid-covid-data.csv", data_dir="/tmp/covid")
+    """
+    return write_snapshot(read_source(source), data_dir)
+
+
+def shared_path(data_dir=None):
+    """Get the location of the shared dataset file
+    Build the path of the Arrow IPC file inside the data directory.
+
+    Parameters
+    ----------
+    data_dir : str, optional
+        Directory holding the file.
+        By default 'None' is used for `DATA_DIR`.
+
+    Returns
+    -------
+    str
+        Path of the shared dataset file.
+    """
+    if data_dir is None:
+        data_dir = DATA_DIR
+
+    return os.path.join(data_dir, SHARED_FILE)
+
+
+def write_shared(df, data_dir=None):
+    """Write the shared dataset file
+    Store the cleaned covid data as an uncompressed Arrow IPC file
+    that workers can memory map. The string columns are stored as
+    dictionaries so that they are mapped as integer codes too.
+
+    Parameters
+    ----------
+    df : pandas dataframe
+        The cleaned covid dataframe, as returned by `read_source`.
+    data_dir : str, optional
+        Directory holding the file.
+        By default 'None' is used for `DATA_DIR`.
+
+    Returns
+    -------
+    str
+        Path of the written file.
+    """
+    path = shared_path(data_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    df = df.astype(
+        {"iso_code": "category", "continent": "category", "location": "category"}
+    )
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+    return path
+
+
+def load_shared(data_dir=None):
+    """Load the shared dataset file
+    Memory map the Arrow IPC file written by `write_shared`.
+    The numeric, date and code columns of the returned dataframe
+    point into the mapped file, so every process that loads it
+    shares the same pages of the OS page cache. They are read-only.
+
+    Parameters
+    ----------
+    data_dir : str, optional
+        Directory holding the file.
+        By default 'None' is used for `DATA_DIR`.
+
+    Returns
+    -------
+    pandas.DataFrame or None
+        Pandas dataframe of the covid data, or None when there is no file.
+    """
+    path = shared_path(data_dir)
+
+    if not os.path.exists(path):
+        return None
+
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+    return apply_schema(table.to_pandas(split_blocks=True))
+
+
+def get_data(
+    date_from=None, date_to=None, location=None, source=None, data_dir=None, mode=None
+):
     """Get covid data
-    Retrieve covid data in pandas dataframe format
+    Retrieve covid data in pandas dataframe format.
+    The columnar snapshot is used when present, otherwise the csv
+    is downloaded, cleaned and stored as the snapshot for the next start.
+
+    Parameters
+    ----------
+    source : str, optional
+        URL or local path of the OWID csv file.
+        By default 'None' is used for `DATA_URL`.
+    data_dir : str, optional
+        Directory holding the snapshot.
+        By default 'None' is used for `DATA_DIR`.
+    mode : str, optional
+        'snapshot' keeps a private copy of the data in the process,
+        'shared' memory maps the Arrow file written by `write_shared`.
+        By default 'None' is used for `DATA_MODE`.
 
     Returns
     -------
@@ -17,49 +552,116 @@ def get_data(date_from=None, date_to=None, location=None):
     Examples
     --------
     >>> get_data()
+    >>> get_data(mode="shared")
     """
-    url = "https://covid.ourworldindata.org/data/owid-covid-data.csv"
-
-    try:
-        df = pd.read_csv(url, parse_dates=["date"])
-    except BaseException:
-        return "The link to the data is broken."
-
-    columns = [
-        "iso_code",
-        "continent",
-        "location",
-        "date",
-        "total_cases",
-        "new_cases",
-        "total_deaths",
-        "new_deaths",
-        "total_cases_per_million",
-        "new_cases_per_million",
-        "total_deaths_per_million",
-        "new_deaths_per_million",
-        "icu_patients",
-        "icu_patients_per_million",
-        "hosp_patients",
-        "hosp_patients_per_million",
-        "weekly_icu_admissions",
-        "weekly_icu_admissions_per_million",
-        "weekly_hosp_admissions",
-        "weekly_hosp_admissions_per_million",
-        "total_vaccinations",
-        "people_vaccinated",
-        "people_fully_vaccinated",
-        "new_vaccinations",
-        "population",
-    ]
-
-    df = df[columns]
-
-    df = df.fillna(value=0)
-
-    df = df[~df["iso_code"].str.startswith("OWID")]
-
-    return df.sort_values("date")
+    if mode is None:
+        mode = DATA_MODE
+
+    if mode == "shared" and os.path.exists(shared_path(data_dir)):
+        snapshot = snapshot_path(data_dir)
+        if not os.path.exists(snapshot) or os.path.getmtime(
+            shared_path(data_dir)
+        ) >= os.path.getmtime(snapshot):
+            return load_shared(data_dir)
+
+    df = load_snapshot(data_dir)
+
+    if df is None:
+        try:
+            df = read_source(source)
+        except BaseException:
+            return "The link to the data is broken."
+
+        try:
+            write_snapshot(df, data_dir)
+        except OSError:
+            pass
+
+    if mode == "shared":
+        # a read-only or full data directory falls back to a private copy
+        try:
+            write_shared(df, data_dir)
+        except OSError:
+            return df
+        return load_shared(data_dir)
+
+    return df
+
+
+def add_rolling_means(df, columns, window=8):
+    """Add rolling means of covid indicators
+    Compute the mean of each indicator over the last `window` rows of
+    the same location, like the `transform_window(frame=[-7, 0])` the
+    charts used to run in the browser. The means are added in place as
+    '<column>_rolling' columns.
+
+    The rows are grouped by location with a stable sort, so they stay
+    in date order, and every mean is the difference of two cumulative
+    sums, which keeps the whole computation vectorized.
+
+    Parameters
+    ----------
+    df : pandas dataframe
+        The covid dataframe sorted by date, as returned by `get_data`.
+    columns : list
+        Indicator columns to average.
+    window : int, optional
+        Number of rows in the window, by default 8 (the day and the 7 before).
+
+    Returns
+    -------
+    pandas.DataFrame
+        The covid dataframe with the rolling mean columns.
+
+    Examples
+    --------
+    >>> add_rolling_means(get_data(), ["new_cases", "new_deaths"])
+    """
+    codes = pd.factorize(df["location"])[0]
+    order = np.argsort(codes, kind="stable")
+    grouped_codes = codes[order]
+
+    values = df[columns].to_numpy(dtype="float64")[order]
+    sums = np.zeros((len(values) + 1, len(columns)))
+    np.cumsum(values, axis=0, out=sums[1:])
+
+    position = np.arange(len(values))
+    start = np.maximum(
+        position - window + 1, np.searchsorted(grouped_codes, grouped_codes)
+    )
+    means = (sums[position + 1] - sums[start]) / (position + 1 - start)[:, None]
+
+    rolling = np.empty_like(means)
+    rolling[order] = means
+    for i, column in enumerate(columns):
+        df[column + ROLLING_SUFFIX] = rolling[:, i]
+
+    return df
+
+
+def dataset_version(df):
+    """Get the version of covid data
+    Hash the content of the dataframe, so that every worker loading
+    the same data computes the same version.
+
+    Parameters
+    ----------
+    df : pandas dataframe
+        The covid dataframe, as returned by `get_data`.
+
+    Returns
+    -------
+    str
+        Short hexadecimal digest of the data.
+
+    Examples
+    --------
+    >>> dataset_version(get_data())
+    '730ce298aa78'
+    """
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+    return hashlib.sha1(hashes.tobytes()).hexdigest()[:12]
 
 
 def filter_data(df, date_from=None, date_to=None, countries=[]):
@@ -69,8 +671,9 @@ def filter_data(df, date_from=None, date_to=None, countries=[]):
 
     Parameters
     ----------
-    df : pandas dataframe
-        The covid dataframe to filter
+    df : pandas dataframe or DataStore
+        The covid dataframe to filter. A `DataStore` is filtered
+        through its location and date index instead of a query.
     date_from : str, optional
         Start date of the data range with format 'YYYY-MM-DD'.
         By default 'None' is used to represent earliest date available
@@ -93,6 +696,9 @@ def filter_data(df, date_from=None, date_to=None, countries=[]):
                 location=["Canada", "United States"])
     """
 
+    if isinstance(df, DataStore):
+        return df.filter(date_from, date_to, countries)
+
     query = "@date_from <= date <= @date_to"
 
     if date_from is None:
@@ -103,8 +709,11 @@ def filter_data(df, date_from=None, date_to=None, countries=[]):
 
     if len(countries) > 0:
         query += " and location in @countries"
-    print(len(countries))
-    print(query)
     df = df.query(query)
 
     return df.copy()
+
+
+if __name__ == "__main__":
+    print(build_snapshot())
+    print(write_shared(load_snapshot()))
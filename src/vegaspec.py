@@ -0,0 +1,271 @@
+import hashlib
+import json
+import re
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+DATA_NAME = "table"
+GENERATED_NAME = re.compile(r"\b(param|view)_\d+\b")
+
+
+def encode_columns(df):
+    """Encode a dataframe as compact columns
+    Serialize the data of a chart column by column instead of one object
+    per row. Text columns are dictionary encoded, since the same
+    locations repeat on every row. Date columns of whole days are sent
+    as the first day and the number of days from each row to the next,
+    which are mostly 0 or 1 since the rows are sorted by date; other
+    date columns are dictionary encoded.
+
+    Parameters
+    ----------
+    df : pandas dataframe
+        The data of the chart.
+
+    Returns
+    -------
+    dict
+        Column name to either {'values': [...]},
+        {'dictionary': [...], 'codes': [...]}, where a code of -1 is null,
+        or {'origin': 'YYYY-MM-DD', 'steps': [...]} for the days.
+
+    Examples
+    --------
+    >>> encode_columns(pd.DataFrame({"location": ["Canada", "Canada"]}))
+    {'location': {'dictionary': ['Canada'], 'codes': [0, 0]}}
+    """
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_datetime64_any_dtype(values) and len(values):
+            days = values.to_numpy().astype("datetime64[D]")
+            if not values.isna().any() and (days == values.to_numpy()).all():
+                steps = np.diff(days.astype("int64"), prepend=days[0].astype("int64"))
+                columns[column] = {
+                    "origin": str(days[0]),
+                    "steps": steps.tolist(),
+                }
+                continue
+        if pd.api.types.is_bool_dtype(values) or not pd.api.types.is_numeric_dtype(
+            values
+        ):
+            codes, dictionary = pd.factorize(values)
+            if pd.api.types.is_datetime64_any_dtype(values):
+                # same naive ISO format as Altair, parsed as local time by Vega;
+                # only the distinct dates are formatted
+                dictionary = dictionary.strftime("%Y-%m-%dT%H:%M:%S")
+            columns[column] = {
+                "dictionary": dictionary.tolist(),
+                "codes": codes.tolist(),
+            }
+        else:
+            finite = np.isfinite(values.astype("float64"))
+            columns[column] = {
+                "values": values.astype(object).where(finite, None).tolist()
+            }
+
+    return columns
+
+
+def normalize_names(spec):
+    """Renumber the generated names of a chart spec
+    Altair names unnamed params and views from global counters
+    ('param_12', 'view_7'), so the same chart gets a different spec on
+    every call. Renumbering them by order of appearance makes equal
+    charts give equal specs.
+
+    Parameters
+    ----------
+    spec : str
+        Vega-Lite spec as JSON text.
+
+    Returns
+    -------
+    str
+        The spec with generated names renumbered from 1.
+
+    Examples
+    --------
+    >>> normalize_names('{"params": [{"name": "param_12"}]}')
+    '{"params": [{"name": "param_1"}]}'
+    """
+    names = {}
+
+    def rename(match):
+        prefix, name = match.group(1), match.group(0)
+        if name not in names:
+            names[name] = "{}_{}".format(
+                prefix, sum(1 for other in names if other.startswith(prefix)) + 1
+            )
+        return names[name]
+
+    return GENERATED_NAME.sub(rename, spec)
+
+
+def spec_fields(spec):
+    """Plan the columns a chart spec reads
+    Collect the data fields of the encodings, tooltips and selections
+    of a Vega-Lite spec, in the layers too, so that only those columns
+    are sent to the browser.
+
+    Parameters
+    ----------
+    spec : dict
+        Vega-Lite spec.
+
+    Returns
+    -------
+    set or None
+        Names of the fields, or None when the spec reads fields it does
+        not name, such as in expressions of transforms, and every column
+        is needed.
+
+    Examples
+    --------
+    >>> spec_fields({"encoding": {"x": {"field": "date", "type": "temporal"}}})
+    {'date'}
+    """
+    fields = set()
+
+    def collect(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "transform" and value:
+                    return False
+                if key == "field":
+                    if not isinstance(value, str):
+                        return False
+                    fields.add(value)
+                elif key in ("fields", "groupby") and isinstance(value, list):
+                    fields.update(value)
+                elif not collect(value):
+                    return False
+        elif isinstance(node, list):
+            return all(collect(value) for value in node)
+        return True
+
+    return fields if collect(spec) else None
+
+
+def set_scale_type(spec, scale):
+    """Set the type of the y scales of a chart spec
+    Change, in place, the scale type of every y encoding that declares
+    a scale, in the layers too.
+
+    Parameters
+    ----------
+    spec : dict
+        Vega-Lite spec.
+    scale : str
+        Vega-Lite scale type, such as 'linear' or 'symlog'.
+
+    Returns
+    -------
+    dict
+        The spec.
+    """
+    if isinstance(spec, dict):
+        y = spec.get("encoding", {}).get("y")
+        if isinstance(y, dict) and isinstance(y.get("scale"), dict):
+            y["scale"]["type"] = scale
+        for value in spec.values():
+            set_scale_type(value, scale)
+    elif isinstance(spec, list):
+        for value in spec:
+            set_scale_type(value, scale)
+
+    return spec
+
+
+class SpecTemplate:
+    """Chart spec built and validated once, filled with data per call
+
+    Building an Altair chart object and converting it with `to_dict`,
+    which validates it against the Vega-Lite schema, costs tens of
+    milliseconds whatever the size of the data. The template converts
+    a chart without data once; `payload` then only sets the scale type
+    and encodes the columns the spec reads (see `spec_fields`).
+
+    Parameters
+    ----------
+    chart : altair.Chart or altair.LayerChart
+        Chart without data, where every encoding has an explicit type.
+
+    Examples
+    --------
+    >>> template = SpecTemplate(alt.Chart().mark_line().encode(
+    ...     x="date:T", y=alt.Y("count:Q", scale=alt.Scale(type="linear"))))
+    >>> template.payload(df, scale="symlog")
+    """
+
+    def __init__(self, chart):
+        chart = chart.copy(deep=False)
+        chart.data = alt.NamedData(name=DATA_NAME)
+        self.spec = normalize_names(json.dumps(chart.to_dict(), sort_keys=True))
+        self.fields = spec_fields(json.loads(self.spec))
+        # spec and key per scale type
+        self._specs = {}
+
+    def project(self, df):
+        """Select the columns of `df` the chart reads.
+
+        Parameters
+        ----------
+        df : pandas dataframe
+            The filtered covid dataframe.
+
+        Returns
+        -------
+        pandas.DataFrame
+            A new dataframe of the columns of `df` in `fields`,
+            or of every column when the fields are not known.
+        """
+        if self.fields is None:
+            return df.copy()
+        return df[[column for column in df.columns if column in self.fields]].copy()
+
+    def _spec(self, scale):
+        if scale not in self._specs:
+            spec = json.loads(self.spec)
+            if scale is not None:
+                set_scale_type(spec, scale)
+            key = hashlib.sha1(
+                json.dumps(spec, sort_keys=True).encode("utf-8")
+            ).hexdigest()
+            self._specs[scale] = spec, key
+        return self._specs[scale]
+
+    def payload(self, data, scale=None):
+        """Build the payload of the chart for `data`
+        The payload holds the spec, which reads the named data source
+        'table', and the data as compact columns. The key hashes the
+        spec, so the browser only re-embeds the chart when the spec
+        changes and otherwise swaps the data of the existing view.
+
+        Parameters
+        ----------
+        data : pandas dataframe
+            The data of the chart.
+        scale : str, optional
+            Type of the y scales. By default 'None' keeps the type the
+            template was built with.
+
+        Returns
+        -------
+        dict
+            Payload with 'key', 'spec', 'name', 'length' and 'columns'.
+            The spec is shared by the payloads and must not be modified.
+        """
+        spec, key = self._spec(scale)
+        if self.fields is not None and not self.fields.issuperset(data.columns):
+            data = self.project(data)
+
+        return {
+            "key": key,
+            "spec": spec,
+            "name": DATA_NAME,
+            "length": len(data),
+            "columns": encode_columns(data),
+        }
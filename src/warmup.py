@@ -0,0 +1,91 @@
+import collections
+import json
+import threading
+
+try:
+    import fcntl
+except ImportError:  # no file locks on Windows, where the app runs in one process
+    fcntl = None
+
+
+class SelectionLog:
+    """Country selections of recent requests, in a file
+
+    Every rendered tab appends its country selection as a JSON line.
+    The workers of a host can share the file, which they lock while
+    they write or read it. Once the file passes `max_bytes` it is
+    trimmed to its `recent` last lines. `popular` reads the most
+    frequent recent selections for the cache warm-up.
+
+    Parameters
+    ----------
+    path : str, optional
+        File of the log. By default 'None' is used for no log.
+    recent : int, optional
+        Number of last lines `popular` counts and a trim keeps,
+        by default 10000.
+    max_bytes : int, optional
+        Size of the file that triggers a trim, by default 4 MB.
+
+    Examples
+    --------
+    >>> log = SelectionLog("/tmp/covid-selections.jsonl")
+    >>> log.record(["France", "Canada"])
+    >>> log.popular(1)
+    [['Canada', 'France']]
+    """
+
+    def __init__(self, path=None, recent=10000, max_bytes=4 * 1024 * 1024):
+        self.path = path
+        self.recent = recent
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def record(self, countries):
+        """Append a country selection to the log, trim it when too large."""
+        if self.path is None:
+            return
+        line = json.dumps(sorted(countries or [])) + "\n"
+        with self._lock, open(self.path, "a+") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(line)
+            f.flush()
+            if f.tell() > self.max_bytes:
+                # in place, a worker waiting on the lock holds the same file
+                f.seek(0)
+                lines = collections.deque(f, maxlen=self.recent)
+                f.truncate(0)
+                f.writelines(lines)
+
+    def popular(self, n):
+        """Get the `n` most frequent selections of the recent lines.
+
+        Parameters
+        ----------
+        n : int
+            Number of selections.
+
+        Returns
+        -------
+        list
+            Selections, as sorted lists of countries, most frequent first.
+        """
+        if self.path is None or n <= 0:
+            return []
+        try:
+            with open(self.path) as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_SH)
+                lines = collections.deque(f, maxlen=self.recent)
+        except FileNotFoundError:
+            return []
+
+        counts = collections.Counter()
+        for line in lines:
+            try:
+                counts[tuple(json.loads(line))] += 1
+            except (ValueError, TypeError):
+                continue
+
+        return [list(selection) for selection, _ in counts.most_common(n)]
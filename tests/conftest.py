@@ -0,0 +1,94 @@
+import contextlib
+import fnmatch
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURE = os.path.join(HERE, "..", "benchmarks", "data", "owid-covid-fixture.csv")
+
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+# the app and utility read these when imported: the bundled fixture, a
+# snapshot directory of the session, and no warm-up or render workers
+DATA_DIR = tempfile.mkdtemp(prefix="covid-tests-")
+os.environ.update(
+    COVID_DATA_SOURCE=os.path.abspath(FIXTURE),
+    COVID_DATA_DIR=DATA_DIR,
+    COVID_DATA_MODE="snapshot",
+    COVID_WARMUP="off",
+    COVID_RENDER_WORKERS="0",
+    COVID_REFRESH_INTERVAL="0",
+)
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+class FakeRedis:
+    """In-memory stand-in for the four `redis.Redis` methods `RedisCache` uses"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, name):
+        return self.data.get(name)
+
+    def set(self, name, value, ex=None):
+        self.data[name] = value
+
+    def scan_iter(self, match="*"):
+        return [name for name in list(self.data) if fnmatch.fnmatchcase(name, match)]
+
+    def delete(self, *names):
+        return sum(self.data.pop(name, None) is not None for name in names)
+
+
+@pytest.fixture
+def redis_client():
+    return FakeRedis()
+
+
+@pytest.fixture(scope="session")
+def app():
+    """The dashboard app loaded on the bundled fixture"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+
+    return app
+
+
+@pytest.fixture
+def map_request(app):
+    """Builder of the body the browser posts for the map callback"""
+
+    def map_request(active_tab="map-tab", rendered=None, session=None, start=0):
+        inputs = [
+            ("feature_dropdown", "value", "new_cases_per_million"),
+            ("country-selector", "value", ["Canada", "France"]),
+            ("date_slider", "value", [start, app.data.axis.last]),
+            ("tabs", "active_tab", active_tab),
+        ]
+        return {
+            "output": "..map_plot.figure...map_rendered.data..",
+            "outputs": [
+                {"id": "map_plot", "property": "figure"},
+                {"id": "map_rendered", "property": "data"},
+            ],
+            "inputs": [
+                {"id": id, "property": prop, "value": value}
+                for id, prop, value in inputs
+            ],
+            "state": [
+                {"id": "map_rendered", "property": "data", "value": rendered},
+                {"id": "session", "property": "data", "value": session},
+            ],
+            "changedPropIds": ["tabs.active_tab"],
+        }
+
+    return map_request
@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("a2wsgi")
+
+
+@pytest.fixture(scope="module")
+def application(app):
+    from asgi import application
+
+    return application
+
+
+def call(application, scope, messages):
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    return sent
+
+
+def test_lifespan_starts_and_stops(application):
+    sent = call(
+        application,
+        {"type": "lifespan"},
+        [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}],
+    )
+
+    assert [message["type"] for message in sent] == [
+        "lifespan.startup.complete",
+        "lifespan.shutdown.complete",
+    ]
+
+
+def test_request_is_served_by_the_dash_app(application):
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/_dash-layout",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [],
+        "server": ("127.0.0.1", 8000),
+        "client": ("127.0.0.1", 50000),
+    }
+    sent = call(application, scope, [{"type": "http.request", "body": b""}])
+
+    assert sent[0]["type"] == "http.response.start"
+    assert sent[0]["status"] == 200
+    body = b"".join(message.get("body", b"") for message in sent[1:])
+    assert json.loads(body)["type"] == "Div"
@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+from cache import FileCache, LRUCache, RedisCache
+
+
+def test_redis_cache_round_trip(redis_client):
+    cache = RedisCache(redis_client, version="v1")
+    cache.set(("plot_map", "new_cases"), {"data": [1, 2]})
+
+    assert cache.get(("plot_map", "new_cases")) == {"data": [1, 2]}
+    assert cache.get(("plot_map", "new_deaths")) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_redis_cache_version_change_invalidates(redis_client):
+    cache = RedisCache(redis_client, version="v1")
+    cache.set(("plot_map",), 1)
+
+    cache.version = "v2"
+    assert cache.get(("plot_map",)) is None
+    cache.set(("plot_map",), 2)
+    assert cache.get(("plot_map",)) == 2
+    assert cache.get(("plot_map",), version="v1") == 1
+
+
+def test_redis_cache_clear_only_drops_its_prefix(redis_client):
+    redis_client.set("other:key", b"kept")
+    cache = RedisCache(redis_client, version="v1")
+    cache.set(("a",), 1)
+    cache.set(("b",), 2)
+
+    cache.clear()
+
+    assert cache.get(("a",)) is None
+    assert cache.get(("b",)) is None
+    assert list(redis_client.data) == ["other:key"]
+
+
+def test_redis_cache_passes_ttl(redis_client):
+    calls = []
+    redis_client.set = lambda name, value, ex=None: calls.append(ex)
+    RedisCache(redis_client, ttl=1.5).set(("a",), 1)
+
+    assert calls == [2]
+
+
+@pytest.fixture
+def file_cache(tmp_path):
+    return FileCache(str(tmp_path), version="v1")
+
+
+def test_file_cache_version_change_invalidates(file_cache):
+    file_cache.set(("a",), 1)
+    file_cache.version = "v2"
+
+    assert file_cache.get(("a",)) is None
+    assert file_cache.get(("a",), version="v1") == 1
+
+
+def test_file_cache_evicts_least_recently_used(tmp_path):
+    value = b"x" * 1000
+    cache = FileCache(str(tmp_path), max_bytes=3500)
+    files = set()
+    for i, key in enumerate("abc"):
+        cache.set((key,), value)
+        # distinct modification times, the order of the eviction
+        (path,) = set(tmp_path.glob("*.pkl")) - files
+        os.utime(path, (i, i))
+        files.add(path)
+    assert cache.get(("a",)) == value  # refreshes "a"
+
+    cache.set(("d",), value)
+
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == value
+    assert cache.get(("c",)) == value
+    assert cache.get(("d",)) == value
+    assert cache.evictions == 1
+    assert sum(path.stat().st_size for path in tmp_path.glob("*.pkl")) <= 3500
+
+
+def test_file_cache_clear(file_cache):
+    file_cache.set(("a",), 1)
+    file_cache.set(("b",), 2)
+    with file_cache.lease(("a",)):
+        pass
+
+    file_cache.clear()
+
+    assert file_cache.get(("a",)) is None
+    assert file_cache.get(("b",)) is None
+    assert file_cache.stats()["size"] == 0
+
+
+def test_lru_cache_clear_keeps_counters():
+    cache = LRUCache(maxsize=2)
+    cache.set(("a",), 1)
+    cache.get(("a",))
+
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.get(("a",)) is None
+    assert (cache.hits, cache.misses) == (1, 1)
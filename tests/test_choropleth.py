@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from choropleth import choropleth_figure, frame_dates
+from utility import filter_data, get_data
+
+
+@pytest.fixture(scope="module")
+def df():
+    return filter_data(
+        get_data(), "2020-03-01", "2020-04-30", ["Canada", "France", "Japan"]
+    )
+
+
+def test_frames_match_the_pivoted_data(df):
+    figure = choropleth_figure(df, "new_cases", step="day")
+    trace = figure["data"][0]
+
+    pivot = df.pivot(index="date", columns="iso_code", values="new_cases")
+    pivot.columns = pivot.columns.astype(str)
+    assert trace["locations"] == sorted(pivot.columns)
+    assert trace["text"] == ["Canada", "France", "Japan"]
+    assert [frame["name"] for frame in figure["frames"]] == pivot.index.strftime(
+        "%Y-%m-%d"
+    ).tolist()
+    for frame, (_, row) in zip(figure["frames"], pivot[trace["locations"]].iterrows()):
+        assert frame["data"][0]["z"] == row.tolist()
+    assert trace["z"] == figure["frames"][0]["data"][0]["z"]
+    steps = figure["layout"]["sliders"][0]["steps"]
+    assert [step["label"] for step in steps] == [f["name"] for f in figure["frames"]]
+
+
+def test_color_range_covers_every_frame(df):
+    figure = choropleth_figure(df, "new_cases", step="week")
+    coloraxis = figure["layout"]["coloraxis"]
+    values = [z for frame in figure["frames"] for z in frame["data"][0]["z"]]
+
+    assert coloraxis["cmin"] == min(values)
+    assert coloraxis["cmax"] == max(values)
+
+
+def test_missing_values_are_null():
+    df = pd.DataFrame(
+        {
+            "iso_code": ["CAN", "FRA", "CAN"],
+            "location": ["Canada", "France", "Canada"],
+            "date": pd.to_datetime(["2020-01-01", "2020-01-01", "2020-01-02"]),
+            "new_cases": [1.0, 5.0, 3.0],
+        }
+    )
+    figure = choropleth_figure(df, "new_cases")
+
+    assert [frame["data"][0]["z"] for frame in figure["frames"]] == [
+        [1.0, 5.0],
+        [3.0, None],
+    ]
+    assert (
+        figure["layout"]["coloraxis"]["cmin"],
+        figure["layout"]["coloraxis"]["cmax"],
+    ) == (1.0, 5.0)
+
+
+def test_empty_selection():
+    figure = choropleth_figure(get_data().iloc[:0], "new_cases")
+
+    assert figure["frames"] == []
+    assert figure["layout"]["coloraxis"]["cmin"] == 0
+    assert figure["layout"]["coloraxis"]["cmax"] == 1
+
+
+@pytest.mark.parametrize(
+    "step, frames", [("day", 731), ("week", 105), ("month", 24), ("auto", 105)]
+)
+def test_frame_dates_keep_the_last_date(step, frames):
+    dates = pd.date_range("2020-01-01", "2021-12-31")
+    kept = frame_dates(dates, step=step)
+
+    assert len(kept) == frames
+    assert kept[-1] == len(dates) - 1
+    assert (np.diff(kept) > 0).all()
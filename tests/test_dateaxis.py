@@ -0,0 +1,97 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dateaxis import DateAxis
+from utility import get_data
+
+# the legacy "2M" alias is deprecated
+pytestmark = pytest.mark.filterwarnings("ignore:.*deprecated:FutureWarning")
+
+
+def legacy_slider(df):
+    """The slider marks app.py built before DateAxis"""
+    daterange = [x for x in range(len(df["date"].unique()))]
+    try:
+        month_index = pd.date_range(
+            start=df["date"].dt.date.unique()[0],
+            end=df["date"].dt.date.unique()[-1],
+            freq="2M",
+        )
+    except ValueError:  # the alias is "2ME" from pandas 3
+        month_index = pd.date_range(
+            start=df["date"].dt.date.unique()[0],
+            end=df["date"].dt.date.unique()[-1],
+            freq="2ME",
+        )
+    month_index = month_index - pd.offsets.MonthBegin()
+
+    marks = {
+        numd: date.strftime("%Y-%m-%d")
+        for numd, date in zip(daterange, df["date"].dt.date.unique())
+    }
+
+    style = {"color": "#77b0b1"}
+    marks_display = {
+        0: {
+            "label": datetime.strptime(marks.get(0), "%Y-%m-%d").strftime("%y/%m"),
+            "style": style,
+        }
+    }
+    last_index = len(marks) - 1
+    for key, item in marks.items():
+        if key != 0 and item in month_index and last_index - key > 30 and key - 0 > 10:
+            marks_display[key] = {
+                "label": datetime.strptime(item, "%Y-%m-%d").strftime("%y/%m"),
+                "style": style,
+            }
+    marks_display[last_index] = {
+        "label": datetime.strptime(marks.get(last_index), "%Y-%m-%d").strftime("%y/%m"),
+        "style": style,
+    }
+
+    return marks, marks_display
+
+
+def frames():
+    yield get_data()[["date"]]
+    for start, end in [
+        ("2020-01-01", "2022-12-31"),
+        ("2020-01-22", "2021-06-15"),
+        ("2020-02-29", "2020-09-30"),
+        ("2021-03-15", "2021-05-10"),
+    ]:
+        dates = pd.date_range(start, end)
+        # rows of three locations per day
+        yield pd.DataFrame({"date": np.repeat(dates, 3)})
+
+
+@pytest.mark.parametrize("df", list(frames()))
+def test_marks_and_labels_match_the_legacy_slider(df):
+    marks, marks_display = legacy_slider(df)
+    axis = DateAxis(df["date"])
+
+    assert axis.last == len(marks) - 1
+    assert axis.labels.tolist() == [marks[i] for i in range(len(marks))]
+    assert axis.marks() == marks_display
+
+
+def test_range_resolves_slider_positions():
+    df = get_data()
+    axis = DateAxis(df["date"].sample(frac=1, random_state=0))
+    marks, _ = legacy_slider(df)
+
+    for daterange in ([0, axis.last], [3, 40], [axis.last, axis.last]):
+        date_from, date_to = axis.range(daterange)
+        assert str(date_from) == marks[daterange[0]]
+        assert str(date_to) == marks[daterange[1]]
+    assert axis.range(None) == axis.range([0, axis.last])
+
+
+def test_empty_axis():
+    axis = DateAxis(pd.Series([], dtype="datetime64[ns]"))
+
+    assert len(axis) == 0
+    assert axis.marks() == {}
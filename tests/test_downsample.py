@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsample import bucket, downsample, lttb
+
+
+def series(locations, days, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2020-01-01", periods=days)
+    df = pd.DataFrame(
+        {
+            "date": np.tile(dates, len(locations)),
+            "location": np.repeat(locations, days),
+            "rolling_mean": rng.random(len(locations) * days),
+        }
+    )
+    return df.sort_values("date", kind="stable").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("threshold", [3, 10, 99, 100])
+def test_lttb_keeps_the_endpoints_and_size(threshold):
+    y = np.random.default_rng(1).random(1000)
+    kept = lttb(np.arange(1000.0), y, threshold)
+
+    assert len(kept) == threshold
+    assert kept[0] == 0 and kept[-1] == 999
+    assert (np.diff(kept) > 0).all()
+
+
+def test_lttb_keeps_a_peak():
+    y = np.zeros(1000)
+    y[437] = 50
+    assert 437 in lttb(np.arange(1000.0), y, 20)
+
+
+@pytest.mark.parametrize("threshold", [2, 1000, 5000])
+def test_lttb_keeps_every_point_below_three_or_above_length(threshold):
+    kept = lttb(np.arange(1000.0), np.zeros(1000), threshold)
+    assert kept.tolist() == list(range(1000))
+
+
+def test_bucket_averages_each_location_per_week():
+    df = series(["Canada", "France"], 14)
+    weekly = bucket(df, "W")
+
+    assert len(weekly) == 2 * weekly["date"].nunique()
+    first = df[(df["location"] == "Canada") & (df["date"] < "2020-01-06")]
+    row = weekly[weekly["location"] == "Canada"].iloc[0]
+    assert row["date"] == pd.Timestamp("2019-12-30")
+    assert row["rolling_mean"] == pytest.approx(first["rolling_mean"].mean())
+    assert weekly["date"].is_monotonic_increasing
+
+
+def test_downsample_short_range_is_unchanged():
+    df = series(["Canada"], 100)
+    assert downsample(df, width=400) is df
+
+
+@pytest.mark.parametrize("locations", [1, 3])
+def test_downsample_lttb_keeps_endpoints_of_every_series(locations):
+    names = ["L{}".format(i) for i in range(locations)]
+    df = series(names, 900)
+    out = downsample(df, width=400)
+
+    assert len(out) == 200 * locations
+    for _, rows in out.groupby("location"):
+        assert rows["date"].min() == df["date"].min()
+        assert rows["date"].max() == df["date"].max()
+    # real rows of the input, in date order
+    pd.testing.assert_frame_equal(out, df.loc[out.index])
+    assert out["date"].is_monotonic_increasing
+
+
+def test_downsample_many_series_bucket_by_week_or_month():
+    names = ["L{}".format(i) for i in range(12)]
+    weeks = downsample(series(names, 900), width=400)
+    months = downsample(series(names, 900), width=40)
+
+    assert weeks["date"].nunique() <= 200
+    assert weeks["date"].dt.dayofweek.eq(0).all()
+    assert months["date"].dt.day.eq(1).all()
+    # weeks are too many for 20 points, months are the coarsest buckets
+    assert months["date"].nunique() == 30
@@ -0,0 +1,84 @@
+import os
+import re
+
+from metrics import Registry, clear, mark_process_dead
+
+
+def sample(text, line):
+    """Value of the sample `line`, the metric name and labels"""
+    match = re.search("^{} (\\S+)$".format(re.escape(line)), text, re.M)
+    return None if match is None else float(match.group(1))
+
+
+def registry(directory):
+    registry = Registry(directory=str(directory), interval=0)
+    requests = registry.counter("covid_requests_total", "Requests", ["tab"])
+    seconds = registry.histogram("covid_seconds", "Latency", buckets=(0.1, 1))
+    return registry, requests, seconds
+
+
+def test_metrics_endpoint_renders_the_callbacks(app, map_request):
+    client = app.server.test_client()
+    before = sample(
+        client.get("/metrics").get_data(as_text=True),
+        'covid_callback_seconds_count{callback="map_plot",status="204"}',
+    )
+    client.post("/_dash-update-component", json=map_request("line-tab"))
+
+    response = client.get("/metrics")
+    text = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    for name in ["covid_callback_seconds", "covid_figure_seconds"]:
+        assert "# TYPE {} histogram".format(name) in text
+    assert "# TYPE covid_cache_events_total counter" in text
+    count = 'covid_callback_seconds_count{callback="map_plot",status="204"}'
+    assert sample(text, count) == (before or 0) + 1
+    assert sample(text, 'covid_cache_events_total{cache="figure",event="hits"}') >= 0
+
+
+def test_histogram_lines_are_cumulative(tmp_path):
+    metrics, _, seconds = registry(tmp_path)
+    for value in [0.05, 0.5, 5]:
+        seconds.observe(value)
+
+    text = metrics.render()
+
+    assert sample(text, 'covid_seconds_bucket{le="0.1"}') == 1
+    assert sample(text, 'covid_seconds_bucket{le="1"}') == 2
+    assert sample(text, 'covid_seconds_bucket{le="+Inf"}') == 3
+    assert sample(text, "covid_seconds_sum") == 5.55
+    assert sample(text, "covid_seconds_count") == 3
+
+
+def test_exited_process_counts_are_kept(tmp_path):
+    exited, requests, seconds = registry(tmp_path)
+    requests.inc("map-tab", amount=3)
+    seconds.observe(0.5)
+    exited.dump(force=True)
+    mark_process_dead(os.getpid(), str(tmp_path))
+
+    assert os.listdir(tmp_path) == ["metrics-exited.pkl"]
+
+    # a new process with the same pid starts from zero
+    current, requests, _ = registry(tmp_path)
+    requests.inc("map-tab")
+    current.dump(force=True)
+    text = current.render()
+
+    assert sample(text, 'covid_requests_total{tab="map-tab"}') == 4
+    assert sample(text, "covid_seconds_count") == 1
+
+
+def test_clear_removes_the_samples_of_an_earlier_run(tmp_path):
+    earlier, requests, _ = registry(tmp_path)
+    requests.inc("map-tab")
+    earlier.dump(force=True)
+    mark_process_dead(os.getpid(), str(tmp_path))
+    earlier.dump(force=True)
+
+    clear(str(tmp_path))
+
+    assert os.listdir(tmp_path) == []
+    assert "covid_requests_total{" not in registry(tmp_path)[0].render()
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from refresh import KEY, merge_updates
+from utility import get_data
+
+
+@pytest.fixture(scope="module")
+def df():
+    data = get_data()
+    return data[data["location"].isin(["Canada", "France"])].reset_index(drop=True)
+
+
+def test_no_updates_keep_the_frame(df):
+    assert merge_updates(df, df.iloc[:0]) == (df, 0)
+
+
+def test_overlapping_unchanged_rows_keep_the_frame(df):
+    merged, changed = merge_updates(df, df.iloc[-20:])
+
+    assert merged is df
+    assert changed == 0
+
+
+def test_revised_and_new_rows(df):
+    last = df["date"].max()
+    revised = df.iloc[-4:].copy()
+    revised["new_cases"] += 1
+    new = df.iloc[-2:].copy()
+    new["date"] = last + pd.Timedelta(days=1)
+    updates = pd.concat([df.iloc[-10:-4], revised, new], ignore_index=True)
+
+    merged, changed = merge_updates(df, updates)
+
+    assert changed == 6
+    assert len(merged) == len(df) + 2
+    assert not merged.duplicated(subset=KEY).any()
+    assert merged["date"].is_monotonic_increasing
+    by_key = merged.set_index(KEY)
+    for _, row in revised.iterrows():
+        assert by_key.loc[(row["iso_code"], row["date"]), "new_cases"] == (
+            row["new_cases"]
+        )
+    # the rows before the updates are untouched
+    head = len(df) - 10
+    pd.testing.assert_frame_equal(merged.iloc[:head], df.iloc[:head])
+
+
+def test_duplicate_updates_keep_the_last(df):
+    first = df.iloc[-1:].copy()
+    second = first.copy()
+    first["new_cases"] = 1
+    second["new_cases"] = 2
+
+    merged, changed = merge_updates(df, pd.concat([first, second]))
+
+    assert len(merged) == len(df)
+    row = merged.set_index(KEY).loc[(first["iso_code"].iloc[0], first["date"].iloc[0])]
+    assert row["new_cases"] == 2
+    assert changed >= 1
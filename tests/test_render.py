@@ -0,0 +1,207 @@
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from render import RenderPool, RenderTimeout, in_worker
+from supersede import LatestRequests, Superseded, check
+
+RESTORED = None
+
+
+def restore(value):
+    global RESTORED
+    RESTORED = value
+
+
+# The workers import this module again and find the pool by its name
+pool = RenderPool(
+    workers=1, max_pending=1, restore=restore, state=lambda: ("v1",), name="tests"
+)
+
+
+@pool.job
+def where():
+    return os.getpid(), in_worker(), RESTORED
+
+
+def nap(seconds, marker=None):
+    time.sleep(seconds)
+    if marker is not None:
+        open(marker, "w").close()
+    return seconds
+
+
+sleep = pool.job(nap)
+
+# A pool where jobs wait in the queue: besides the running job, the
+# executor hands one more to the worker processes, the next ones wait
+queue_pool = RenderPool(workers=1, max_pending=4, name="tests-queue")
+queue_pool.job(nap)
+
+
+@pool.job
+def crash():
+    os._exit(1)
+
+
+class Cancelled(Exception):
+    pass
+
+
+@pytest.fixture(scope="module", autouse=True)
+def shutdown():
+    yield
+    for started in (pool, queue_pool):
+        if started._executor is not None:
+            started._executor.shutdown()
+
+
+@pytest.fixture
+def workers(monkeypatch):
+    monkeypatch.setattr(pool, "timeout", 30)
+    monkeypatch.setattr(pool, "checkpoint", None)
+    pool.start()
+    yield pool
+    # let a job left running end, the pool has a single slot
+    with pool._slots:
+        pass
+
+
+def test_jobs_run_inline_without_workers():
+    inline = RenderPool(workers=0, name="tests-inline")
+
+    @inline.job
+    def square(x):
+        return x * x
+
+    assert square(3) == 9
+
+
+def test_jobs_run_in_a_restored_worker(workers):
+    pid, worker, restored = where()
+
+    assert pid != os.getpid()
+    assert worker and not in_worker()
+    assert restored == "v1"
+
+
+def test_restart_starts_workers_with_the_new_state(workers, monkeypatch):
+    before, _, _ = where()
+    monkeypatch.setattr(pool, "state", lambda: ("v2",))
+    pool.restart()
+
+    after, _, restored = where()
+    assert after != before
+    assert restored == "v2"
+
+
+def test_result_timeout(workers):
+    workers.timeout = 0.3
+    start = time.monotonic()
+    with pytest.raises(RenderTimeout, match="timed out"):
+        sleep(1.0)
+    assert time.monotonic() - start < 0.9
+
+
+def test_slot_timeout(workers):
+    busy = threading.Thread(target=sleep, args=(1.0,))
+    busy.start()
+    try:
+        # the job above holds the only slot
+        time.sleep(0.1)
+        workers.timeout = 0.3
+        with pytest.raises(RenderTimeout, match="No render worker free"):
+            sleep(0)
+    finally:
+        busy.join()
+
+
+def test_checkpoint_cancels_a_waiting_job(workers, tmp_path):
+    cancel = threading.Event()
+
+    def checkpoint():
+        if cancel.is_set():
+            raise Cancelled
+
+    workers.checkpoint = checkpoint
+    timer = threading.Timer(0.3, cancel.set)
+    timer.start()
+    start = time.monotonic()
+    with pytest.raises(Cancelled):
+        sleep(1.0)
+    assert time.monotonic() - start < 0.9
+    timer.join()
+
+
+def test_superseded_request_stops_waiting(workers):
+    workers.checkpoint = check
+    latest = LatestRequests()
+    waiting = threading.Event()
+    errors = []
+
+    def first():
+        try:
+            with latest.track(("session", "charts-tab")):
+                waiting.set()
+                sleep(1.0)
+        except Superseded as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=first)
+    start = time.monotonic()
+    thread.start()
+    waiting.wait()
+    with latest.track(("session", "charts-tab")):
+        thread.join()
+
+    assert time.monotonic() - start < 0.9
+    assert len(errors) == 1
+    assert latest.cancelled == 1
+
+
+def test_cancelled_queued_job_never_runs(tmp_path):
+    queued = queue_pool
+    queued.start()
+    marker = tmp_path / "ran"
+    cancel = threading.Event()
+
+    def checkpoint():
+        if cancel.is_set() and threading.current_thread().name == "queued":
+            raise Cancelled
+
+    queued.checkpoint = checkpoint
+    errors = []
+
+    def run_queued():
+        try:
+            queued.run("nap", 0, str(marker))
+        except Cancelled as error:
+            errors.append(error)
+
+    busy = [
+        threading.Thread(target=queued.run, args=("nap", seconds))
+        for seconds in (0.6, 0, 0)
+    ]
+    for thread in busy:
+        thread.start()
+        time.sleep(0.1)
+    waiting = threading.Thread(target=run_queued, name="queued")
+    waiting.start()
+    time.sleep(0.1)
+    cancel.set()
+    waiting.join()
+    for thread in busy:
+        thread.join()
+
+    assert len(errors) == 1
+    assert not marker.exists()
+
+
+def test_dead_worker_is_replaced(workers):
+    with pytest.raises(BrokenProcessPool):
+        crash()
+
+    assert sleep(0) == 0
@@ -0,0 +1,92 @@
+import contextlib
+import io
+import math
+
+import pandas as pd
+import pytest
+
+from utility import COLUMNS, DAY_COLUMN, DATA_URL, apply_schema
+
+SELECTIONS = [[], ["Canada", "United States", "United Kingdom", "France"]]
+
+
+def legacy_frame(source):
+    """Read the source the way the app did before `SCHEMA`"""
+    df = pd.read_csv(source, parse_dates=["date"])
+    df = df[COLUMNS].fillna(value=0)
+    df = df[~df["iso_code"].str.startswith("OWID")]
+    return df.sort_values("date")
+
+
+def same(a, b, rtol=1e-6):
+    if isinstance(a, dict):
+        return (
+            isinstance(b, dict)
+            and a.keys() == b.keys()
+            and all(same(a[key], b[key], rtol) for key in a)
+        )
+    if isinstance(a, (list, tuple)):
+        return (
+            isinstance(b, (list, tuple))
+            and len(a) == len(b)
+            and all(same(x, y, rtol) for x, y in zip(a, b))
+        )
+    numbers = (int, float)
+    if isinstance(a, numbers) and isinstance(b, numbers) and not isinstance(a, bool):
+        return math.isclose(a, b, rel_tol=rtol, abs_tol=rtol)
+    return a == b
+
+
+def outputs(app, frame):
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.swap_dataset(frame)
+    app.frame_cache.clear()
+    app.figure_cache.clear()
+    daterange = [0, app.data.axis.last]
+    results = {}
+    for countries in SELECTIONS:
+        name = ",".join(countries) or "all"
+        results["map_plot", name] = app.plot_map(
+            "new_cases_per_million", countries, daterange
+        )
+        results["line_chart", name] = app.plot_map_line_chart(
+            "new_cases_per_million", countries, daterange, "linear", False
+        )
+        for i in range(1, 5):
+            plot = getattr(app, "plot_chart_{}".format(i))
+            results["chart_{}".format(i), name] = plot(countries, daterange, "linear")
+    return results
+
+
+@pytest.fixture(scope="module")
+def chart_outputs(app):
+    legacy = legacy_frame(DATA_URL)
+    typed = apply_schema(legacy)
+    # the charts drop the day column, the legacy frame only needs it to exist
+    legacy[DAY_COLUMN] = typed[DAY_COLUMN]
+    current = app.data
+    try:
+        yield outputs(app, legacy), outputs(app, typed)
+    finally:
+        with contextlib.redirect_stdout(io.StringIO()):
+            app.swap_dataset(current.df)
+
+
+def test_schema_is_smaller():
+    legacy = legacy_frame(DATA_URL)
+    typed = apply_schema(legacy)
+
+    before = legacy.memory_usage(deep=True, index=False).sum()
+    after = typed.memory_usage(deep=True, index=False).sum()
+    assert after < before / 2
+
+
+@pytest.mark.parametrize(
+    "figure", ["map_plot", "line_chart", "chart_1", "chart_2", "chart_3", "chart_4"]
+)
+@pytest.mark.parametrize("selection", SELECTIONS, ids=["all", "four"])
+def test_schema_keeps_charts(chart_outputs, figure, selection):
+    expected, actual = chart_outputs
+    key = figure, ",".join(selection) or "all"
+
+    assert same(expected[key], actual[key])
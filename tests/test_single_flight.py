@@ -0,0 +1,171 @@
+import threading
+import time
+
+import pytest
+
+import cache as cache_module
+from cache import FileCache, LRUCache, SingleFlight, memoize
+
+CALLERS = 8
+
+
+def crowd(call, callers=CALLERS):
+    """Run `call` in `callers` threads at once, return results or errors"""
+    results = [None] * callers
+    started = threading.Barrier(callers + 1)
+
+    def run(i):
+        started.wait()
+        try:
+            results[i] = call()
+        except Exception as error:
+            results[i] = error
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    return threads, results
+
+
+def wait_until(condition, timeout=5):
+    """Poll `condition` until it holds, fail after `timeout` seconds"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition never held"
+        time.sleep(0.001)
+
+
+class Build:
+    """Function that blocks until released, counting its calls"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        assert self.release.wait(5)
+        return {"figure": call}
+
+
+def finish(threads, *builds):
+    for build in builds:
+        build.release.set()
+    for thread in threads:
+        thread.join(5)
+
+
+def test_each_key_executes_once():
+    flight = SingleFlight()
+    builds = {key: Build() for key in ("map", "chart")}
+    threads, results = [], []
+    for key, build in builds.items():
+        more, found = crowd(lambda key=key: flight.do(key, builds[key]))
+        threads += more
+        results.append(found)
+
+    wait_until(lambda: [flight.waiting(key) for key in builds] == [CALLERS - 1] * 2)
+    finish(threads, *builds.values())
+
+    assert [build.calls for build in builds.values()] == [1, 1]
+    assert results == [[{"figure": 1}] * CALLERS] * 2
+
+
+def test_waiters_get_the_leader_result():
+    flight = SingleFlight()
+    build = Build()
+    threads, results = crowd(lambda: flight.do("map", build))
+    wait_until(lambda: flight.waiting("map") == CALLERS - 1)
+    finish(threads, build)
+
+    assert build.calls == 1
+    # the very same object, not a copy built again
+    assert all(result is results[0] for result in results)
+
+
+def test_leader_error_makes_waiters_run_again():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def build():
+        calls.append(None)
+        call = len(calls)
+        assert release.wait(5)
+        if call == 1:
+            raise RuntimeError("superseded")
+        # the callers woken by the error now wait on this call
+        wait_until(lambda: flight.waiting("map") == CALLERS - 2)
+        return {"figure": call}
+
+    threads, results = crowd(lambda: flight.do("map", build))
+    wait_until(lambda: flight.waiting("map") == CALLERS - 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    assert len(errors) == 1 and str(errors[0]) == "superseded"
+    assert len(calls) == 2
+    assert results.count({"figure": 2}) == CALLERS - 1
+    assert flight.waiting() == 0
+
+
+@pytest.mark.parametrize("backend", ["memory", "file"])
+def test_memoize_builds_once(backend, tmp_path):
+    if backend == "memory":
+        cache = LRUCache(version="v1")
+    else:
+        cache = FileCache(str(tmp_path), version="v1")
+    build = Build()
+
+    @memoize(cache)
+    def plot_map(countries, daterange):
+        return build()
+
+    threads, results = crowd(lambda: plot_map(["France", "Canada"], [0, 10]))
+    wait_until(lambda: cache.flight.waiting() == CALLERS - 1)
+    finish(threads, build)
+
+    assert build.calls == 1
+    assert results == [{"figure": 1}] * CALLERS
+    stats = cache.stats()
+    assert (stats["executed"], stats["coalesced"]) == (1, CALLERS - 1)
+    # a later call is a plain hit
+    assert plot_map(["Canada", "France"], [0, 10]) == {"figure": 1}
+    assert build.calls == 1
+
+
+@pytest.mark.skipif(cache_module.fcntl is None, reason="file leases need fcntl")
+def test_file_caches_of_one_directory_build_once(tmp_path):
+    # separate caches, as in separate workers, only share the lease
+    caches = [FileCache(str(tmp_path), version="v1") for _ in range(CALLERS)]
+    build = Build()
+    plots = []
+    for cache in caches:
+
+        @memoize(cache)
+        def plot_map(ycol):
+            return build()
+
+        plots.append(plot_map)
+
+    calls = iter(plots)
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            plot = next(calls)
+        return plot("new_cases")
+
+    # the callers arriving after the build find its result in the directory
+    threads, results = crowd(call)
+    finish(threads, build)
+
+    assert build.calls == 1
+    assert results == [{"figure": 1}] * CALLERS
+    assert sum(cache.stats()["executed"] for cache in caches) == 1
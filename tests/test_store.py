@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from store import DataStore
+from utility import filter_data, get_data
+
+
+@pytest.fixture(scope="module")
+def df():
+    return get_data()
+
+
+@pytest.mark.parametrize(
+    "date_from, date_to, countries",
+    [
+        (None, None, []),
+        ("2020-03-01", "2020-06-30", []),
+        (None, None, ["Canada", "France"]),
+        ("2020-05-01", "2020-05-07", ["France", "Canada", "France"]),
+        ("2021-01-01", "2021-01-01", ["Japan"]),
+        ("2020-02-01", "2020-09-30", ["Atlantis", "Kenya"]),
+        ("2020-02-01", "2020-09-30", ["Atlantis"]),
+        ("2030-01-01", None, ["Canada"]),
+        (np.datetime64("2020-04-01"), pd.Timestamp("2020-04-15"), ["India"]),
+    ],
+)
+def test_filter_matches_the_query(df, date_from, date_to, countries):
+    expected = filter_data(df, date_from, date_to, countries)
+    actual = filter_data(DataStore(df), date_from, date_to, countries)
+
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_filter_returns_a_copy(df):
+    store = DataStore(df)
+    for countries in ([], ["Canada"]):
+        selected = store.filter(countries=countries)
+        selected["new_cases"] = -1
+        assert (df["new_cases"] != -1).all()
+
+
+def test_empty_frame():
+    store = DataStore(get_data().iloc[:0])
+
+    assert len(store.filter(countries=["Canada"])) == 0
+    assert len(store.filter()) == 0
@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+from supersede import LatestRequests, Superseded, check
+
+
+def test_check_outside_a_request_does_nothing():
+    check()
+
+
+def test_newer_request_supersedes_the_running_one():
+    latest = LatestRequests()
+    with pytest.raises(Superseded):
+        with latest.track("key"):
+            with latest.track("key"):
+                check()
+            check()
+
+    assert latest.cancelled == 1
+
+
+def test_requests_of_other_keys_do_not_supersede():
+    latest = LatestRequests()
+    with latest.track(("session", "map-tab")):
+        with latest.track(("session", "line-tab")):
+            check()
+        with latest.track(("other", "map-tab")):
+            check()
+        check()
+
+    assert latest.cancelled == 0
+
+
+def test_superseded_callback_returns_prevent_update(app, map_request, monkeypatch):
+    plot_map = app.plot_map
+    waiting = threading.Event()
+    stop = threading.Event()
+
+    def slow_plot_map(*args):
+        # the first request waits, as on a render worker, until superseded
+        if not waiting.is_set():
+            waiting.set()
+            while not stop.wait(0.01):
+                check()
+        return plot_map(*args)
+
+    monkeypatch.setattr(app, "plot_map", slow_plot_map)
+    client = app.server.test_client()
+    cancelled = app.latest_requests.cancelled
+    responses = {}
+
+    def post(name, start):
+        responses[name] = client.post(
+            "/_dash-update-component", json=map_request(session="3f2a", start=start)
+        )
+
+    first = threading.Thread(target=post, args=("first", 0))
+    first.start()
+    waiting.wait()
+    try:
+        post("second", 10)
+        first.join(timeout=5)
+    finally:
+        stop.set()
+        first.join()
+
+    assert responses["first"].status_code == 204
+    assert responses["second"].status_code == 200
+    assert app.latest_requests.cancelled == cancelled + 1
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from synthetic import generate, parse_source
+from utility import COLUMNS
+
+
+def test_parse_source():
+    assert parse_source("synthetic:locations=2000,days=1500,seed=1") == {
+        "locations": 2000,
+        "days": 1500,
+        "seed": 1,
+    }
+    assert parse_source("synthetic:start=2021-03-01") == {"start": "2021-03-01"}
+    assert parse_source("synthetic:") == {}
+    assert parse_source("https://covid.ourworldindata.org/data/owid.csv") is None
+
+
+def test_parse_source_rejects_unknown_arguments():
+    with pytest.raises(ValueError, match="rows"):
+        parse_source("synthetic:rows=10")
+
+
+def test_same_arguments_generate_the_same_data():
+    kwargs = parse_source("synthetic:locations=70,days=120,seed=3")
+    df = generate(**kwargs)
+
+    assert list(df.columns) == COLUMNS
+    assert df["location"].nunique() == 70 + 7  # and the aggregates
+    pd.testing.assert_frame_equal(df, generate(**kwargs))
+
+
+def test_seed_changes_the_data():
+    df = generate(locations=10, days=120, seed=0)
+    other = generate(locations=10, days=120, seed=1)
+
+    pd.testing.assert_frame_equal(df[["location", "date"]], other[["location", "date"]])
+    assert not df["new_cases"].equals(other["new_cases"])
+
+
+def test_totals_and_world_add_up():
+    df = generate(locations=20, days=90, seed=2)
+    countries = df[~df["iso_code"].str.startswith("OWID_")]
+    world = df[df["iso_code"] == "OWID_WRL"]
+
+    for _, rows in countries.groupby("location"):
+        reported = rows["total_cases"].notna()
+        np.testing.assert_allclose(
+            rows["total_cases"][reported],
+            rows["new_cases"].fillna(0).cumsum()[reported],
+        )
+    daily = countries.groupby("date")["new_cases"].sum()
+    np.testing.assert_allclose(world["new_cases"], daily.to_numpy())
+    assert (
+        world["population"].iloc[0]
+        == countries.groupby("location")["population"].first().sum()
+    )
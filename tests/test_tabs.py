@@ -0,0 +1,59 @@
+import contextlib
+import io
+
+import pytest
+
+COUNTRIES = ["Canada", "France"]
+
+
+@pytest.fixture
+def render(app, map_request):
+    client = app.server.test_client()
+
+    def render(active_tab, rendered=None):
+        response = client.post(
+            "/_dash-update-component", json=map_request(active_tab, rendered)
+        )
+        if response.status_code == 204:
+            return None
+        assert response.status_code == 200
+        return response.get_json()["response"]["map_rendered"]["data"]
+
+    return render
+
+
+def test_hidden_tab_is_not_rendered(render):
+    assert render("line-tab") is None
+
+
+def test_shown_tab_renders_and_then_skips_the_same_state(app, render):
+    state = render("map-tab")
+
+    assert state["version"] == app.data.version
+    assert state["inputs"][1] == COUNTRIES
+    assert render("map-tab", state) is None
+
+
+def test_tab_rendered_before_a_refresh_renders_again(app, render):
+    state = render("map-tab")
+    current = app.data
+    # same days, revised counts
+    revised = current.df.copy()
+    revised["new_cases"] = revised["new_cases"] + 1
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            app.swap_dataset(revised)
+        assert app.data.version != state["version"]
+
+        refreshed = render("map-tab", state)
+        assert refreshed == {"version": app.data.version, "inputs": state["inputs"]}
+    finally:
+        with contextlib.redirect_stdout(io.StringIO()):
+            app.swap_dataset(current.df)
+
+
+def test_other_inputs_render_again(render):
+    state = render("map-tab")
+    state["inputs"][0] = "new_deaths"
+
+    assert render("map-tab", state) is not None
@@ -0,0 +1,120 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import utility
+from utility import (
+    COLUMNS,
+    CSV_BLOCK_SIZE,
+    DATA_URL,
+    ROLLING_SUFFIX,
+    add_rolling_means,
+    apply_schema,
+    csv_blocks,
+    get_data,
+    read_source,
+    shared_path,
+)
+
+
+def test_shared_mode_falls_back_when_the_arrow_file_cannot_be_written(
+    tmp_path, monkeypatch
+):
+    def write_shared(df, data_dir=None):
+        raise PermissionError("read-only file system")
+
+    monkeypatch.setattr(utility, "write_shared", write_shared)
+    df = get_data(data_dir=str(tmp_path), mode="shared")
+
+    assert len(df) > 0
+    assert not os.path.exists(shared_path(str(tmp_path)))
+
+
+def test_shared_mode_maps_the_arrow_file(tmp_path):
+    df = get_data(data_dir=str(tmp_path), mode="shared")
+
+    assert os.path.exists(shared_path(str(tmp_path)))
+    assert df.equals(get_data(data_dir=str(tmp_path), mode="snapshot"))
+
+
+@pytest.mark.parametrize("window", [1, 8, 30])
+def test_rolling_means_match_pandas(window):
+    columns = ["new_cases", "total_cases", "new_cases_per_million"]
+    df = add_rolling_means(get_data(), columns, window=window)
+
+    expected = (
+        df.groupby("location", observed=True)[columns]
+        .rolling(window, min_periods=1)
+        .mean()
+        .reset_index(level=0, drop=True)
+        .loc[df.index]
+    )
+    for column in columns:
+        np.testing.assert_allclose(
+            df[column + ROLLING_SUFFIX], expected[column], rtol=1e-9, atol=1e-6
+        )
+
+
+def test_rolling_means_stay_within_a_location():
+    df = pd.DataFrame(
+        {
+            "location": ["Canada", "France", "Canada", "France", "Canada"],
+            "new_cases": [1.0, 100.0, 3.0, 200.0, 5.0],
+        }
+    )
+    add_rolling_means(df, ["new_cases"], window=2)
+
+    assert df["new_cases" + ROLLING_SUFFIX].tolist() == [1, 100, 2, 150, 4]
+
+
+def legacy_read(source):
+    """Read the source the way the app did before the streamed reader"""
+    df = pd.read_csv(source, parse_dates=["date"])
+    df = df[COLUMNS].fillna(value=0)
+    df = df[~df["iso_code"].str.startswith("OWID")]
+    return apply_schema(df.sort_values("date", kind="stable").reset_index(drop=True))
+
+
+@pytest.mark.parametrize("block_size", [1, 100, 4096, CSV_BLOCK_SIZE])
+def test_csv_blocks_split_on_whole_lines(block_size):
+    with open(DATA_URL, "rb") as f:
+        header = f.readline()
+        body = f.read()
+    with open(DATA_URL, "rb") as f:
+        blocks = list(csv_blocks(f, block_size))
+
+    assert all(block.startswith(header) for block in blocks)
+    assert all(block.endswith(b"\n") for block in blocks)
+    assert b"".join(block[len(header) :] for block in blocks) == body
+
+
+def test_csv_blocks_without_a_final_line_break():
+    blocks = csv_blocks(io.BytesIO(b"a,b\n1,2\n3,4"), block_size=5)
+
+    assert list(blocks) == [b"a,b\n1,2\n", b"a,b\n3,4"]
+
+
+@pytest.mark.parametrize("block_size", [4096, CSV_BLOCK_SIZE])
+def test_read_source_matches_read_csv(block_size):
+    expected = legacy_read(DATA_URL)
+    actual = read_source(DATA_URL, block_size=block_size)
+
+    # the categories are in order of appearance, the values must match
+    pd.testing.assert_frame_equal(
+        actual.reset_index(drop=True), expected, check_categorical=False
+    )
+
+
+def test_read_source_since():
+    since = pd.Timestamp("2021-01-01")
+    expected = legacy_read(DATA_URL)
+    expected = expected[expected["date"] > since].reset_index(drop=True)
+    actual = read_source(DATA_URL, since=since, block_size=4096)
+
+    # the categories are in order of appearance, the values must match
+    pd.testing.assert_frame_equal(
+        actual.reset_index(drop=True), expected, check_categorical=False
+    )
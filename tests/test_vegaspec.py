@@ -0,0 +1,67 @@
+import warnings
+
+import altair as alt
+import pandas as pd
+import pytest
+
+from vegaspec import SpecTemplate, encode_columns
+
+FRAME = pd.DataFrame(
+    {
+        "location": ["Canada", "Canada", "France"],
+        "date": pd.to_datetime(["2021-01-01", "2021-01-02", "2021-01-02"]),
+        "new_cases": [1.0, 2.0, 3.0],
+        "population": [38, 38, 67],
+    }
+)
+
+
+@pytest.fixture
+def template():
+    return SpecTemplate(
+        alt.Chart()
+        .mark_line()
+        .encode(
+            x="date:T",
+            y=alt.Y("count:Q", scale=alt.Scale(type="linear")),
+            color="location:N",
+        )
+    )
+
+
+def test_project_returns_a_frame_of_its_own(template):
+    projected = template.project(FRAME)
+
+    assert list(projected.columns) == ["location", "date"]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        projected["count"] = FRAME["new_cases"]
+    assert "count" not in FRAME
+
+
+def test_payload_sends_only_the_fields(template):
+    data = template.project(FRAME).assign(count=FRAME["new_cases"])
+    payload = template.payload(data.assign(extra=0), scale="symlog")
+
+    assert payload["columns"] == encode_columns(data)
+    assert payload["spec"]["encoding"]["y"]["scale"]["type"] == "symlog"
+    assert payload["key"] != template.payload(data)["key"]
+    assert payload["length"] == 3
+
+
+def test_dates_are_day_steps():
+    columns = encode_columns(FRAME[["date"]])
+
+    assert columns == {"date": {"origin": "2021-01-01", "steps": [0, 1, 0]}}
+
+
+def test_plots_raise_no_copy_warning(app):
+    app.frame_cache.clear()
+    app.figure_cache.clear()
+    daterange = [0, app.data.axis.last]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", pd.errors.SettingWithCopyWarning)
+        app.plot_map_line_chart("new_cases", ["Canada"], daterange, "linear", True)
+        for i in range(1, 5):
+            plot = getattr(app, "plot_chart_{}".format(i))
+            plot(["Canada"], daterange, "symlog")
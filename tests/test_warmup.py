@@ -0,0 +1,70 @@
+import json
+import os
+import threading
+
+from warmup import SelectionLog
+
+
+def read_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_popular_counts_sorted_selections(tmp_path):
+    log = SelectionLog(str(tmp_path / "selections.jsonl"))
+    for countries in [["France", "Canada"], ["Canada", "France"], ["Peru"], None]:
+        log.record(countries)
+
+    assert log.popular(2) == [["Canada", "France"], ["Peru"]]
+    assert log.popular(0) == []
+
+
+def test_disabled_or_missing_log_is_empty(tmp_path):
+    SelectionLog().record(["France"])
+
+    assert SelectionLog().popular(3) == []
+    assert SelectionLog(str(tmp_path / "missing.jsonl")).popular(3) == []
+
+
+def test_popular_counts_the_recent_lines(tmp_path):
+    log = SelectionLog(str(tmp_path / "selections.jsonl"), recent=3)
+    for countries in [["Peru"]] * 4 + [["Chile"]] * 3:
+        log.record(countries)
+
+    assert log.popular(2) == [["Chile"]]
+
+
+def test_record_trims_the_file_past_max_bytes(tmp_path):
+    path = str(tmp_path / "selections.jsonl")
+    log = SelectionLog(path, recent=5, max_bytes=100)
+    for i in range(50):
+        log.record(["country {:02d}".format(i)])
+
+        assert os.path.getsize(path) <= 100
+
+    lines = read_lines(path)
+    assert 5 <= len(lines) < 50
+    assert lines[-1] == ["country 49"]
+    assert lines == [["country {:02d}".format(i)] for i in range(50 - len(lines), 50)]
+
+
+def test_workers_sharing_the_file_keep_whole_lines(tmp_path):
+    # one log per thread, as in separate workers, only share the file
+    path = str(tmp_path / "selections.jsonl")
+    start = threading.Barrier(4)
+
+    def record(worker):
+        log = SelectionLog(path, recent=20, max_bytes=2000)
+        start.wait()
+        for i in range(200):
+            log.record(["worker {}".format(worker), "country {:03d}".format(i)])
+
+    threads = [threading.Thread(target=record, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    lines = read_lines(path)
+    assert os.path.getsize(path) <= 2000
+    assert all(len(line) == 2 for line in lines)